@@ -0,0 +1,211 @@
+"""Aligns the text spans returned by a language model with the source text
+
+All spans are compiled into one Aho-Corasick automaton, so every occurrence of
+every span is found in a single pass over the text, and spans are matched
+literally (regex metacharacters such as `(`, `+` or `?` have no meaning).
+Spans that do not occur verbatim are retried with whitespace and case
+normalized and then, optionally, with fuzzy matching for lightly edited spans.
+"""
+from collections import deque
+from collections.abc import Iterable
+from difflib import SequenceMatcher
+
+from promptedgraphs.models import EntityReference
+
+Span = tuple[int, int]
+
+WHITESPACE = " \t\n\r\f\v "
+
+
+class SpanAligner:
+    """Multi-pattern string matcher (Aho-Corasick automaton)"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for c in pattern:
+                if (next_state := self._goto[state].get(c)) is None:
+                    next_state = len(self._goto)
+                    self._goto[state][c] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(index)
+
+        # Breadth-first construction of the failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(c, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def find_all(self, text: str) -> dict[str, list[Span]]:
+        """Returns the non-overlapping occurrences of each pattern, like
+        `re.finditer` would for each pattern on its own"""
+        matches: dict[str, list[Span]] = {p: [] for p in self.patterns}
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for index in out[state]:
+                pattern = self.patterns[index]
+                found = matches[pattern]
+                start = i + 1 - len(pattern)
+                if not found or found[-1][1] <= start:
+                    found.append((start, i + 1))
+        return matches
+
+
+def _normalize(text: str) -> tuple[str, list[int]]:
+    """Collapses whitespace runs and lowercases `text`, returning the normalized
+    text and the index in `text` of each normalized character"""
+    chars, positions = [], []
+    previous_space = False
+    for i, c in enumerate(text):
+        if c.isspace():
+            if previous_space:
+                continue
+            previous_space = True
+            c = " "
+        else:
+            previous_space = False
+            lower = c.lower()
+            c = lower if len(lower) == 1 else c
+        chars.append(c)
+        positions.append(i)
+    return "".join(chars), positions
+
+
+def _align_window(text: str, span: str, position: int) -> tuple[Span, float]:
+    """Aligns `span` with the text around `position`, its presumed start"""
+    slack = max(2, len(span) // 4)
+    lo = max(0, position - slack)
+    hi = min(len(text), position + len(span) + slack)
+    matcher = SequenceMatcher(None, text[lo:hi], span, autojunk=False)
+    blocks = [b for b in matcher.get_matching_blocks() if b.size]
+    if not blocks:
+        return (position, position), 0.0
+    start, end = lo + blocks[0].a, lo + blocks[-1].a + blocks[-1].size
+    return (start, end), SequenceMatcher(None, text[start:end], span).ratio()
+
+
+def _fuzzy_find(
+    text: str, span: str, min_similarity: float, max_candidates: int = 50
+) -> Span | None:
+    """The most similar approximate occurrence of `span` in `text`, if any is
+    at least `min_similarity` similar"""
+    # Candidate positions come from verbatim occurrences of the span's words
+    words, offset = {}, 0
+    for word in span.split(" "):
+        if len(word) >= 3:
+            words.setdefault(word, offset)
+        offset += len(word) + 1
+    positions = []
+    for word, found in SpanAligner(words).find_all(text).items():
+        positions += [start - words[word] for start, _ in found]
+    if not positions:
+        matcher = SequenceMatcher(None, text, span, autojunk=False)
+        anchor = matcher.find_longest_match(0, len(text), 0, len(span))
+        if anchor.size == 0:
+            return None
+        positions = [anchor.a - anchor.b]
+
+    best, best_similarity = None, 0.0
+    for position in sorted(set(positions))[:max_candidates]:
+        match, similarity = _align_window(text, span, position)
+        if similarity > best_similarity:
+            best, best_similarity = match, similarity
+    return best if best_similarity >= min_similarity else None
+
+
+def align_spans(
+    text: str,
+    spans: Iterable[str],
+    normalize: bool = True,
+    fuzzy: bool = False,
+    min_similarity: float = 0.85,
+) -> dict[str, list[Span]]:
+    """Finds the `(start, end)` offsets of every occurrence of each span in `text`.
+
+    Spans without a verbatim occurrence are matched with whitespace and case
+    normalized when `normalize` is set, and then approximately (at most one
+    occurrence with a similarity of at least `min_similarity`) when `fuzzy` is.
+    Spans that cannot be aligned map to an empty list.
+    """
+    spans = list(dict.fromkeys(s for s in spans if s))
+    matches = SpanAligner(spans).find_all(text) if spans else {}
+
+    missing = [s for s in spans if not matches[s]]
+    if not missing or not (normalize or fuzzy):
+        return matches
+
+    if normalize:
+        search_text, positions = _normalize(text)
+        keys = {s: _normalize(s.strip())[0] for s in missing}
+    else:
+        search_text, positions = text, range(len(text))
+        keys = {s: s for s in missing}
+
+    def to_text(start: int, end: int) -> Span:
+        return positions[start], positions[end - 1] + 1
+
+    if normalize:
+        found = SpanAligner(keys.values()).find_all(search_text)
+        for span in missing:
+            matches[span] = [to_text(*m) for m in found.get(keys[span], [])]
+        missing = [s for s in missing if not matches[s]]
+
+    if fuzzy:
+        for span in missing:
+            match = _fuzzy_find(search_text, keys[span], min_similarity)
+            if match is not None:
+                matches[span] = [to_text(*match)]
+    return matches
+
+
+def align_entities(
+    text: str,
+    mentions: Iterable[tuple[str, str, str | None]],
+    offset: int = 0,
+    normalize: bool = True,
+    fuzzy: bool = False,
+    min_similarity: float = 0.85,
+) -> list[EntityReference]:
+    """Locates `(text_span, label, reason)` mentions in `text`.
+
+    Returns one `EntityReference` per occurrence, whose `text` is the aligned
+    slice of `text` and whose offsets are shifted by `offset` (the position of
+    `text` in a larger document).
+    """
+    mentions = list(mentions)
+    matches = align_spans(
+        text,
+        (span for span, _, _ in mentions),
+        normalize=normalize,
+        fuzzy=fuzzy,
+        min_similarity=min_similarity,
+    )
+    return [
+        EntityReference(
+            start=offset + start,
+            end=offset + end,
+            text=text[start:end],
+            label=label,
+            reason=reason,
+        )
+        for span, label, reason in mentions
+        for start, end in matches.get(span, [])
+    ]
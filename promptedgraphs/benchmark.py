@@ -0,0 +1,376 @@
+"""Throughput benchmarks of the LLM pipelines against an offline mock backend
+
+Each workload drives one entry point (`data_from_text`, `extract_data`,
+`generate` or `object_to_data`) against `MockChatServer` at a fixed concurrency
+and reports latency percentiles, items/s, tokens/s and peak RSS:
+
+    python -m promptedgraphs bench --requests 200 --concurrency 20 --latency 0.2
+
+Pass `--recordings` to replay recorded completions instead of synthetic ones.
+`python -m promptedgraphs bench-imports` reports the import time of the entry
+points and which heavy dependencies each of them loads, and
+`python -m promptedgraphs bench-schema` the speedup of parallel schema inference
+on a synthetic JSONL file.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from logging import getLogger
+
+from pydantic import BaseModel, Field
+
+from promptedgraphs.config import Config, aclose_http_clients
+from promptedgraphs.llms.mock_server import MockChatServer
+
+logger = getLogger(__name__)
+
+WORKLOADS = ["data_from_text", "extract_data", "generate", "object_to_data"]
+
+IMPORT_MODULES = [
+    "promptedgraphs.cli",
+    "promptedgraphs.extraction.data_from_text",
+    "promptedgraphs.extraction.entities_from_text",
+    "promptedgraphs.data_extraction",
+    "promptedgraphs.entity_recognition",
+    "promptedgraphs.generation.data_from_model",
+    "promptedgraphs.generation.schema_from_data",
+    "promptedgraphs.normalization.object_to_data",
+    "promptedgraphs.data_modeling.conceptual",
+    "promptedgraphs.vis",
+    "promptedgraphs.statistical.data_analysis",
+]
+# Dependencies taking a noticeable fraction of a second to import
+HEAVY_MODULES = [
+    "datamodel_code_generator",
+    "matplotlib",
+    "numpy",
+    "openai",
+    "pandas",
+    "scipy",
+    "seaborn",
+    "spacy",
+    "torch",
+    "transformers",
+]
+
+
+class BenchmarkItem(BaseModel):
+    """An item described in the benchmark text"""
+
+    name: str = Field(title="Name", description="Name of the item")
+    category: str = Field(title="Category", description="Category of the item")
+    quantity: int = Field(title="Quantity", description="Number of items")
+
+
+ITEM = {"name": "widget", "category": "hardware", "quantity": 3}
+ITEMS_PER_RESPONSE = 5
+
+
+def benchmark_responder(request: dict) -> dict | str:
+    """Synthetic answers for every workload, shaped like the real API's"""
+    if functions := request.get("functions"):
+        properties = functions[0]["parameters"]["properties"]
+        key = next(iter(properties)) if len(properties) == 1 else None
+        arguments = {key: [ITEM] * ITEMS_PER_RESPONSE} if key else ITEM
+        return {
+            "role": "assistant",
+            "content": None,
+            "function_call": {
+                "name": functions[0]["name"],
+                "arguments": json.dumps(arguments),
+            },
+        }
+
+    prompt = "\n".join(m.get("content") or "" for m in request.get("messages", []))
+    if match := re.search(r"# Validation Errors\n```\n(.*?)\n```", prompt, re.S):
+        # object_to_data batched correction, patch every location
+        patches = [
+            {"loc": e["loc"], "value": ITEM.get(e["loc"][-1]) if e["loc"] else ITEM}
+            for e in json.loads(match.group(1))
+        ]
+        return json.dumps({"patches": patches})
+    if "# Validation Error" in prompt:  # object_to_data correction
+        return json.dumps({"quantity": ITEM["quantity"]})
+    if match := re.search(r"Generate a list of (\d+) examples", prompt):
+        return json.dumps({"items": [ITEM] * int(match.group(1))})
+    if "Generate a single example" in prompt:
+        return json.dumps(ITEM)
+    return json.dumps({"items": [ITEM] * ITEMS_PER_RESPONSE})
+
+
+async def _run_data_from_text(config: Config, i: int) -> int:
+    from promptedgraphs.extraction.data_from_text import data_from_text
+
+    text = f"Order #{i}: five widgets, three of each."
+    return len([x async for x in data_from_text(text, BenchmarkItem, config=config)])
+
+
+async def _run_extract_data(config: Config, i: int) -> int:
+    from promptedgraphs.data_extraction import extract_data
+
+    text = f"Order #{i}: five widgets, three of each."
+    return len(
+        [x async for x in extract_data(text, list[BenchmarkItem], config=config)]
+    )
+
+
+async def _run_generate(config: Config, i: int) -> int:
+    from promptedgraphs.generation.data_from_model import generate
+
+    text = f"Generate inventory items for warehouse #{i}"
+    return len(
+        [
+            x
+            async for x in generate(
+                text, n=10, output_type=BenchmarkItem, batch_size=5, config=config
+            )
+        ]
+    )
+
+
+async def _run_object_to_data(config: Config, i: int) -> int:
+    from promptedgraphs.llms.chat import Chat
+    from promptedgraphs.normalization.object_to_data import object_to_data
+
+    data = {"name": f"widget-{i}", "category": "hardware", "quantity": "three"}
+    await object_to_data(data, data_model=BenchmarkItem, chat=Chat(config=config))
+    return 1
+
+
+WORKLOAD_RUNNERS: dict[str, Callable[[Config, int], Awaitable[int]]] = {
+    "data_from_text": _run_data_from_text,
+    "extract_data": _run_extract_data,
+    "generate": _run_generate,
+    "object_to_data": _run_object_to_data,
+}
+
+
+@dataclass
+class BenchmarkResult:
+    workload: str
+    requests: int
+    concurrency: int
+    errors: int
+    items: int
+    duration: float
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    items_per_second: float
+    tokens_per_second: float
+    llm_calls: int
+    peak_rss_mb: float | None
+
+    def dict(self):
+        return asdict(self)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linearly interpolated percentile, `q` in [0, 100]"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process (includes the mock server thread)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+async def run_workload(
+    workload: str,
+    server: MockChatServer,
+    requests: int = 100,
+    concurrency: int = 10,
+    rate_limit: bool = False,
+) -> BenchmarkResult:
+    """Runs `requests` invocations of a workload, `concurrency` at a time"""
+    runner = WORKLOAD_RUNNERS[workload]
+    config = Config(
+        openai_api_key="mock",
+        openai_base_url=server.base_url,
+        llm_cache_path=None,
+        rate_limit_enabled=rate_limit,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    items = errors = 0
+
+    async def run_one(i: int):
+        nonlocal items, errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                n = await runner(config, i)
+            except Exception as e:
+                errors += 1
+                logger.warning(f"{workload} request {i} failed: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+            items += n
+
+    calls = server.requests
+    tokens = server.prompt_tokens + server.completion_tokens
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(requests)))
+    duration = time.perf_counter() - start
+    tokens = server.prompt_tokens + server.completion_tokens - tokens
+
+    return BenchmarkResult(
+        workload=workload,
+        requests=requests,
+        concurrency=concurrency,
+        errors=errors,
+        items=items,
+        duration=round(duration, 4),
+        latency_p50=round(percentile(latencies, 50), 4),
+        latency_p95=round(percentile(latencies, 95), 4),
+        latency_p99=round(percentile(latencies, 99), 4),
+        items_per_second=round(items / duration, 2) if duration else 0.0,
+        tokens_per_second=round(tokens / duration, 2) if duration else 0.0,
+        llm_calls=server.requests - calls,
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def measure_import_time(module: str, repeat: int = 3) -> dict:
+    """Best of `repeat` import times of `module`, each in a fresh interpreter"""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy_imports': heavy}))"
+    )
+    runs = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1:] or ["unknown error"]
+            return {"module": module, "seconds": None, "error": error[0]}
+        runs.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["seconds"])
+    return {
+        "module": module,
+        "seconds": round(best["seconds"], 4),
+        "heavy_imports": best["heavy_imports"],
+    }
+
+
+def run_import_benchmarks(
+    modules: list[str] | None = None, repeat: int = 3
+) -> list[dict]:
+    return [measure_import_time(m, repeat=repeat) for m in modules or IMPORT_MODULES]
+
+
+def write_synthetic_jsonl(path: str, records: int, seed: int = 0):
+    """Writes `records` nested records with optional and mixed type fields"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(records):
+            record = {
+                "id": i,
+                "name": f"item-{i}",
+                "price": round(rng.uniform(1, 100), 2),
+                "tags": rng.sample(["a", "b", "c", "d"], rng.randint(0, 3)),
+                "seller": {"id": rng.randint(1, 1000), "rating": rng.random()},
+            }
+            if i % 3 == 0:
+                record["discount"] = rng.choice([None, 5, "10"])
+            f.write(json.dumps(record) + "\n")
+
+
+def run_schema_benchmark(
+    records: int = 1_000_000,
+    workers: list[int] | None = None,
+    path: str | None = None,
+) -> list[dict]:
+    """Times `schema_from_data_parallel` on a JSONL file (generated when `path`
+    is None) for every number of `workers`, reporting records/s and speedup"""
+    from promptedgraphs.generation.schema_inference import schema_from_data_parallel
+
+    workers = workers or sorted({1, 2, 4, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            path = os.path.join(tmp, "records.jsonl")
+            write_synthetic_jsonl(path, records)
+        else:
+            with open(path, "rb") as f:
+                records = sum(1 for _ in f)
+
+        results = []
+        for n in workers:
+            start = time.perf_counter()
+            schema_from_data_parallel([path], workers=n)
+            duration = time.perf_counter() - start
+            results.append(
+                {
+                    "workers": n,
+                    "records": records,
+                    "duration": round(duration, 4),
+                    "records_per_second": round(records / duration, 2),
+                    "speedup": round(results[0]["duration"] / duration, 2)
+                    if results
+                    else 1.0,
+                }
+            )
+    return results
+
+
+async def run_benchmarks(
+    workloads: list[str] | None = None,
+    requests: int = 100,
+    concurrency: int = 10,
+    latency: float = 0.0,
+    chunk_latency: float = 0.0,
+    recordings: str | None = None,
+    rate_limit: bool = False,
+) -> list[BenchmarkResult]:
+    workloads = workloads or WORKLOADS
+    if unknown := set(workloads) - set(WORKLOAD_RUNNERS):
+        raise ValueError(
+            f"Unknown workloads {sorted(unknown)}, choose from {WORKLOADS}"
+        )
+
+    results = []
+    with MockChatServer(
+        recordings=recordings,
+        responder=benchmark_responder,
+        latency=latency,
+        chunk_latency=chunk_latency,
+    ) as server:
+        try:
+            for workload in workloads:
+                results.append(
+                    await run_workload(
+                        workload,
+                        server,
+                        requests=requests,
+                        concurrency=concurrency,
+                        rate_limit=rate_limit,
+                    )
+                )
+        finally:
+            await aclose_http_clients()
+    return results
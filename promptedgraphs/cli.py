@@ -1,4 +1,8 @@
+import asyncio
+import json
+
 import pyfiglet
+import typer
 from rich import print
 from typer import Typer
 
@@ -31,3 +35,61 @@ def main():
     print(
         "This is your default command-line interface.  Feel free to customize it as you see fit.\n"
     )
+
+
+@app.command()
+def bench(
+    workload: list[str] = typer.Option(
+        None, help="Workloads to run (default: all), may be repeated"
+    ),
+    requests: int = typer.Option(100, help="Invocations per workload"),
+    concurrency: int = typer.Option(10, help="Concurrent invocations"),
+    latency: float = typer.Option(0.0, help="Mock time-to-first-token in seconds"),
+    chunk_latency: float = typer.Option(0.0, help="Mock delay between chunks"),
+    recordings: str = typer.Option(None, help="JSONL file of recorded completions"),
+    rate_limit: bool = typer.Option(False, help="Apply client-side rate limits"),
+):
+    """Benchmarks the LLM pipelines against an offline mock backend, printing JSON"""
+    from promptedgraphs.benchmark import run_benchmarks
+
+    results = asyncio.run(
+        run_benchmarks(
+            workloads=workload,
+            requests=requests,
+            concurrency=concurrency,
+            latency=latency,
+            chunk_latency=chunk_latency,
+            recordings=recordings,
+            rate_limit=rate_limit,
+        )
+    )
+    typer.echo(json.dumps([r.dict() for r in results], indent=2))
+
+
+@app.command()
+def bench_imports(
+    module: list[str] = typer.Option(
+        None, help="Modules to import (default: the entry points), may be repeated"
+    ),
+    repeat: int = typer.Option(3, help="Fresh interpreters per module, best is kept"),
+):
+    """Measures the import time of modules and the heavy dependencies they load"""
+    from promptedgraphs.benchmark import run_import_benchmarks
+
+    results = run_import_benchmarks(modules=module, repeat=repeat)
+    typer.echo(json.dumps(results, indent=2))
+
+
+@app.command()
+def bench_schema(
+    records: int = typer.Option(1_000_000, help="Records of the synthetic file"),
+    workers: list[int] = typer.Option(
+        None, help="Worker counts to compare (default: 1, 2, 4, cores)"
+    ),
+    path: str = typer.Option(None, help="Benchmark an existing JSONL file instead"),
+):
+    """Measures the speedup of parallel schema inference on a large JSONL file"""
+    from promptedgraphs.benchmark import run_schema_benchmark
+
+    results = run_schema_benchmark(records=records, workers=workers, path=path)
+    typer.echo(json.dumps(results, indent=2))
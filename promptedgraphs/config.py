@@ -1,16 +1,31 @@
 """Loads the configuration file for the QuantReady package."""
+
 # Load the configuration file
+import asyncio
+import importlib.util
 import os
 import re
+import weakref
 from dataclasses import dataclass, field
+from logging import getLogger
 from pathlib import Path
 
+import httpx
 from dotenv import load_dotenv
 
 from promptedgraphs import __description__ as description
 from promptedgraphs import __title__ as name
 from promptedgraphs import __version__ as version
 
+logger = getLogger(__name__)
+
+# Pooled clients are bound to the event loop that created their connections
+_http_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _env_flag(key: str, default: str = "false") -> bool:
+    return os.getenv(key, default).strip().lower() in {"1", "true", "yes", "on"}
+
 
 @dataclass
 class Config:
@@ -25,6 +40,56 @@ class Config:
     ogtags_api_key: str | None = field(
         default_factory=lambda: os.getenv("OGTAGS_API_KEY")
     )
+    # Any OpenAI-compatible API, e.g. `promptedgraphs.llms.mock_server`
+    openai_base_url: str = field(
+        default_factory=lambda: os.getenv(
+            "OPENAI_BASE_URL", "https://api.openai.com/v1"
+        )
+    )
+    http_max_connections: int = field(
+        default_factory=lambda: int(
+            os.getenv("PROMPTEDGRAPHS_HTTP_MAX_CONNECTIONS", 100)
+        )
+    )
+    http_max_keepalive_connections: int = field(
+        default_factory=lambda: int(
+            os.getenv("PROMPTEDGRAPHS_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+        )
+    )
+    http_keepalive_expiry: float = field(
+        default_factory=lambda: float(
+            os.getenv("PROMPTEDGRAPHS_HTTP_KEEPALIVE_EXPIRY", 30.0)
+        )
+    )
+    http2: bool = field(default_factory=lambda: _env_flag("PROMPTEDGRAPHS_HTTP2"))
+    llm_cache_path: str | None = field(
+        default_factory=lambda: os.getenv("PROMPTEDGRAPHS_CACHE_PATH")
+    )
+    llm_cache_ttl: float | None = field(
+        default_factory=lambda: float(os.getenv("PROMPTEDGRAPHS_CACHE_TTL"))
+        if os.getenv("PROMPTEDGRAPHS_CACHE_TTL")
+        else None
+    )
+    llm_cache_max_entries: int | None = field(
+        default_factory=lambda: int(
+            os.getenv("PROMPTEDGRAPHS_CACHE_MAX_ENTRIES", 100_000)
+        )
+    )
+    rate_limit_enabled: bool = field(
+        default_factory=lambda: _env_flag("PROMPTEDGRAPHS_RATE_LIMIT", "true")
+    )
+    rate_limit_rpm: int | None = field(
+        default_factory=lambda: int(os.getenv("PROMPTEDGRAPHS_RATE_LIMIT_RPM", 0))
+        or None
+    )
+    rate_limit_tpm: int | None = field(
+        default_factory=lambda: int(os.getenv("PROMPTEDGRAPHS_RATE_LIMIT_TPM", 0))
+        or None
+    )
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Returns the process-wide pooled HTTP client for these pool settings"""
+        return get_http_client(self)
 
     def __repr__(self):
         # Mask the value of openai_api_key
@@ -57,3 +122,50 @@ def load_config() -> Config:
         description=description,
         version=version,
     )
+
+
+def get_http_client(config: Config | None = None) -> httpx.AsyncClient:
+    """Returns a shared, connection-pooled `httpx.AsyncClient`.
+
+    One client is kept per event loop and pool configuration so keep-alive
+    connections (and HTTP/2 streams) are reused across requests.
+    Must be called from within a running event loop.
+    """
+    config = config or Config()
+    loop = asyncio.get_running_loop()
+
+    http2 = config.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but the `h2` package is not installed")
+        http2 = False
+
+    key = (
+        config.http_max_connections,
+        config.http_max_keepalive_connections,
+        config.http_keepalive_expiry,
+        http2,
+    )
+    clients = _http_clients.setdefault(loop, {})
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        client = clients[key] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.http_max_connections,
+                max_keepalive_connections=config.http_max_keepalive_connections,
+                keepalive_expiry=config.http_keepalive_expiry,
+            ),
+            http2=http2,
+            timeout=None,
+        )
+    return client
+
+
+async def aclose_http_clients():
+    """Closes the pooled HTTP clients bound to the running event loop.
+
+    Call this before the event loop shuts down, e.g. at the end of `main()`.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _http_clients.pop(loop, {})
+    for client in clients.values():
+        await client.aclose()
@@ -10,6 +10,7 @@ Base case:
 import contextlib
 import json
 import re
+from logging import getLogger
 
 from pydantic import BaseModel
 
@@ -19,7 +20,9 @@ from promptedgraphs.llms.openai_streaming import (
     streaming_chat_completion_request,
 )
 from promptedgraphs.models import ChatMessage
-from promptedgraphs.parsers import extract_partial_list
+from promptedgraphs.parsers import StreamingListParser
+
+logger = getLogger(__name__)
 
 SYSTEM_MESSAGE = """
 You are a Qualitative User Researcher and Linguist. Your task is to extract structured data from text to be passed into python's `{name}(BaseModel)` pydantic class.
@@ -212,6 +215,7 @@ async def extract_data(
 
     count = 0
     payload = ""
+    parser = StreamingListParser(key=fn_name)
     async for msg in streaming_chat_completion_request(
         messages=messages,
         functions=functions,
@@ -246,10 +250,10 @@ async def extract_data(
 
             break
 
-        # TODO try catch for malformed json
         if msg.event == "error":
-            print("ERROR", msg.data)
-            break
+            # Transient failures were already retried by the streaming request
+            logger.error(f"Extraction request failed: {msg.data}")
+            raise ValueError(f"Extraction request failed: {msg.data}")
 
         data = json.loads(msg.data)
 
@@ -259,15 +263,10 @@ async def extract_data(
 
         delta = choices[0].get("delta")
 
-        # TODO rewrite this to be more robust streaming json parser
-        payload += delta.get("function_call", {}).get("arguments", "")
+        arguments = delta.get("function_call", {}).get("arguments", "")
+        payload += arguments
 
         if is_parent_list:
-            s = extract_partial_list(payload, key=fn_name)
-            if s is None or len(s) == 0 or len(s) <= count:
-                continue
-
-            for data in s[count:]:
+            for data in parser.feed(arguments):
                 yield output_type(**remove_nas(data))
-
-            count = len(s)
+                count += 1
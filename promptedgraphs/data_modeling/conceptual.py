@@ -21,9 +21,11 @@ from promptedgraphs.generation.schema_from_model import schema_from_model
 from promptedgraphs.llms.chat import Chat
 from promptedgraphs.llms.openai_chat import LanguageModel
 from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import track_usage
 from promptedgraphs.models import ChatMessage
 from promptedgraphs.normalization.object_to_data import object_to_data
 from promptedgraphs.normalization.vis_graphs import data_graph_as_markdown
+from promptedgraphs.tracing import traced
 
 
 domain_model_system_message = """
@@ -236,6 +238,8 @@ class EntityRelationshipDiagram(BaseModel):
     diagram_name: Optional[str] = None
     description: Optional[str] = None
 
+@traced()
+@track_usage("data_modeling")
 async def data_graph_to_domain_model(
     g: nx.DiGraph | nx.MultiDiGraph,
     model=LanguageModel.GPT35_turbo,
@@ -269,7 +273,8 @@ async def data_graph_to_domain_model(
     if len(domain_models):
         domain_model = await object_to_data(
             domain_models[0],
-            data_model=DomainDrivenDesignModel
+            data_model=DomainDrivenDesignModel,
+            chat=chat,
         )
     else:
         domain_model = None
@@ -306,7 +311,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     if len(domain_models):
         domain_model = await object_to_data(
             new_domain_models[0],
-            data_model=DomainDrivenDesignModel
+            data_model=DomainDrivenDesignModel,
+            chat=chat,
         )
     else:
         domain_model = None
@@ -315,6 +321,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     return domain_model
 
 
+@traced()
+@track_usage("data_modeling")
 async def data_graph_to_taxonomy(
     data_graph: nx.DiGraph | nx.MultiDiGraph,
     model=LanguageModel.GPT35_turbo,
@@ -348,7 +356,8 @@ async def data_graph_to_taxonomy(
     if len(taxonomies):
         taxonomy = await object_to_data(
             taxonomies[0],
-            data_model=Taxonomy
+            data_model=Taxonomy,
+            chat=chat,
         )
     else:
         taxonomy = None
@@ -384,7 +393,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     if len(taxonomies):
         new_taxonomy = await object_to_data(
             new_taxonomies[0],
-            data_model=Taxonomy
+            data_model=Taxonomy,
+            chat=chat,
         )
     else:
         new_taxonomy = None
@@ -392,6 +402,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     return new_taxonomy
 
 
+@traced()
+@track_usage("data_modeling")
 async def build_ontology(
     data_graph: nx.DiGraph | nx.MultiDiGraph,
     domain_model: DomainDrivenDesignModel = None,
@@ -437,7 +449,8 @@ async def build_ontology(
     else:
         ontology = await object_to_data(
             ontologies[0],
-            data_model=Ontology
+            data_model=Ontology,
+            chat=chat,
         )
     if not reflect:
         usage.end()
@@ -471,7 +484,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     if len(new_ontologies):
         new_ontology = await object_to_data(
             new_ontologies[0],
-            data_model=Ontology
+            data_model=Ontology,
+            chat=chat,
         )
     else:
         new_ontology = None
@@ -479,6 +493,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     return new_ontology
 
 
+@traced()
+@track_usage("data_modeling")
 async def build_entity_relationship_graph(
     data_graph: nx.DiGraph | nx.MultiDiGraph,
     domain_model: DomainDrivenDesignModel = None,
@@ -522,7 +538,8 @@ async def build_entity_relationship_graph(
     if len(ergs):
         erg = await object_to_data(
             ergs[0],
-            data_model=EntityRelationshipDiagram
+            data_model=EntityRelationshipDiagram,
+            chat=chat,
         )
     else:
         erg = None
@@ -558,7 +575,8 @@ First provide an explanation, than the corrected JSON object.""".strip()
     if len(new_ergs):
         new_erg = await object_to_data(
             new_ergs[0],
-            data_model=EntityRelationshipDiagram
+            data_model=EntityRelationshipDiagram,
+            chat=chat,
         )
     else:
         new_erg = None
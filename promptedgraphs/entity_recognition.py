@@ -29,18 +29,17 @@ Ideal case:
 
 import contextlib
 import json
-import re
-
-import tiktoken
 
+from promptedgraphs.alignment import align_entities
 from promptedgraphs.config import Config
 from promptedgraphs.llms.openai_streaming import (
     GPT_MODEL,
     streaming_chat_completion_request,
 )
+from promptedgraphs.llms.tokens import count_tokens
 from promptedgraphs.llms.usage import Usage
 from promptedgraphs.models import ChatMessage, EntityReference
-from promptedgraphs.parsers import extract_partial_list
+from promptedgraphs.parsers import StreamingListParser
 
 # Name and description of entity types
 
@@ -134,17 +133,15 @@ def build_function_spec(
     return spec
 
 
-def _format_entities(s, text):
-    for entity in s:
-        if entity["is_entity"]:
-            for match in re.finditer(entity["text_span"], text):
-                yield EntityReference(
-                    start=match.start(),
-                    end=match.end(),
-                    text=entity["text_span"],
-                    label=entity["label"],
-                    reason=entity.get("reason"),
-                )
+def _format_entities(s, text) -> list[EntityReference]:
+    return align_entities(
+        text,
+        [
+            (entity["text_span"], entity["label"], entity.get("reason"))
+            for entity in s
+            if entity.get("is_entity") and isinstance(entity.get("text_span"), str)
+        ],
+    )
 
 
 async def extract_entities(
@@ -175,6 +172,7 @@ async def extract_entities(
 
     count = 0
     payload = ""
+    parser = StreamingListParser(key=name)
     usage = Usage(model=model)
     usage.start()
     async for msg in streaming_chat_completion_request(
@@ -183,16 +181,13 @@ async def extract_entities(
         model=model,
         config=config,
         temperature=temperature,
+        usage=usage,
     ):
         if msg.data is None or msg.data == "":
             continue
 
         if msg.data == "[DONE]":
-            try:
-                encoding = tiktoken.encoding_for_model(model)
-            except KeyError:
-                encoding = tiktoken.get_encoding("cl100k_base")
-            usage.completion_tokens += len(encoding.encode(payload))
+            usage.completion_tokens += count_tokens(payload, model)
             with contextlib.suppress(json.decoder.JSONDecodeError):
                 s = json.loads(payload).get(name, [])
                 for entity in _format_entities(s[count:], text):
@@ -200,6 +195,10 @@ async def extract_entities(
 
             break
 
+        if msg.event == "error":
+            # Transient failures were already retried by the streaming request
+            raise ValueError(f"Entity recognition request failed: {msg.data}")
+
         # TODO try catch for malformed json
         data = json.loads(msg.data)
 
@@ -214,15 +213,15 @@ async def extract_entities(
 
         delta = choices[0].get("delta")
 
-        # TODO rewrite this to be more robust streaming json parser
-        payload += delta.get("function_call", {}).get("arguments", "")
-        s = extract_partial_list(payload, key=name)
-        if s is None or len(s) == 0 or len(s) <= count:
+        arguments = delta.get("function_call", {}).get("arguments", "")
+        payload += arguments
+        s = parser.feed(arguments)
+        if not s:
             continue
 
-        for entity in _format_entities(s[count:], text):
+        for entity in _format_entities(s, text):
             yield entity
-        count = len(s)
+        count += len(s)
 
     usage.end()  # calculates cost and time
     yield usage
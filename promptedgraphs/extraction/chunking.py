@@ -0,0 +1,71 @@
+"""Token-aware splitting of long documents into overlapping chunks
+
+Chunks keep the character offsets of their text in the original document so
+results extracted from a chunk (e.g. entity spans) can be mapped back.
+"""
+from dataclasses import dataclass
+from logging import getLogger
+
+import tiktoken
+
+from promptedgraphs.llms.tokens import CHARS_PER_TOKEN, get_encoding
+
+logger = getLogger(__name__)
+
+DEFAULT_CHUNK_TOKENS = 3_000
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+@dataclass
+class TextChunk:
+    text: str
+    start: int  # character offset of `text` in the original document
+    end: int
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    model=None,
+    encoding: tiktoken.Encoding | None = None,
+) -> list[TextChunk]:
+    """Splits `text` into chunks of at most `max_tokens` tokens where consecutive
+    chunks share `overlap` tokens, so items straddling a boundary are seen whole
+    by at least one chunk."""
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be at least 1")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be non-negative and less than max_tokens")
+
+    # Tokens never outnumber the UTF-8 bytes, so short texts skip the tokenizer
+    if len(text.encode()) <= max_tokens:
+        return [TextChunk(text=text, start=0, end=len(text))]
+
+    if encoding is None:
+        try:
+            encoding = get_encoding(model)
+        except OSError as e:
+            logger.warning(f"Tokenizer unavailable, chunking by characters: {e}")
+
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        # Character offset at which each token starts
+        _, offsets = encoding.decode_with_offsets(tokens)
+    else:  # approximate tokens as fixed runs of characters
+        offsets = list(range(0, len(text), CHARS_PER_TOKEN))
+    if len(offsets) <= max_tokens:
+        return [TextChunk(text=text, start=0, end=len(text))]
+    offsets.append(len(text))
+
+    chunks = []
+    n_tokens = len(offsets) - 1
+    step = max_tokens - overlap
+    for i in range(0, n_tokens, step):
+        j = min(i + max_tokens, n_tokens)
+        start, end = offsets[i], offsets[j]
+        if end > start:
+            chunks.append(TextChunk(text=text[start:end], start=start, end=end))
+        if j == n_tokens:
+            break
+    return chunks
@@ -1,16 +1,28 @@
 import asyncio
 import json
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Iterable
+from functools import lru_cache
 from logging import getLogger
 from typing import AsyncGenerator
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from promptedgraphs.config import Config, load_config
+from promptedgraphs.extraction.chunking import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_TOKENS,
+    chunk_text,
+)
 from promptedgraphs.generation.schema_from_model import schema_from_model
-from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.chat import Chat, billed_usage
 from promptedgraphs.llms.openai_chat import LanguageModel
+from promptedgraphs.llms.router import get_model_spec
+from promptedgraphs.llms.tokens import count_tokens
 from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import track_usage
 from promptedgraphs.models import ChatMessage
+from promptedgraphs.tracing import traced
 
 logger = getLogger(__name__)
 
@@ -45,7 +57,30 @@ MESSAGE_TEMPLATE = """
 ## JSON list of extracted data
 """
 
+PACKED_SYSTEM_MESSAGE = """
+You will be given several documents, each wrapped in a <document id="..."> tag.
+Extract data from each document independently.
+Return a JSON object mapping every document id to the list of data extracted from that document, e.g. {"D0": [...], "D1": []}.
+Include every document id and use an empty list when a document contains no data.
+"""
+
+PACKED_MESSAGE_TEMPLATE = """
+## Extract data from each of these documents:
+
+{documents}
+
+## JSON object mapping each document id to its list of extracted data
+"""
+
+DOCUMENT_TEMPLATE = """<document id="{id}">
+{text}
+</document>"""
+
+# Output budget of a packed request, the same as of a single extraction
+PACK_OUTPUT_TOKENS = 4_096
 
+
+@traced()
 async def extraction_chat(
     text: str,
     chat: Chat = None,
@@ -56,7 +91,7 @@ async def extraction_chat(
     force_json: bool = True,
     **chat_kwargs,
 ) -> list[BaseModel] | list[str]:
-    usage = usage or Usage()
+    usage = usage or Usage(model=chat.chat.model)
 
     messages = [{"role": "system", "content": system_message.strip()}]
     messages.extend(message_history or [])
@@ -72,11 +107,13 @@ async def extraction_chat(
         default_chat_args["response_format"] = {"type": "json_object"}
 
     response = await chat.chat_completion(
-        messages=messages, **default_chat_args | chat_kwargs
+        messages=messages, usage=usage, **default_chat_args | chat_kwargs
     )
-    if hasattr(response, "usage"):
-        usage.completion_tokens = getattr(response.usage, "completion_tokens") or 0
-        usage.prompt_tokens = getattr(response.usage, "prompt_tokens") or 0
+    if response_usage := billed_usage(response):
+        usage.update(
+            prompt_tokens=response_usage.prompt_tokens,
+            completion_tokens=response_usage.completion_tokens,
+        )
 
     # TODO check if the results stopped early, in that case, the list might be truncated
     if force_json:
@@ -91,6 +128,11 @@ async def extraction_chat(
     return results if isinstance(results, list) else [results]
 
 
+# extraction_chat is shared with the data modeling stages, which label their
+# calls with their own stage, so only the calls made here are labelled
+_tracked_extraction_chat = track_usage("extraction", "extraction_chat")(extraction_chat)
+
+
 async def _extract_data_from_text(
     text: str,
     output_type: BaseModel | None = None,
@@ -106,35 +148,15 @@ async def _extract_data_from_text(
 
     usage = usage or Usage(model)
 
-    # Make a list out of the output type
-    class StructuredData(BaseModel):
-        items: list[output_type]
-
-    schema = schema_from_model(StructuredData)
-
     chat = Chat(
         config=config or Config(),
         model=model,
     )
 
-    # Format System Message
-    item_schema = output_type.model_json_schema()
-    labels = item_schema.get("properties", {})
-    label_list = sorted(labels.keys())
-    system_message = SYSTEM_MESSAGE.format(
-        name=item_schema.get("title", "DataModel"),
-        description=item_schema.get("description", ""),
-        label_definitions="\n".join(
-            [f" * {label}: {labels[label]}" for label in label_list]
-        ),
-        schema=json.dumps(schema, indent=4),
-    )
-
-    # async def call_brainstorming_chat():
-    results = await extraction_chat(
+    results = await _tracked_extraction_chat(
         text=text,
         chat=chat,
-        system_message=system_message,
+        system_message=get_extractor(output_type).system_message,
         temperature=temperature,
         usage=usage,
     )
@@ -142,6 +164,166 @@ async def _extract_data_from_text(
         yield result
 
 
+class CompiledExtractor:
+    """The prompt and schema artifacts of extracting `output_type`, built once.
+
+    Holds the list wrapper model, its schema, the rendered system message and
+    a `TypeAdapter` validating each extracted item, so a call only has to
+    format its user message.  Use `get_extractor` to share instances.
+    """
+
+    def __init__(self, output_type: type[BaseModel], template: str = SYSTEM_MESSAGE):
+        self.output_type = output_type
+        self.template = template
+
+        # Make a list out of the output type
+        class StructuredData(BaseModel):
+            items: list[output_type]
+
+        self.structured_model = StructuredData
+        self.schema = schema_from_model(StructuredData)
+        self.adapter = TypeAdapter(output_type)
+
+        # Format System Message
+        item_schema = output_type.model_json_schema()
+        labels = item_schema.get("properties", {})
+        label_list = sorted(labels.keys())
+        self.system_message = template.format(
+            name=item_schema.get("title", "DataModel"),
+            description=item_schema.get("description", ""),
+            label_definitions="\n".join(
+                [f" * {label}: {labels[label]}" for label in label_list]
+            ),
+            schema=json.dumps(self.schema, indent=4),
+        )
+        self.packed_system_message = self.system_message.strip() + PACKED_SYSTEM_MESSAGE
+        self._system_tokens: dict[tuple[str, bool], int] = {}
+
+    def system_tokens(self, model=LanguageModel.GPT35_turbo, packed=False) -> int:
+        """Tokens of the (packed) system message, counted once per model"""
+        key = (getattr(model, "value", model), packed)
+        if key not in self._system_tokens:
+            message = self.packed_system_message if packed else self.system_message
+            self._system_tokens[key] = count_tokens(message.strip(), model)
+        return self._system_tokens[key]
+
+    def validate(self, items: list[dict], skip_errors: bool = False) -> list[BaseModel]:
+        """Validates the extracted items one by one, dropping empty ones.
+        An invalid item raises its `ValidationError`, or is logged and skipped
+        with `skip_errors` so the valid items are kept."""
+        valid = []
+        for item in items:
+            if not item:
+                continue
+            try:
+                valid.append(self.adapter.validate_python(item))
+            except ValidationError as e:
+                if not skip_errors:
+                    raise
+                logger.warning(f"Skipping an invalid {self.output_type.__name__}: {e}")
+        return valid
+
+
+@lru_cache(maxsize=256)
+def get_extractor(
+    output_type: type[BaseModel], template: str = SYSTEM_MESSAGE
+) -> CompiledExtractor:
+    """Returns the shared `CompiledExtractor` of an output type and template"""
+    return CompiledExtractor(output_type, template)
+
+
+def _document_id(index: int) -> str:
+    return f"D{index}"
+
+
+def _document_tokens(index: int, text: str, model) -> int:
+    """Prompt tokens taken by a document in a packed request"""
+    block = DOCUMENT_TEMPLATE.format(id=_document_id(index), text=text or "")
+    return count_tokens(block, model)
+
+
+def _pack_tokens(output_type: type[BaseModel], model, pack_tokens: int) -> int:
+    """`pack_tokens`, capped to the document tokens the context window of
+    `model` leaves next to the packed system message and the output"""
+    spec = get_model_spec(model)
+    if spec is None:
+        return pack_tokens
+    available = (
+        spec.context_window
+        - get_extractor(output_type).system_tokens(model, packed=True)
+        - count_tokens(PACKED_MESSAGE_TEMPLATE.format(documents=""), model)
+        - PACK_OUTPUT_TOKENS
+    )
+    return max(min(pack_tokens, available), 1)
+
+
+def _output_tokens(document_tokens: int) -> int:
+    """Expected output tokens of a document, its extracted data restates the
+    text as JSON, padded by 2x"""
+    return 2 * document_tokens
+
+
+@track_usage("extraction")
+async def _extract_packed_data(
+    documents: list[tuple[int, str]],
+    output_type: type[BaseModel],
+    temperature: float = 0.0,
+    model: str = LanguageModel.GPT35_turbo,
+    config: Config = None,
+    usage: Usage = None,
+    skip_errors: bool = False,
+) -> dict[int, list[BaseModel]]:
+    """Extracts data from several documents in one request.
+
+    Returns the items of each document keyed by its index; documents the model
+    skipped (or answered with something other than a list) are left out.
+    Invalid items are skipped with `skip_errors`, otherwise they raise.
+    """
+    usage = usage or Usage(model)
+    chat = Chat(config=config or Config(), model=model)
+    system_message = get_extractor(output_type).packed_system_message
+    message = PACKED_MESSAGE_TEMPLATE.format(
+        documents="\n\n".join(
+            DOCUMENT_TEMPLATE.format(id=_document_id(index), text=text or "")
+            for index, text in documents
+        )
+    )
+    response = await chat.chat_completion(
+        messages=[
+            {"role": "system", "content": system_message.strip()},
+            {"role": "user", "content": message.strip()},
+        ],
+        usage=usage,
+        max_tokens=PACK_OUTPUT_TOKENS,
+        temperature=temperature,
+        response_format={"type": "json_object"},
+    )
+    if response_usage := billed_usage(response):
+        usage.update(
+            prompt_tokens=response_usage.prompt_tokens,
+            completion_tokens=response_usage.completion_tokens,
+        )
+
+    try:
+        results = json.loads(response.choices[0].message.content)
+    except (json.JSONDecodeError, TypeError):
+        logger.warning("Packed extraction returned invalid JSON")
+        return {}
+    if not isinstance(results, dict):
+        return {}
+
+    extracted = {}
+    for index, _ in documents:
+        items = results.get(_document_id(index))
+        if isinstance(items, dict):
+            items = items.get("items", [items])
+        if isinstance(items, list):
+            extracted[index] = get_extractor(output_type).validate(
+                [item for item in items if isinstance(item, dict)], skip_errors
+            )
+    return extracted
+
+
 async def data_from_text(
     text: str,
     output_type: type[BaseModel] | BaseModel | str | None = None,
@@ -149,20 +331,253 @@ async def data_from_text(
     model: str = LanguageModel.GPT35_turbo,
     config: Config = None,
     usage: Usage = None,
+    chunk_tokens: int | None = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    max_workers: int = 5,
+    skip_errors: bool = False,
 ) -> AsyncGenerator[BaseModel, BaseModel] | AsyncGenerator[str, str]:
+    """Extracts a list of `output_type` items from `text`.
+
+    Texts longer than `chunk_tokens` tokens are split into overlapping chunks
+    which are extracted concurrently (at most `max_workers` at a time); the
+    results are yielded in document order with duplicates removed.
+    Set `chunk_tokens=None` to always send the whole text.
+
+    Items are validated one by one; with `skip_errors` an invalid item (or a
+    failed chunk) is logged and skipped instead of raising.
+    """
     usage = usage or Usage(model)
-    async for result in _extract_data_from_text(
-        text,
-        temperature=temperature,
+    chunks = (
+        chunk_text(text, chunk_tokens, chunk_overlap, model) if chunk_tokens else []
+    )
+    if len(chunks) > 1:
+        logger.info(f"Extracting from {len(chunks)} chunks of {chunk_tokens} tokens")
+        seen = set()
+        async for _, item in data_from_texts(
+            [chunk.text for chunk in chunks],
+            output_type=output_type,
+            temperature=temperature,
+            model=model,
+            config=config,
+            usage=usage,
+            max_workers=max_workers,
+            preserve_order=True,
+            skip_errors=skip_errors,
+            chunk_tokens=None,
+        ):
+            # Items inside the overlap of two chunks are usually extracted twice
+            key = item.model_dump_json()
+            if key not in seen:
+                seen.add(key)
+                yield item
+        return
+
+    results = [
+        result
+        async for result in _extract_data_from_text(
+            text,
+            temperature=temperature,
+            output_type=output_type,
+            model=model,
+            config=config,
+            usage=usage,
+        )
+    ]
+    # TODO heal the data if it cannot be parsed
+    for item in get_extractor(output_type).validate(results, skip_errors):
+        yield item
+
+
+async def _documents(
+    texts: AsyncIterable[str] | Iterable[str],
+) -> AsyncGenerator[tuple[int, str], None]:
+    """The texts with their positions"""
+    index = 0
+    if isinstance(texts, AsyncIterable):
+        async for text in texts:
+            yield index, text
+            index += 1
+    else:
+        for index, text in enumerate(texts):
+            yield index, text
+
+
+async def _build_packs(
+    documents: AsyncIterable[tuple[int, str]],
+    model,
+    pack_tokens: int,
+    pack_size: int = 20,
+) -> AsyncGenerator[list[tuple[int, str]], None]:
+    """Greedily packs consecutive documents into requests of at most
+    `pack_size` documents, `pack_tokens` document tokens and an expected
+    output of `PACK_OUTPUT_TOKENS`.  A document over budget is a pack of its
+    own.  Documents are read lazily, at most one past the pack yielded."""
+    pack, budget, output = [], pack_tokens, PACK_OUTPUT_TOKENS
+    async for document in documents:
+        cost = _document_tokens(*document, model)
+        if pack and (cost > budget or _output_tokens(cost) > output):
+            yield pack
+            pack, budget, output = [], pack_tokens, PACK_OUTPUT_TOKENS
+        pack.append(document)
+        budget -= cost
+        output -= _output_tokens(cost)
+        if len(pack) == pack_size:
+            yield pack
+            pack, budget, output = [], pack_tokens, PACK_OUTPUT_TOKENS
+    if pack:
+        yield pack
+
+
+async def data_from_texts(
+    texts: AsyncIterable[str] | Iterable[str],
+    output_type: type[BaseModel] | BaseModel | str | None = None,
+    temperature: float = 0.0,
+    model: str = LanguageModel.GPT35_turbo,
+    config: Config = None,
+    usage: Usage = None,
+    max_workers: int = 10,
+    preserve_order: bool = False,
+    skip_errors: bool = False,
+    chunk_tokens: int | None = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    pack_tokens: int | None = None,
+    pack_size: int = 20,
+) -> AsyncGenerator[tuple[int, BaseModel], None]:
+    """Extracts data from a stream of texts with at most `max_workers` in flight.
+
+    Yields `(index, item)` pairs where `index` is the position of the text in
+    `texts`, as soon as each text is processed, or in input order when
+    `preserve_order` is set.  Texts are read lazily, so memory stays flat for
+    arbitrarily large corpora.  Token counts of every call are added to `usage`.
+    Closing the generator (or cancelling its consumer) cancels pending work.
+    With `skip_errors` failed texts and invalid items are logged and skipped.
+
+    With `pack_tokens` set, consecutive short texts are packed into one request
+    of up to `pack_size` documents and `pack_tokens` document tokens (capped
+    to what fits the context window of `model`), sharing the system message
+    and schema.  Packs are also limited to the documents
+    whose expected output fits `PACK_OUTPUT_TOKENS`.  Documents the model
+    skips, or all documents of a failed pack, are retried on their own.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    usage = usage or Usage(model)
+    options = dict(
         output_type=output_type,
+        temperature=temperature,
         model=model,
-        config=config,
-        usage=usage,
-    ):
-        # TODO heal the data if it cannot be parsed
-        if not result:
-            continue
-        yield output_type(**result)
+        config=config or Config(),
+    )
+    text_options = dict(options, chunk_tokens=chunk_tokens, chunk_overlap=chunk_overlap)
+    source = _documents(texts)
+    packs = (
+        _build_packs(
+            source, model, _pack_tokens(output_type, model, pack_tokens), pack_size
+        )
+        if pack_tokens
+        else ([document] async for document in source)
+    )
+    jobs = (
+        _extract_text(*pack[0], usage, skip_errors, **text_options)
+        if len(pack) == 1
+        else _extract_pack(pack, usage, skip_errors, text_options, **options)
+        async for pack in packs
+    )
+    try:
+        async for results in _bounded(jobs, max_workers, preserve_order):
+            for index, items in results:
+                for item in items:
+                    yield index, item
+    finally:
+        await packs.aclose()
+        await source.aclose()
+
+
+async def _extract_text(
+    index: int, text: str, usage: Usage, skip_errors: bool, **options
+) -> list[tuple[int, list[BaseModel]]]:
+    """The items of one text, none when it fails and `skip_errors` is set"""
+    text_usage = Usage(usage.model)
+    try:
+        items = [
+            item
+            async for item in data_from_text(
+                text, usage=text_usage, skip_errors=skip_errors, **options
+            )
+        ]
+    except Exception as e:
+        if not skip_errors:
+            raise
+        logger.warning(f"Extraction of text {index} failed: {e}")
+        items = []
+    finally:
+        usage.add(text_usage)
+    return [(index, items)]
+
+
+async def _extract_pack(
+    documents: list[tuple[int, str]],
+    usage: Usage,
+    skip_errors: bool,
+    text_options: dict,
+    **options,
+) -> list[tuple[int, list[BaseModel]]]:
+    """The items of a pack of documents; the documents the packed request
+    skipped, or all of them when it fails, are extracted on their own with
+    `text_options`"""
+    pack_usage = Usage(usage.model)
+    try:
+        results = await _extract_packed_data(
+            documents, usage=pack_usage, skip_errors=skip_errors, **options
+        )
+    except Exception as e:
+        logger.warning(f"Extraction of a pack of {len(documents)} texts failed: {e}")
+        results = {}
+    finally:
+        usage.add(pack_usage)
+    if skipped := [(i, text) for i, text in documents if i not in results]:
+        logger.info(f"Retrying {len(skipped)} skipped documents on their own")
+        for retried in await asyncio.gather(
+            *(_extract_text(*d, usage, skip_errors, **text_options) for d in skipped)
+        ):
+            results.update(retried)
+    return sorted(results.items())
+
+
+async def _bounded(
+    jobs: AsyncIterator[Awaitable[list[tuple[int, list[BaseModel]]]]],
+    max_workers: int,
+    preserve_order: bool,
+) -> AsyncGenerator[list[tuple[int, list[BaseModel]]], None]:
+    """Runs `jobs` with at most `max_workers` in flight, yielding the results
+    of the jobs done together sorted by index as they complete, or job by job
+    with `preserve_order`.  Jobs are read lazily and the pending ones are
+    cancelled when the generator is closed."""
+    tasks: deque[asyncio.Task] = deque()
+
+    async def fill():
+        while len(tasks) < max_workers and (job := await anext(jobs, None)):
+            tasks.append(asyncio.create_task(job))
+
+    try:
+        await fill()
+        while tasks:
+            if preserve_order:
+                done = [tasks.popleft()]
+                await asyncio.wait(done)
+            else:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+            results = [result for task in done for result in task.result()]
+            # Keep the workers busy while the consumer handles the results
+            await fill()
+            yield sorted(results, key=lambda r: r[0])
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await jobs.aclose()
 
 
 async def example():
@@ -1,46 +1,54 @@
 import asyncio
-import re
-from typing import AsyncGenerator, Iterator
+from functools import lru_cache
+from typing import AsyncGenerator
 
 from pydantic import BaseModel, Field
 
+from promptedgraphs.alignment import align_entities
 from promptedgraphs.config import Config, load_config
-from promptedgraphs.extraction.data_from_text import data_from_text
+from promptedgraphs.extraction.chunking import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_TOKENS,
+    TextChunk,
+    chunk_text,
+)
+from promptedgraphs.extraction.data_from_text import data_from_texts
 from promptedgraphs.llms.openai_chat import LanguageModel
 from promptedgraphs.llms.usage import Usage
 from promptedgraphs.models import EntityReference
 
 
 def _format_entities(
-    entity: BaseModel, text: str, include_reason=False
-) -> Iterator[EntityReference]:
-    if isinstance(entity, Usage):
-        yield entity
-        return
-    if entity.is_entity:
-        for m in re.finditer(entity.text_span, text):
-            yield EntityReference(
-                start=m.start(),
-                end=m.end(),
-                text=entity.text_span,
-                label=entity.label,
-                reason=entity.reason if include_reason else None,
-            )
+    entities: list[BaseModel],
+    text: str,
+    include_reason=False,
+    offset: int = 0,
+    fuzzy: bool = False,
+) -> list[EntityReference]:
+    """Locates the mentions of `entities` in `text`, a chunk starting at `offset`
+    characters into the original document"""
+    return align_entities(
+        text,
+        [
+            (e.text_span, e.label, e.reason if include_reason else None)
+            for e in entities
+            if e.is_entity
+        ],
+        offset=offset,
+        fuzzy=fuzzy,
+    )
 
 
-async def entities_from_text(
-    text: str,
-    labels: dict[str, str],
-    config: Config,
-    name="entities",
+@lru_cache(maxsize=256)
+def entity_mention_model(
+    labels: tuple[tuple[str, str], ...],
+    name: str | None = "entities",
     description: str | None = "",
-    include_reason=True,
-    model=LanguageModel.GPT35_turbo,
-    temperature=0.2,
-    usage: Usage = None,
-) -> AsyncGenerator[EntityReference | Usage, None]:
-    usage = usage or Usage(model=model)
-    label_list = sorted(labels.keys())
+    include_reason: bool = True,
+) -> type[BaseModel]:
+    """Builds (once per arguments) the model of an entity mention with `labels`,
+    given as sorted `(label, definition)` pairs"""
+    label_list = [label for label, _ in labels]
 
     class EntityMention(BaseModel):
         """The raw text and label for each entity occurrence"""
@@ -72,18 +80,81 @@ async def entities_from_text(
     )
     EntityMention.__doc__ += """\n
     Label Definitions:\n""" + "\n".join(
-        [f" * {label}: {labels[label]}" for label in label_list]
+        [f" * {label}: {definition}" for label, definition in labels]
+    )
+    return EntityMention
+
+
+async def entities_from_text(
+    text: str,
+    labels: dict[str, str],
+    config: Config,
+    name="entities",
+    description: str | None = "",
+    include_reason=True,
+    model=LanguageModel.GPT35_turbo,
+    temperature=0.2,
+    usage: Usage = None,
+    chunk_tokens: int | None = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    max_workers: int = 5,
+    fuzzy: bool = False,
+) -> AsyncGenerator[EntityReference | Usage, None]:
+    """Labels the entity mentions in `text`.
+
+    Long texts are split into overlapping chunks of `chunk_tokens` tokens that
+    are labeled concurrently; offsets are mapped back to `text` and mentions
+    found in two overlapping chunks are only yielded once.  Mentions that the
+    model lightly edited are aligned with whitespace and case ignored, and
+    approximately when `fuzzy` is set.
+    """
+    usage = usage or Usage(model=model)
+    EntityMention = entity_mention_model(
+        tuple(sorted(labels.items())), name, description, include_reason
     )
     usage.start()
-    async for er in data_from_text(
-        text=text,
+    if chunk_tokens:
+        chunks = chunk_text(text, chunk_tokens, chunk_overlap, model)
+    else:
+        chunks = [TextChunk(text=text, start=0, end=len(text))]
+    seen = set()
+
+    def new_entities(index: int, mentions: list[BaseModel]) -> list[EntityReference]:
+        chunk = chunks[index]
+        ents = []
+        for ent in _format_entities(
+            mentions,
+            chunk.text,
+            include_reason=include_reason,
+            offset=chunk.start,
+            fuzzy=fuzzy,
+        ):
+            if (key := (ent.start, ent.end, ent.label)) not in seen:
+                seen.add(key)
+                ents.append(ent)
+        return ents
+
+    # Mentions arrive grouped by chunk, align each chunk's mentions in one pass
+    chunk_index, mentions = None, []
+    async for index, er in data_from_texts(
+        [chunk.text for chunk in chunks],
         output_type=EntityMention,
         config=config or Config(),
         model=model,
         temperature=temperature,
         usage=usage,
+        max_workers=max_workers,
+        preserve_order=True,
+        chunk_tokens=None,
     ):
-        for ent in _format_entities(er, text, include_reason=include_reason):
+        if index != chunk_index and mentions:
+            for ent in new_entities(chunk_index, mentions):
+                yield ent
+            mentions = []
+        chunk_index = index
+        mentions.append(er)
+    if mentions:
+        for ent in new_entities(chunk_index, mentions):
             yield ent
 
     usage.end()
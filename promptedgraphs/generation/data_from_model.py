@@ -8,9 +8,10 @@ from pydantic import BaseModel, Field
 
 from promptedgraphs.config import Config
 from promptedgraphs.generation.schema_from_model import schema_from_model
-from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.chat import Chat, billed_usage
 from promptedgraphs.llms.openai_chat import LanguageModel
 from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import track_usage
 
 logger = getLogger(__name__)
 
@@ -45,6 +46,7 @@ YOU MUST RETURN A JSON OBJECT!
 """
 
 
+@track_usage("generation")
 async def brainstorming_chat(
     text: str,
     chat: Chat = None,
@@ -52,6 +54,7 @@ async def brainstorming_chat(
     negative_examples: list[str | BaseModel] = None,
     batch_size: int = 10,
     system_message: str = SYSTEM_MESSAGE,
+    usage: Usage = None,
     **chat_kwargs,
 ) -> list[BaseModel] | list[str]:
     if batch_size == 1:
@@ -82,6 +85,7 @@ async def brainstorming_chat(
             {"role": "system", "content": system_message.strip()},
             {"role": "user", "content": msg.strip()},
         ],
+        usage=usage,
         **{
             **{
                 "max_tokens": 4_096,
@@ -91,6 +95,11 @@ async def brainstorming_chat(
             **chat_kwargs,
         },
     )
+    if usage is not None and (response_usage := billed_usage(response)):
+        usage.update(
+            prompt_tokens=response_usage.prompt_tokens,
+            completion_tokens=response_usage.completion_tokens,
+        )
     # TODO check if the results stopped early, in that case, the list might be truncated
     results = json.loads(response.choices[0].message.content)
     if "items" in results:
@@ -162,6 +171,7 @@ async def _brainstorm(
             batch_size=n,
             system_message=system_message,
             temperature=temperature,
+            usage=usage,
         )
         for result in results:
             yield result
@@ -176,6 +186,7 @@ async def _brainstorm(
             batch_size=batch_size,
             system_message=system_message,
             temperature=temperature,
+            usage=usage,
         )
         return results
 
@@ -1,15 +1,21 @@
+import asyncio
 import contextlib
+import hashlib
 import json
+from collections.abc import MutableMapping
+from dataclasses import dataclass
 from typing import Any, Dict, List
 
 import tqdm
 from pydantic import BaseModel, Field
 
 from promptedgraphs.generation.data_from_model import generate
-from promptedgraphs.llms.chat import Chat
-from promptedgraphs.statistical.data_analysis import (
-    can_cast_to_ints_without_losing_precision_np_updated,
+from promptedgraphs.generation.schema_inference import (  # noqa: F401
+    is_integral,
+    schema_from_data_parallel,
 )
+from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.usage_tracker import track_usage
 
 
 class JSONSchemaTitleDescription(BaseModel):
@@ -52,99 +58,193 @@ You do not need to include the path or sibling properties in the description.
 """
 
 
+@dataclass
+class _SchemaNode:
+    """An object or array of a schema awaiting a title and description"""
+
+    schema: dict
+    parent_keys: list[str]
+    sibling_properties: list[list[str]]
+    height: int = 0  # distance to the deepest descendant node
+
+
+def _schema_nodes(
+    schema: dict,
+    parent_keys: list[str],
+    sibling_properties: list[list[str]],
+    nodes: list[_SchemaNode],
+) -> int:
+    """Appends the object and array nodes of `schema` to `nodes`, children
+    first, and returns the height of `schema` (-1 for leaves)"""
+    if schema.get("type") not in ("object", "array"):
+        return -1
+    height = 0
+    if schema.get("type") == "array":
+        items_height = _schema_nodes(schema.get("items", {}), parent_keys, [], nodes)
+        height = max(height, items_height + 1)
+
+    properties = schema.get("properties", {})
+    for key, value in properties.items():
+        siblings = [parent_keys + [p] for p in properties if p != key]
+        child_height = _schema_nodes(value, parent_keys + [key], siblings, nodes)
+        height = max(height, child_height + 1)
+
+    nodes.append(_SchemaNode(schema, parent_keys, sibling_properties, height))
+    return height
+
+
+def schema_fingerprint(schema: dict, parent_keys: list[str] | None = None) -> str:
+    """Hash of a subschema's path, type and properties (including the titles
+    and descriptions of its children), ignoring examples"""
+
+    def strip(value):
+        if isinstance(value, dict):
+            return {
+                k: strip(v)
+                for k, v in value.items()
+                if k not in ("example", "examples")
+            }
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    payload = {
+        "path": parent_keys or [],
+        "type": schema.get("type"),
+        "properties": strip(schema.get("properties", {})),
+        "items": strip(schema.get("items", {})),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+async def _annotate_node(
+    node: _SchemaNode, chat: Chat, cache: MutableMapping[str, dict] | None
+) -> bool:
+    """Adds a title and description to one node, returns whether it called the LLM"""
+    schema = node.schema
+    # Make sure the object has a title and description
+    if schema.get("title") and schema.get("description"):
+        return False
+
+    fingerprint = schema_fingerprint(schema, node.parent_keys)
+    meta_data = cache.get(fingerprint) if cache is not None else None
+    called = meta_data is None
+    if meta_data is None:
+        example = schema.get("example") or {}
+        path = ".".join(node.parent_keys) or "base object"
+        sibling_properties = (
+            "\n * " + "\n * ".join([".".join(sp) for sp in node.sibling_properties])
+            if node.sibling_properties
+            else "none"
+        )
+
+        response = await chat.chat_completion(
+            [
+                {
+                    "role": "system",
+                    "content": SYSTEM_MESSAGE.strip(),
+                },
+                {
+                    "role": "user",
+                    "content": MESSAGE_TEMPLATE.format(
+                        schema=json.dumps(
+                            {
+                                "type": schema.get("type"),
+                                "properties": schema.get("properties", {}),
+                            },
+                            indent=4,
+                        ),
+                        example=json.dumps(example, indent=4)
+                        if example
+                        else "none available",
+                        path=path,
+                        sibling_properties="\n"
+                        + json.dumps(sibling_properties, indent=4),
+                    ),
+                },
+            ],
+            **{
+                "max_tokens": 4_096,
+                "temperature": 0.0,
+                "response_format": {"type": "json_object"},
+            },
+        )
+        meta_data = json.loads(response.choices[0].message.content)
+        if cache is not None:
+            cache[fingerprint] = {
+                "title": meta_data.get("title"),
+                "description": meta_data.get("description"),
+            }
+
+    schema["title"] = schema.get("title") or meta_data.get("title")
+    if schema["title"]:  # to PascalCase
+        schema["title"] = schema["title"].strip().replace(" ", "")
+        schema["title"] = schema["title"][0].upper() + schema["title"][1:]
+    schema["description"] = schema.get("description") or meta_data.get("description")
+    return called
+
+
+@track_usage("generation")
 async def add_schema_titles_and_descriptions(
     schema: dict,
     parent_keys: list[str] = None,
     chat: Chat | None = None,
     ittr=None,
     sibling_properties: list[str] = None,
+    max_workers: int = 10,
+    cache: MutableMapping[str, dict] | None = None,
 ):
     """Adds names and descriptions to a schema based a language model.
-    Recursively traverse the schema and add title and descriptions
-    starting with the leaf nodes and working up to the root
-    each time adding a name and description to the schema
+
+    Every object and array node is annotated after its descendants, since its
+    prompt includes their titles and descriptions.  Nodes are annotated level
+    by level starting with the leaf nodes and working up to the root: the
+    nodes of a level (the same height above their deepest descendant) don't
+    depend on each other and are annotated concurrently, at most
+    `max_workers` at a time.
+
+    `cache` maps `schema_fingerprint`s of annotated nodes to their title and
+    description.  Reusing it (e.g. a dict persisted as JSON) when the schema
+    evolves only calls the LLM for the nodes that changed.
+
+    Returns the number of LLM calls made.
     """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
     if ittr is None:
         ittr = tqdm.tqdm(desc="Adding Titles and Descriptions")
 
     chat = chat or Chat()
-    parent_keys = parent_keys or []
-    if schema.get("type") == "array":
-        await add_schema_titles_and_descriptions(
-            schema.get("items", {}),
-            parent_keys,
-            chat=chat,
-            ittr=ittr,
-            sibling_properties=[],
-        )
-    elif schema.get("type") != "object":
-        # At the leaf node no need to add a title or description
-        return
-
-    properties = set(schema.get("properties", {}).keys())
-    for key, value in schema.get("properties", {}).items():
-        await add_schema_titles_and_descriptions(
-            value,
-            parent_keys + [key],
-            chat=chat,
-            ittr=ittr,
-            sibling_properties=[parent_keys + [p] for p in properties - {key}],
-        )
+    nodes: list[_SchemaNode] = []
+    _schema_nodes(schema, parent_keys or [], sibling_properties or [], nodes)
+    levels: dict[int, list[_SchemaNode]] = {}
+    for node in nodes:
+        levels.setdefault(node.height, []).append(node)
 
-    # Make sure the object has a title and description
-    if schema.get("title") and schema.get("description"):
-        return
-
-    example = schema.get("example") or {}
-    path = ".".join(parent_keys) or "base object"
-    sibling_properties = (
-        "\n * " + "\n * ".join([".".join(sp) for sp in sibling_properties])
-        if sibling_properties
-        else "none"
-    )
+    semaphore = asyncio.Semaphore(max_workers)
+    calls = 0
 
-    response = await chat.chat_completion(
-        [
-            {
-                "role": "system",
-                "content": SYSTEM_MESSAGE.strip(),
-            },
-            {
-                "role": "user",
-                "content": MESSAGE_TEMPLATE.format(
-                    schema=json.dumps(
-                        {
-                            "type": schema.get("type"),
-                            "properties": schema.get("properties", {}),
-                        },
-                        indent=4,
-                    ),
-                    example=json.dumps(example, indent=4)
-                    if example
-                    else "none available",
-                    path=path,
-                    sibling_properties="\n" + json.dumps(sibling_properties, indent=4),
-                ),
-            },
-        ],
-        **{
-            "max_tokens": 4_096,
-            "temperature": 0.0,
-            "response_format": {"type": "json_object"},
-        },
-    )
-    meta_data = json.loads(response.choices[0].message.content)
-    schema["title"] = schema.get("title") or meta_data.get("title")
-    if schema["title"]:  # to PascalCase
-        schema["title"] = schema["title"].strip().replace(" ", "")
-        schema["title"] = schema["title"][0].upper() + schema["title"][1:]
-    schema["description"] = schema.get("description") or meta_data.get("description")
-    ittr.update(1)
+    async def annotate(node: _SchemaNode):
+        nonlocal calls
+        async with semaphore:
+            if await _annotate_node(node, chat, cache):
+                calls += 1
+                ittr.update(1)
+
+    for height in sorted(levels):
+        await asyncio.gather(*(annotate(node) for node in levels[height]))
+    return calls
 
 
 def schema_from_data(data_samples: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Generates a minimal schema based on provided data samples.
 
+    For tabular data (DataFrames, pyarrow tables, CSV files) use the columnar
+    `schema_from_table.schema_from_table`, for large datasets
+    `schema_inference.infer_schema`.
+
     Args:
         data_samples (List[dict]): A list of data samples to generate the schema from.
 
@@ -186,13 +286,13 @@ def infer_type(value: Any) -> Dict[str, Any]:
     elif isinstance(value, int):
         return {"type": "integer", "example": value}
     elif isinstance(value, float):
-        if can_cast_to_ints_without_losing_precision_np_updated([value]):
+        if is_integral(value):
             return {"type": "integer", "example": value}
         return {"type": "number", "example": value}
     elif isinstance(value, str):
         with contextlib.suppress(ValueError):
             value_float = float(value)
-            if can_cast_to_ints_without_losing_precision_np_updated([value]):
+            if is_integral(value):
                 return {"type": "integer", "example": int(value_float)}
             return {"type": "number", "example": value_float}
         return {"type": "string", "example": value}
@@ -0,0 +1,268 @@
+"""Columnar schema inference for tabular data
+
+`schema_from_data` classifies every value of every record in Python.  Tables
+(pandas DataFrames, pyarrow tables and CSV files) store each column with a
+single physical type, so `schema_from_table` classifies whole columns at once
+with pyarrow compute kernels and only falls back to `infer_type` for columns of
+nested or mixed Python objects:
+
+    schema = schema_from_table(df)
+    schema = schema_from_table("orders.csv")  # read in record batches
+
+The schema equals `schema_from_data(records)` for the table's records with
+null cells left out, since a table cannot tell missing keys from nulls: a
+column is required when it has no nulls and columns of nulls are omitted.
+CSV cells are strings, as with `csv.DictReader`, so numeric cells are numbers.
+"""
+import csv
+import sys
+from logging import getLogger
+from numbers import Number
+from pathlib import Path
+from typing import Any
+
+from promptedgraphs.generation.schema_from_data import infer_type, merge_types
+
+logger = getLogger(__name__)
+
+# Strings `float()` accepts (ASCII digits and whitespace only)
+_DIGITS = r"\d(?:_?\d)*"
+NUMERIC_PATTERN = (
+    rf"^\s*[+-]?(?:(?:(?:{_DIGITS}(?:\.(?:{_DIGITS})?)?|\.{_DIGITS})"
+    rf"(?:[eE][+-]?{_DIGITS})?)|(?i:inf(?:inity)?|nan))\s*$"
+)
+INTEGRAL_EPSILON = 1e-9
+
+
+class ColumnStats:
+    """Types and first example of the non-null values of a column, updated
+    one Arrow array (e.g. record batch column) at a time"""
+
+    __slots__ = ("types", "first", "nulls", "fallback")
+
+    def __init__(self):
+        self.types: set[str] = set()
+        self.first: tuple[str, Any] | None = None  # type and example
+        self.nulls = 0
+        # schema_from_data's merged schema of columns of Python objects
+        self.fallback: dict | None = None
+
+    def update(self, array):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        self.nulls += array.null_count
+        valid = array.drop_null() if array.null_count else array
+        if not len(valid):
+            return
+        if pa.types.is_dictionary(valid.type):  # e.g. pandas categoricals
+            valid = valid.dictionary_decode()
+        kind = valid.type
+        if pa.types.is_boolean(kind):
+            self._add_types(["boolean"], "boolean", valid[0].as_py())
+        elif pa.types.is_integer(kind):
+            self._add_types(["integer"], "integer", valid[0].as_py())
+        elif pa.types.is_floating(kind):
+            integral = pc.and_(
+                pc.is_finite(valid),
+                pc.less_equal(
+                    pc.abs(pc.subtract(valid, pc.round(valid))), INTEGRAL_EPSILON
+                ),
+            )
+            self._add_types(
+                self._present(integral, "integer", "number"),
+                "integer" if integral[0].as_py() else "number",
+                valid[0].as_py(),
+            )
+        elif pa.types.is_string(kind) or pa.types.is_large_string(kind):
+            numeric = pc.match_substring_regex(valid, NUMERIC_PATTERN)
+            first = valid[0].as_py()
+            self._add_types(
+                self._present(numeric, "number", "string"),
+                "number" if numeric[0].as_py() else "string",
+                float(first) if numeric[0].as_py() else first,
+            )
+        else:
+            self._add_values(valid.to_pylist())
+
+    @staticmethod
+    def _present(mask, when_true: str, when_false: str) -> list[str]:
+        """The types of a boolean mask's values"""
+        import pyarrow.compute as pc
+
+        types = []
+        if pc.any(mask).as_py():
+            types.append(when_true)
+        if not pc.all(mask).as_py():
+            types.append(when_false)
+        return types
+
+    def _add_types(self, types: list[str], first_type: str, first_example: Any):
+        if self.fallback is not None:
+            # Mixed with Python objects, merge value schemas like schema_from_data
+            for t in types:
+                self._merge({"type": t, "example": first_example})
+            return
+        self.types.update(types)
+        if self.first is None:
+            self.first = (first_type, first_example)
+
+    def _add_values(self, values: list):
+        """Slow path for columns of nested or mixed Python objects"""
+        if self.fallback is None and self.first is not None:
+            example_type, example = self.first
+            self.fallback = {"type": example_type, "example": example}
+            for t in sorted(self.types - {example_type}):
+                self.fallback = merge_types(self.fallback, {"type": t})
+        for value in values:
+            self._merge(infer_type(value))
+
+    def _merge(self, schema: dict):
+        self.fallback = (
+            schema if self.fallback is None else merge_types(self.fallback, schema)
+        )
+
+    def to_schema(self) -> dict | None:
+        """The column's schema, None when it has no values"""
+        if self.fallback is not None:
+            return self.fallback
+        if self.first is None:
+            return None
+        example_type, example = self.first
+        if len(self.types) == 1:
+            return {"type": example_type, "example": example}
+        return {
+            "anyOf": [{"type": t} for t in sorted(self.types)],
+            "example": example,
+        }
+
+
+class TableSchemaInferrer:
+    """Accumulates `ColumnStats` of a stream of tables or record batches"""
+
+    def __init__(self):
+        self.columns: dict[str, ColumnStats] = {}
+        self.rows = 0
+
+    def update(self, table) -> "TableSchemaInferrer":
+        """Adds a pyarrow Table or RecordBatch"""
+        self.rows += table.num_rows
+        for name, column in zip(table.column_names, table.columns):
+            stats = self.columns.setdefault(name, ColumnStats())
+            chunks = getattr(column, "chunks", [column])
+            for chunk in chunks:
+                stats.update(chunk)
+        return self
+
+    def add_column(self, name: str, values: list):
+        """Adds a column of Python objects that has no Arrow type"""
+        stats = self.columns.setdefault(name, ColumnStats())
+        stats.nulls += sum(1 for v in values if _is_null(v))
+        stats._add_values([v for v in values if not _is_null(v)])
+
+    def schema(self) -> dict:
+        if not self.rows:
+            return {}
+        properties = {}
+        for name, stats in self.columns.items():
+            if (column_schema := stats.to_schema()) is not None:
+                properties[name] = column_schema
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": sorted(
+                name
+                for name, stats in self.columns.items()
+                if not stats.nulls and name in properties
+            ),
+        }
+
+
+def _is_null(value) -> bool:
+    # NaN is the missing value of pandas object columns
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _value_kind(value) -> type:
+    """The Python type of a value, with all (non-boolean) numbers alike"""
+    if isinstance(value, Number) and not isinstance(value, bool):
+        return Number
+    return type(value)
+
+
+def _infer_dataframe(df, inferrer: TableSchemaInferrer):
+    import pyarrow as pa
+
+    inferrer.rows += len(df)
+    for name in df.columns:
+        series = df[name]
+        # Arrow coerces mixed objects to one type, e.g. booleans among floats
+        # to 1.0 and 0.0, so those columns are classified value by value
+        if series.dtype == object and len(set(map(_value_kind, series.dropna()))) > 1:
+            inferrer.add_column(str(name), series.tolist())
+            continue
+        try:
+            array = pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # e.g. lists mixing numbers and strings
+            inferrer.add_column(str(name), series.tolist())
+            continue
+        stats = inferrer.columns.setdefault(str(name), ColumnStats())
+        stats.update(array)
+
+
+def _csv_batches(path: Path, block_size: int):
+    """Record batches of a CSV file with every cell read as a string"""
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        return
+    reader = pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(block_size=block_size),
+        convert_options=pv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=False,
+        ),
+    )
+    yield from reader
+
+
+def schema_from_table(table, block_size: int = 1 << 22) -> dict[str, Any]:
+    """Generates the schema of tabular data by classifying whole columns.
+
+    Args:
+        table: A pandas DataFrame, a pyarrow Table or RecordBatch, or the path
+            of a CSV or Parquet file, read in blocks of `block_size` bytes
+            (CSV) or record batches (Parquet).
+
+    Returns:
+        dict: The schema `schema_from_data` infers for the table's records,
+            with null cells left out.
+    """
+    import pyarrow as pa
+
+    inferrer = TableSchemaInferrer()
+    if isinstance(table, (str, Path)):
+        path = Path(table)
+        if path.suffix.lower() == ".parquet":
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(path).iter_batches()
+        else:
+            batches = _csv_batches(path, block_size)
+        for batch in batches:
+            inferrer.update(batch)
+    elif isinstance(table, (pa.Table, pa.RecordBatch)):
+        inferrer.update(table)
+    elif (pd := sys.modules.get("pandas")) and isinstance(table, pd.DataFrame):
+        _infer_dataframe(table, inferrer)
+    else:
+        raise ValueError(
+            f"Expected a DataFrame, pyarrow Table or file path, got {type(table)}. "
+            "Use schema_from_data for lists of records"
+        )
+    return inferrer.schema()
@@ -0,0 +1,485 @@
+"""Streaming JSON schema inference over large datasets
+
+`schema_from_data` needs every record in memory.  `SchemaInferrer` instead
+consumes records one at a time and keeps mergeable statistics per path:
+
+ * how often each JSON type (and null) was observed,
+ * in how many parent objects each property was present, for `required`,
+ * the first value and a reservoir sample of scalar values, for examples.
+
+Memory depends on the number of distinct paths, not on the number of records,
+so multi-GB JSONL and Parquet exports can be profiled:
+
+    schema = infer_schema("events.jsonl")
+    schema = infer_schema("events.parquet")  # read in pyarrow record batches
+
+Statistics of disjoint shards merge associatively, `schema_from_data_parallel`
+infers the shards of large files in a process pool and reduces them:
+
+    schema = schema_from_data_parallel(["part-0.jsonl", "part-1.jsonl"], workers=8)
+"""
+import collections
+import concurrent.futures
+import gzip
+import itertools
+import json
+import math
+import os
+import random
+from collections.abc import Iterable, Iterator
+from logging import getLogger
+from pathlib import Path
+from typing import Any
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_EXAMPLES = 5
+DEFAULT_BATCH_SIZE = 10_000
+# Array examples keep at most this many items
+MAX_EXAMPLE_ITEMS = 10
+
+SCALAR_TYPES = {"boolean", "integer", "number", "string"}
+
+
+def is_integral(value: Any, epsilon: float = 1e-9) -> bool:
+    """Whether a number can be cast to an integer without losing precision,
+    allowing `epsilon` of floating point error.  Strings, nan and inf are not."""
+    if not isinstance(value, (int, float)) or not math.isfinite(value):
+        return False
+    return abs(value - round(value)) <= epsilon
+
+
+def classify(value: Any) -> tuple[str, Any]:
+    """The JSON schema type of a value and the value to use as its example,
+    following `schema_from_data.infer_type` (numeric strings are numbers)"""
+    kind = _EXACT_TYPES.get(type(value))  # fast path for parsed JSON
+    if kind is not None:
+        return kind, value
+    if value is None:
+        return "null", None
+    if isinstance(value, bool):
+        return "boolean", value
+    if isinstance(value, int):
+        return "integer", value
+    if isinstance(value, float):
+        return ("integer" if is_integral(value) else "number"), value
+    if isinstance(value, str):
+        try:
+            return "number", float(value)
+        except ValueError:
+            return "string", value
+    if isinstance(value, (list, tuple)):
+        return "array", value
+    if isinstance(value, dict):
+        return "object", value
+    return "unknown", None
+
+
+# Types whose JSON type doesn't depend on the value
+_EXACT_TYPES = {bool: "boolean", int: "integer", list: "array", dict: "object"}
+
+
+class Reservoir:
+    """Uniform sample of at most `size` values from a stream.
+
+    Uses algorithm L, which skips ahead to the next replaced value rather than
+    drawing a random number for every value.
+    """
+
+    __slots__ = ("size", "seen", "items", "_w", "_next")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.seen = 0
+        self.items: list = []
+        self._w = 0.0
+        self._next = 0  # `seen` of the next value to keep
+
+    def _schedule(self, rng: random.Random, w: float | None = None):
+        """Draws the next value to keep.  The sample's largest key `w` is
+        distributed as Beta(size, seen - size + 1) when not carried over."""
+        if w is None:
+            w = rng.betavariate(self.size, self.seen - self.size + 1)
+        self._w = w
+        self._next = self.seen + int(math.log(1.0 - rng.random()) / math.log1p(-w)) + 1
+
+    def add(self, value, rng: random.Random):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(value)
+            if len(self.items) == self.size:
+                self._schedule(rng)
+        elif self.seen == self._next:
+            self.items[rng.randrange(self.size)] = value
+            w = self._w * math.exp(math.log(1.0 - rng.random()) / self.size)
+            self._schedule(rng, w)
+
+    def merge(self, other: "Reservoir", rng: random.Random) -> "Reservoir":
+        """Combines two samples into a uniform sample of both streams"""
+        if not other.seen:
+            return self
+        if not self.seen:
+            self.seen, self.items = other.seen, list(other.items)
+            self._w, self._next = other._w, other._next
+            return self
+        mine, theirs = list(self.items), list(other.items)
+        rng.shuffle(mine)
+        rng.shuffle(theirs)
+        left, right = self.seen, other.seen
+        items = []
+        while len(items) < self.size and (mine or theirs):
+            # Draw from each stream in proportion to its unsampled values
+            if theirs and (not mine or rng.random() * (left + right) >= left):
+                items.append(theirs.pop())
+                right -= 1
+            else:
+                items.append(mine.pop())
+                left -= 1
+        self.seen += other.seen
+        self.items = items
+        if self.size and len(items) == self.size:
+            self._schedule(rng)
+        return self
+
+
+class TypeStats:
+    """Statistics of the values found at one path of the records"""
+
+    __slots__ = (
+        "count",
+        "present",
+        "types",
+        "first",
+        "examples",
+        "properties",
+        "items",
+    )
+
+    def __init__(self, max_examples: int = DEFAULT_MAX_EXAMPLES):
+        self.count = 0  # values seen, including nulls
+        self.present = 0  # parent objects containing this property
+        self.types: dict[str, int] = {}
+        self.first: dict[str, Any] = {}  # first example of each type
+        self.examples = Reservoir(max_examples)
+        self.properties: dict[str, TypeStats] = {}
+        self.items: TypeStats | None = None
+
+    def add(self, value: Any, rng: random.Random):
+        self.count += 1
+        kind, example = classify(value)
+        self.types[kind] = self.types.get(kind, 0) + 1
+        if kind == "object":
+            if kind not in self.first:
+                self.first[kind] = example
+            for key, child in value.items():
+                stats = self.properties.get(key)
+                if stats is None:
+                    stats = self.properties[key] = TypeStats(self.examples.size)
+                stats.present += 1
+                stats.add(child, rng)
+        elif kind == "array":
+            if kind not in self.first:
+                self.first[kind] = list(example[:MAX_EXAMPLE_ITEMS])
+            if self.items is None:
+                self.items = TypeStats(self.examples.size)
+            for item in value:
+                self.items.add(item, rng)
+        elif kind in SCALAR_TYPES:
+            if kind not in self.first:
+                self.first[kind] = example
+            self.examples.add(example, rng)
+
+    def merge(self, other: "TypeStats", rng: random.Random) -> "TypeStats":
+        """Adds the statistics of `other`, which saw records after this one"""
+        self.count += other.count
+        self.present += other.present
+        for kind, n in other.types.items():
+            self.types[kind] = self.types.get(kind, 0) + n
+        for kind, example in other.first.items():
+            self.first.setdefault(kind, example)
+        self.examples.merge(other.examples, rng)
+        for key, stats in other.properties.items():
+            if key in self.properties:
+                self.properties[key].merge(stats, rng)
+            else:
+                self.properties[key] = stats
+        if other.items is not None:
+            if self.items is None:
+                self.items = other.items
+            else:
+                self.items.merge(other.items, rng)
+        return self
+
+    def _example(self) -> Any:
+        """The first non-null example, in order of first appearance"""
+        return next(iter(self.first.values()), None)
+
+    def _type_schema(self, kind: str, root: bool = False) -> dict:
+        schema: dict[str, Any] = {"type": kind}
+        if kind == "object":
+            objects = self.types.get("object", 0)
+            schema["properties"] = {
+                key: stats.to_schema() for key, stats in self.properties.items()
+            }
+            schema["required"] = sorted(
+                key
+                for key, stats in self.properties.items()
+                if stats.present == objects
+            )
+        elif kind == "array":
+            schema["items"] = self.items.to_schema() if self.items else {}
+        if not root:
+            schema["example"] = self.first.get(kind)
+        return schema
+
+    def to_schema(self, root: bool = False) -> dict:
+        """The JSON schema of this path, in the format of `schema_from_data`
+        plus `required` on nested objects and sampled `examples` of scalars"""
+        kinds = sorted(k for k in self.types if k not in ("null", "unknown"))
+        if not kinds:
+            return {}
+        if len(kinds) == 1:
+            schema = self._type_schema(kinds[0], root=root)
+        else:
+            schema = {
+                "anyOf": [
+                    self._type_schema(k, root=True) if k in ("object", "array")
+                    # the example of the whole path is given below
+                    else {"type": k}
+                    for k in kinds
+                ],
+                "example": self._example(),
+            }
+        if self.examples.items and not root:
+            schema["examples"] = list(self.examples.items)
+        return schema
+
+    def paths(self, prefix: str = "$") -> Iterator[tuple[str, "TypeStats"]]:
+        """Every path below (and including) this one, e.g. `$.user.tags[]`"""
+        yield prefix, self
+        for key, stats in self.properties.items():
+            yield from stats.paths(f"{prefix}.{key}")
+        if self.items is not None:
+            yield from self.items.paths(f"{prefix}[]")
+
+
+class SchemaInferrer:
+    """Accumulates mergeable statistics of a stream of records"""
+
+    def __init__(
+        self, max_examples: int = DEFAULT_MAX_EXAMPLES, seed: int | None = None
+    ):
+        self.root = TypeStats(max_examples)
+        self.rng = random.Random(seed)
+
+    @property
+    def count(self) -> int:
+        return self.root.count
+
+    def add(self, record: dict):
+        self.root.add(record, self.rng)
+
+    def update(self, records: Iterable[dict]) -> "SchemaInferrer":
+        add, rng = self.root.add, self.rng
+        for record in records:
+            add(record, rng)
+        return self
+
+    def merge(self, other: "SchemaInferrer") -> "SchemaInferrer":
+        """Adds the statistics of `other`, inferred from the records after ours"""
+        self.root.merge(other.root, self.rng)
+        return self
+
+    def schema(self) -> dict:
+        if not self.root.count:
+            return {}
+        return self.root.to_schema(root=True)
+
+    def stats(self) -> dict[str, dict]:
+        """Type counts, null counts and presence of every path"""
+        return {
+            path: {
+                "count": stats.count,
+                "present": stats.present,
+                "types": dict(stats.types),
+            }
+            for path, stats in self.root.paths()
+        }
+
+
+def _suffix(path: Path) -> str:
+    return path.suffix.lower()
+
+
+def _iter_parquet(
+    path: Path, batch_size: int = DEFAULT_BATCH_SIZE, row_groups=None
+) -> Iterator[dict]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(
+        batch_size=batch_size, row_groups=row_groups
+    ):
+        yield from batch.to_pylist()
+
+
+def iter_records(
+    source: str | Path | Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[dict]:
+    """Yields the records of a JSONL file (optionally gzipped), a Parquet file
+    or an iterable of dicts, reading files incrementally"""
+    if not isinstance(source, (str, Path)):
+        yield from source
+        return
+
+    path = Path(source)
+    if _suffix(path) == ".parquet":
+        yield from _iter_parquet(path, batch_size=batch_size)
+        return
+
+    opener = gzip.open if _suffix(path) == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number} of {path}") from e
+
+
+def infer_schema(
+    source: str | Path | Iterable[dict],
+    max_examples: int = DEFAULT_MAX_EXAMPLES,
+    limit: int | None = None,
+    seed: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """Infers the JSON schema of the records of `source` (a JSONL or Parquet
+    path, or an iterable of dicts) in bounded memory.  `limit` stops after that
+    many records."""
+    records = iter_records(source, batch_size=batch_size)
+    if limit is not None:
+        records = (r for _, r in zip(range(limit), records))
+    return SchemaInferrer(max_examples=max_examples, seed=seed).update(records).schema()
+
+
+def jsonl_byte_ranges(path: str | Path, shards: int) -> list[tuple[int, int]]:
+    """Splits a file into at most `shards` contiguous byte ranges.  A line
+    belongs to the range its first byte falls in, see `iter_jsonl_range`."""
+    size = os.path.getsize(path)
+    shards = max(1, min(shards, size))
+    bounds = [size * i // shards for i in range(shards + 1)]
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+
+def iter_jsonl_range(path: str | Path, start: int, end: int) -> Iterator[dict]:
+    """Yields the records of the lines of a JSONL file starting in [start, end)"""
+    with open(path, "rb") as f:
+        if start:
+            # Skip the line started in the previous range
+            f.seek(start - 1)
+            start += len(f.readline()) - 1
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            offset, position = position, position + len(line)
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON at byte {offset} of {path}") from e
+
+
+def _infer_shard(task: tuple, max_examples: int, seed: int | None) -> SchemaInferrer:
+    """Worker of `schema_from_data_parallel`, tasks are picklable tuples"""
+    kind, source, *args = task
+    if kind == "jsonl":
+        records = iter_jsonl_range(source, *args)
+    elif kind == "parquet":
+        records = _iter_parquet(Path(source), row_groups=args[0])
+    else:
+        records = iter_records(source)
+    return SchemaInferrer(max_examples=max_examples, seed=seed).update(records)
+
+
+def _shard_tasks(
+    sources: Iterable, shards_per_file: int, batch_size: int
+) -> Iterator[tuple]:
+    """Splits plain JSONL files by byte ranges, Parquet files by row groups and
+    iterables of records into lists of `batch_size` records, in source order"""
+    for source in sources:
+        if isinstance(source, dict):
+            raise ValueError(
+                "Pass a list of sources (paths or iterables of records), "
+                "e.g. [records] rather than records"
+            )
+        if not isinstance(source, (str, Path)):
+            iterator = iter(source)
+            while batch := list(itertools.islice(iterator, batch_size)):
+                yield ("records", batch)
+            continue
+
+        path = Path(source)
+        if _suffix(path) == ".parquet":
+            import pyarrow.parquet as pq
+
+            row_groups = list(range(pq.ParquetFile(path).num_row_groups))
+            step = max(1, -(-len(row_groups) // shards_per_file))
+            for i in range(0, len(row_groups), step):
+                yield ("parquet", str(path), row_groups[i : i + step])
+        elif _suffix(path) == ".gz":
+            yield ("file", str(path))  # compressed streams can't be split
+        else:
+            for start, end in jsonl_byte_ranges(path, shards_per_file):
+                yield ("jsonl", str(path), start, end)
+
+
+def schema_from_data_parallel(
+    paths_or_iterables: Iterable,
+    workers: int | None = None,
+    max_examples: int = DEFAULT_MAX_EXAMPLES,
+    seed: int | None = None,
+    batch_size: int = 100_000,
+) -> dict:
+    """Infers the JSON schema of several sources in a process pool.
+
+    Each source (a JSONL or Parquet path, or an iterable of records) is split
+    into shards, every shard is inferred by a `SchemaInferrer` in a worker and
+    the partial results are merged in source order, so the schema matches the
+    one `infer_schema` would return for the concatenated sources.
+
+    Args:
+        paths_or_iterables: The sources, e.g. `["a.jsonl", "b.parquet"]`
+        workers: Worker processes (default: the number of cores), 1 runs the
+            shards in this process
+        batch_size: Records per shard of in-memory iterables, which have to
+            be pickled to the workers
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(paths_or_iterables, (str, Path)):
+        paths_or_iterables = [paths_or_iterables]
+    tasks = _shard_tasks(paths_or_iterables, workers, batch_size)
+    seeds = itertools.count(seed) if seed is not None else itertools.repeat(None)
+
+    result = SchemaInferrer(max_examples=max_examples, seed=seed)
+    if workers == 1:
+        for task, shard_seed in zip(tasks, seeds):
+            result.merge(_infer_shard(task, max_examples, shard_seed))
+        return result.schema()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Submit a bounded number of shards ahead, so iterables are not
+        # materialized at once, and merge in order so the first examples win
+        pending = collections.deque()
+        for task, shard_seed in zip(tasks, seeds):
+            pending.append(
+                executor.submit(_infer_shard, task, max_examples, shard_seed)
+            )
+            if len(pending) >= 2 * workers:
+                result.merge(pending.popleft().result())
+        while pending:
+            result.merge(pending.popleft().result())
+    return result.schema()
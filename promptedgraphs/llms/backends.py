@@ -0,0 +1,22 @@
+"""Interface implemented by the LLM backends used by `Chat`
+
+Any OpenAI-compatible server (vLLM, llama.cpp, LiteLLM, the local
+`mock_server`, ...) can be targeted by setting `Config.openai_base_url`
+(`OPENAI_BASE_URL`); other providers can be plugged in by passing an object
+implementing `ChatBackend` to `Chat(backend=...)`.
+"""
+from typing import TYPE_CHECKING, Any, Protocol, runtime_checkable
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+
+@runtime_checkable
+class ChatBackend(Protocol):
+    model: str
+
+    async def chat_completion(
+        self, messages: list[Any] = None, **kwargs
+    ) -> "ChatCompletion":
+        """Returns an OpenAI-style chat completion for the messages"""
+        ...
@@ -0,0 +1,226 @@
+"""Content-addressed cache of LLM responses
+
+Responses are keyed by a hash of the model, messages, functions and sampling
+parameters of a request.  Only deterministic (temperature=0) requests are cached.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from typing import Any
+
+logger = getLogger(__name__)
+
+# Shared caches keyed by (path, ttl, max_entries)
+_cache_registry: dict[tuple, "ResponseCache"] = {}
+
+
+def _to_jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    return getattr(value, "value", value)
+
+
+def cache_key(
+    model: Any, messages: list | None, functions: list | None = None, **params
+) -> str:
+    """Returns a content hash identifying an LLM request"""
+    payload = {
+        "model": _to_jsonable(model),
+        "messages": _to_jsonable(messages or []),
+        "functions": _to_jsonable(functions or []),
+        "params": _to_jsonable(params),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def is_cacheable(temperature: float | None = None) -> bool:
+    """Sampled (temperature>0) responses are never cached.
+    The OpenAI API defaults to temperature=1 when it is not provided."""
+    return temperature is not None and temperature <= 0
+
+
+class ResponseCache(ABC):
+    """Base class for LLM response caches.  Values are serialized strings.
+    Subclasses implement `_get`, `_set` and `clear`."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._set(key, value)
+
+    @abstractmethod
+    def _get(self, key: str) -> str | None:
+        """The value stored under `key`, None when missing or expired"""
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        """Stores `value` under `key`, evicting entries over capacity"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every entry"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache with optional TTL"""
+
+    def __init__(self, ttl: float | None = None, max_entries: int | None = 10_000):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            created_at, value = self._data[key]
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while self.max_entries is not None and len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """On-disk LRU cache with optional TTL backed by SQLite"""
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: float | None = None,
+        max_entries: int | None = 100_000,
+    ):
+        super().__init__()
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at)"
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if not exists:
+                self._size += 1
+            if self.max_entries is not None and self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Removes expired entries and then the least recently used ones"""
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        self._conn.execute(
+            """DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_response_cache(config=None) -> ResponseCache | None:
+    """Returns the shared response cache configured by `Config.llm_cache_path`"""
+    if config is None or not config.llm_cache_path:
+        return None
+    key = (config.llm_cache_path, config.llm_cache_ttl, config.llm_cache_max_entries)
+    cache = _cache_registry.get(key)
+    if cache is None:
+        if config.llm_cache_path == ":memory:":
+            cache = MemoryResponseCache(
+                ttl=config.llm_cache_ttl, max_entries=config.llm_cache_max_entries
+            )
+        else:
+            cache = SQLiteResponseCache(
+                config.llm_cache_path,
+                ttl=config.llm_cache_ttl,
+                max_entries=config.llm_cache_max_entries,
+            )
+        _cache_registry[key] = cache
+    return cache
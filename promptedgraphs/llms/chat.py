@@ -1,13 +1,40 @@
 # Create an enum called LanguageModel with the following values: GPT2, GPT3
 
 import asyncio
+import copy
+import time
+from typing import Any
 
 from promptedgraphs.config import Config
+from promptedgraphs.llms.backends import ChatBackend
+from promptedgraphs.llms.cache import (
+    ResponseCache,
+    cache_key,
+    get_response_cache,
+    is_cacheable,
+)
+from promptedgraphs.llms.coalesce import SingleFlight
 from promptedgraphs.llms.openai_chat import LanguageModel as OpenAILanguageModel
-from promptedgraphs.llms.openai_chat import OpenAIChat
+from promptedgraphs.llms.openai_chat import get_openai_chat
+from promptedgraphs.llms.rate_limit import estimate_request_tokens, get_rate_limiter
+from promptedgraphs.llms.retry import RetryPolicy, is_rate_limit
+from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import UsageTracker, default_tracker
+from promptedgraphs.tracing import current_span, traced
 
 LanguageModels = OpenAILanguageModel
 
+# Identical deterministic requests in flight at the same time share one upstream call
+single_flight = SingleFlight()
+
+
+def billed_usage(response) -> Any:
+    """The token usage of `response` billed to its caller, None when it was
+    served from the response cache or shared by a coalesced identical call"""
+    if not getattr(response, "_billed", True):
+        return None
+    return getattr(response, "usage", None)
+
 
 class Chat:
     def __init__(
@@ -16,22 +43,128 @@ class Chat:
         config: Config = None,
         max_retries: int = 3,
         timeout=60,
+        cache: ResponseCache | None = None,
+        backend: ChatBackend | None = None,
+        tracker: UsageTracker | None = None,
         **kwargs,
     ):
+        """Chat with `model` through `backend`, by default the OpenAI-compatible
+        API at `config.openai_base_url`.  `model` may be a `LanguageModel` or
+        the name of any model served by that API."""
         config = config or Config()
-        if model in OpenAILanguageModel:
-            self.chat = OpenAIChat(
+        self.tracker = tracker if tracker is not None else default_tracker
+        self.cache = cache if cache is not None else get_response_cache(config)
+        self.limiter = get_rate_limiter(model, config)
+        self.retry_policy = RetryPolicy(max_attempts=max_retries + 1)
+        if backend is not None:
+            self.chat = backend
+        elif isinstance(model, (OpenAILanguageModel, str)):
+            # Chats with the same settings share one pooled AsyncOpenAI client.
+            # Retries are handled by `Chat._send` rather than the SDK.
+            self.chat = get_openai_chat(
                 api_key=config.openai_api_key,
                 model=model,
-                max_retries=max_retries,
+                base_url=kwargs.pop("base_url", config.openai_base_url),
+                max_retries=0,
                 timeout=timeout,
                 **kwargs,
             )
         else:
-            raise NotImplementedError("Anthropic Model not implemented")
+            raise NotImplementedError(f"No backend available for model {model}")
+
+    @traced()
+    async def chat_completion(
+        self, messages: list[any] = None, usage: Usage | None = None, **kwargs
+    ):
+        current_span().set_attribute("model", str(self.chat.model))
+        if not is_cacheable(kwargs.get("temperature")):
+            return await self._send(messages, usage=usage, **kwargs)
+
+        key = cache_key(self.chat.model, messages, **kwargs)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if usage is not None:
+                usage.update(cache_hits=cached is not None, cache_misses=cached is None)
+            if cached is not None:
+                current_span().set_attribute("cache_hit", True)
+                self.tracker.record(self.chat.model, cache_hit=True)
+                from openai.types.chat import ChatCompletion
 
-    async def chat_completion(self, messages: list[any] = None, **kwargs):
-        return await self.chat.chat_completion(messages=messages, **kwargs)
+                response = ChatCompletion.model_validate_json(cached)
+                response._billed = False  # no request was made, see billed_usage
+                return response
+
+        async def call():
+            response = await self._send(messages, usage=usage, **kwargs)
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, key, response.model_dump_json())
+            return response
+
+        # Requests are only shared between chats using the same client settings
+        response, coalesced = await single_flight.do((id(self.chat), key), call)
+        if usage is not None:
+            usage.update(coalesced_calls=coalesced)
+        if coalesced:
+            # Only the leader's request is billed, the waiters share its response
+            response = copy.copy(response)
+            response._billed = False
+        return response
+
+    async def _send(
+        self, messages: list[any] = None, usage: Usage | None = None, **kwargs
+    ):
+        """Sends the request once the model's RPM/TPM budget allows it,
+        retrying transient failures with jittered exponential backoff"""
+        retrier = self.retry_policy.retrier()
+        start, retries = time.perf_counter(), 0
+        while True:
+            charged = 0
+            if self.limiter is not None:
+                charged = await self.limiter.acquire(
+                    estimate_request_tokens(
+                        {
+                            "messages": messages or [],
+                            "functions": kwargs.get("functions") or [],
+                            "max_tokens": kwargs.get("max_tokens"),
+                        },
+                        model=self.chat.model,
+                    )
+                )
+            try:
+                response = await self.chat.chat_completion(messages=messages, **kwargs)
+            except Exception as e:
+                if self.limiter is not None:
+                    self.limiter.reconcile(charged, 0)
+                delay = retrier.next_delay(e)
+                if delay is None:
+                    self.tracker.record(
+                        self.chat.model,
+                        latency=time.perf_counter() - start,
+                        retries=retries,
+                        error=True,
+                    )
+                    raise
+                if self.limiter is not None and is_rate_limit(e):
+                    self.limiter.pause(delay)
+                retries += 1
+                if usage is not None:
+                    usage.update(retries=1)
+                await asyncio.sleep(delay)
+                continue
+
+            response_usage = getattr(response, "usage", None)
+            if self.limiter is not None:
+                self.limiter.reconcile(
+                    charged, getattr(response_usage, "total_tokens", None)
+                )
+            self.tracker.record(
+                self.chat.model,
+                prompt_tokens=getattr(response_usage, "prompt_tokens", 0),
+                completion_tokens=getattr(response_usage, "completion_tokens", 0),
+                latency=time.perf_counter() - start,
+                retries=retries,
+            )
+            return response
 
 
 async def usage_example():
@@ -0,0 +1,52 @@
+"""Single-flight coalescing of identical in-flight requests
+
+Concurrent callers asking for the same key share one upstream call and all
+receive its result (or its exception).
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.calls = 0  # upstream calls made
+        self.coalesced = 0  # callers served by another caller's upstream call
+        self._inflight: dict[tuple, asyncio.Task] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """Runs `fn()` unless an identical call is already in flight.
+
+        Returns the result and whether it was shared from another caller.
+        The upstream call runs in its own task, so cancelling one waiter does
+        not cancel the result for the others.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        if (task := self._inflight.get(flight_key)) is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = loop.create_task(fn())
+        self._inflight[flight_key] = task
+        task.add_done_callback(lambda t: self._done(flight_key, t))
+        self.calls += 1
+        return await asyncio.shield(task), False
+
+    def _done(self, flight_key: tuple, task: asyncio.Task):
+        self._inflight.pop(flight_key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter was cancelled
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
@@ -9,6 +9,7 @@ from promptedgraphs.llms.openai_streaming import (
 
 
 async def _sync_wrapper(messages, config: Config | None = None, model=GPT_MODEL):
+    """Runs a non-streaming completion over the shared, pooled HTTP client"""
     payload = ""
     async for event in streaming_chat_completion_request(
         messages=messages,
@@ -17,6 +18,8 @@ async def _sync_wrapper(messages, config: Config | None = None, model=GPT_MODEL)
         stream=False,
         model=model,
     ):
+        if event.event == "error":
+            raise ValueError(f"Chat completion request failed: {event.data}")
         if event.data:
             payload += event.data
         elif event.retry:
@@ -0,0 +1,283 @@
+"""A deterministic, offline stand-in for the OpenAI chat completions API
+
+The server replays recorded completions (streaming SSE or plain JSON) so load
+tests and benchmarks of the pipelines can run without network access:
+
+    with MockChatServer(recordings="completions.jsonl", latency=0.2) as server:
+        config = Config(openai_api_key="mock", openai_base_url=server.base_url)
+        ...
+
+Recordings are JSONL lines of `{"request": {...}, "response": {...}}` where the
+response is a non-streaming chat completion.  Requests are matched on their model,
+messages and functions.  Unmatched requests are answered by `responder`.
+"""
+import argparse
+import json
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from pathlib import Path
+from typing import Any
+
+from promptedgraphs.llms.cache import cache_key
+
+logger = getLogger(__name__)
+
+Responder = Callable[[dict], dict | str]
+
+
+def recording_key(request: dict) -> str:
+    """The key used to match a request against the recordings"""
+    return cache_key(
+        request.get("model"), request.get("messages"), request.get("functions")
+    )
+
+
+def load_recordings(path: str | Path) -> dict[str, dict]:
+    recordings = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings[recording_key(record["request"])] = record["response"]
+    return recordings
+
+
+def save_recording(path: str | Path, request: dict, response: dict | Any):
+    """Appends a request and its (non-streaming) completion to a recordings file"""
+    if hasattr(response, "model_dump"):
+        response = response.model_dump(exclude_none=True)
+    with open(path, "a") as f:
+        f.write(json.dumps({"request": request, "response": response}) + "\n")
+
+
+def default_responder(request: dict) -> dict:
+    """Answers every request with an empty list of items"""
+    if functions := request.get("functions"):
+        return {
+            "role": "assistant",
+            "content": None,
+            "function_call": {"name": functions[0]["name"], "arguments": "{}"},
+        }
+    return {"role": "assistant", "content": json.dumps({"items": []})}
+
+
+def _approx_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value, default=str)) // 4)
+
+
+def build_completion(request: dict, message: dict | str) -> dict:
+    """Wraps a message in a chat completion with deterministic usage numbers"""
+    if isinstance(message, str):
+        message = {"role": "assistant", "content": message}
+    prompt_tokens = _approx_tokens(request.get("messages", []))
+    completion_tokens = _approx_tokens(message)
+    return {
+        "id": f"chatcmpl-mock-{recording_key(request)[:12]}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request.get("model", "mock"),
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "function_call"
+                if "function_call" in message
+                else "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def completion_to_chunks(completion: dict, chunk_size: int = 16) -> list[dict]:
+    """Splits a chat completion into the deltas of a streamed response"""
+    message = completion["choices"][0]["message"]
+    base = {
+        "id": completion["id"],
+        "object": "chat.completion.chunk",
+        "created": completion.get("created", 0),
+        "model": completion.get("model"),
+    }
+
+    def chunk(delta: dict, finish_reason=None):
+        return {
+            **base,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    if function_call := message.get("function_call"):
+        chunks = [
+            chunk(
+                {
+                    "role": "assistant",
+                    "function_call": {"name": function_call["name"], "arguments": ""},
+                }
+            )
+        ]
+        text = function_call.get("arguments", "")
+    else:
+        chunks = [chunk({"role": "assistant", "content": ""})]
+        text = message.get("content") or ""
+
+    for i in range(0, len(text), chunk_size):
+        piece = text[i : i + chunk_size]
+        if function_call:
+            chunks.append(chunk({"function_call": {"arguments": piece}}))
+        else:
+            chunks.append(chunk({"content": piece}))
+    chunks.append(chunk({}, completion["choices"][0].get("finish_reason", "stop")))
+    return chunks
+
+
+class MockChatServer:
+    """OpenAI-compatible `/chat/completions` endpoint served from a background thread"""
+
+    def __init__(
+        self,
+        recordings: dict[str, dict] | str | Path | None = None,
+        responder: Responder | None = None,
+        latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        chunk_size: int = 16,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        if isinstance(recordings, (str, Path)):
+            recordings = load_recordings(recordings)
+        self.recordings = recordings or {}
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_size = chunk_size
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def add_recording(self, request: dict, response: dict):
+        self.recordings[recording_key(request)] = response
+
+    def complete(self, request: dict) -> dict:
+        """Returns the recorded (or generated) completion for a request"""
+        completion = self.recordings.get(recording_key(request))
+        if completion is None:
+            completion = build_completion(request, self.responder(request))
+        usage = completion.get("usage") or {}
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+        return completion
+
+    def start(self) -> "MockChatServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockChatServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                completion = server.complete(request)
+                if server.latency:
+                    time.sleep(server.latency)
+                if request.get("stream"):
+                    self._send_stream(completion)
+                else:
+                    self._send_json(200, completion)
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, completion: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [
+                    json.dumps(c)
+                    for c in completion_to_chunks(completion, server.chunk_size)
+                ]
+                for event in events + ["[DONE]"]:
+                    self._write_chunk(f"data: {event}\n\n".encode())
+                    if server.chunk_latency:
+                        time.sleep(server.chunk_latency)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible server")
+    parser.add_argument("--recordings", help="JSONL file of recorded completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockChatServer(
+        recordings=args.recordings,
+        latency=args.latency,
+        chunk_latency=args.chunk_latency,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Serving mock chat completions at {server.base_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
+import asyncio
 import os
+import weakref
 from enum import Enum
 from logging import getLogger
 
-import openai
-from openai import AsyncOpenAI
+# `openai` takes about half a second to import, it is loaded on first use
 
 
 # Language models that support json chat completions
@@ -12,16 +13,72 @@ class LanguageModel(Enum):
     GPT4 = "gpt-4-0125-preview"
 
 
-class OpenAIChat:
-    def __init__(self, api_key: str, model: LanguageModel, **kwargs):
-        self.client = AsyncOpenAI(
-            api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+# Shared OpenAIChat instances keyed by (api_key, model, base_url, timeout, ...)
+_chat_registry: dict[tuple, "OpenAIChat"] = {}
+
+
+def get_openai_chat(
+    api_key: str | None,
+    model: LanguageModel | str,
+    base_url: str | None = None,
+    timeout: float | None = 60,
+    max_retries: int = 3,
+    **kwargs,
+) -> "OpenAIChat":
+    """Returns a shared OpenAIChat so callers reuse one pooled AsyncOpenAI client"""
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    key = (
+        api_key,
+        model,
+        base_url,
+        timeout,
+        max_retries,
+        tuple(sorted(kwargs.items())),
+    )
+    chat = _chat_registry.get(key)
+    if chat is None:
+        chat = _chat_registry[key] = OpenAIChat(
+            api_key=api_key,
+            model=model,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=max_retries,
             **kwargs,
         )
-        self.model = model.value
+    return chat
+
+
+class OpenAIChat:
+    def __init__(self, api_key: str, model: LanguageModel | str, **kwargs):
+        self.client_kwargs = {
+            "api_key": api_key or os.environ.get("OPENAI_API_KEY"),
+            **kwargs,
+        }
+        self.model = getattr(model, "value", model)
         self.logger = getLogger("openai_chat")
+        # AsyncOpenAI connection pools are bound to the event loop that opened them
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._client = None
+
+    @property
+    def client(self):
+        """The AsyncOpenAI client for the running event loop, created on first use"""
+        from openai import AsyncOpenAI
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._client is None:
+                self._client = AsyncOpenAI(**self.client_kwargs)
+            return self._client
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = AsyncOpenAI(**self.client_kwargs)
+        return client
 
     async def chat_completion(self, messages: list[any] = None, **kwargs) -> None:
+        import openai
+
         try:
             return await self.client.chat.completions.create(
                 messages=messages or [],
@@ -1,20 +1,47 @@
 # https://github.com/openai/openai-cookbook/blob/60b12dfad1b6e7b32c4a6f1edff3b94c946b467d/examples/How_to_call_functions_with_chat_models.ipynb
+import asyncio
 import json
-from collections.abc import AsyncGenerator
+import time
+from collections.abc import AsyncGenerator, Callable
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any
 
-from httpx import AsyncClient, ReadTimeout
+from httpx import AsyncClient, ReadTimeout, TransportError
 from sse_starlette import ServerSentEvent
 
-from promptedgraphs.config import Config
+from promptedgraphs.config import Config, get_http_client
+from promptedgraphs.llms.cache import (
+    ResponseCache,
+    cache_key,
+    get_response_cache,
+    is_cacheable,
+)
 from promptedgraphs.llms.openai_chat import LanguageModel
-from promptedgraphs.llms.usage import estimate_tokens
+from promptedgraphs.llms.rate_limit import get_rate_limiter
+from promptedgraphs.llms.retry import (
+    RETRYABLE_STATUS_CODES,
+    RetryableHTTPError,
+    RetryPolicy,
+    is_rate_limit,
+    parse_retry_after,
+)
+from promptedgraphs.llms.router import ModelRouter, get_router
+from promptedgraphs.llms.usage import Usage, estimate_tokens
+from promptedgraphs.llms.usage_tracker import UNKNOWN, current_labels, default_tracker
 from promptedgraphs.models import ChatFunction, ChatMessage
+from promptedgraphs.tracing import traced
+
+logger = getLogger(__name__)
 
 GPT_MODEL = LanguageModel.GPT35_turbo.value
-GPT_MODEL_BIG_CONTEXT = LanguageModel.GPT35_turbo.value
+
+# Fields of the request body that are already part of the cache key
+_CACHE_KEY_EXCLUDE = {"model", "messages", "functions"}
 
 
-# @retry(wait=wait_random_exponential(min=1, max=20), stop=stop_after_attempt(3))
+@traced()
 async def streaming_chat_completion_request(
     messages: list[ChatMessage] | None,
     functions: list[ChatFunction] | None = None,
@@ -24,73 +51,292 @@ async def streaming_chat_completion_request(
     max_tokens=4000,
     stream=True,
     timeout=None,
+    cache: ResponseCache | None = None,
+    usage: Usage | None = None,
+    max_retries: int = 3,
+    resume: bool = True,
+    router: ModelRouter | None = None,
+    max_cost: float | None = None,
+    max_latency: float | None = None,
 ) -> AsyncGenerator[bytes, None]:
+    """Streams the chat completion as server sent events.
+
+    Connection errors, timeouts and retryable status codes (429, 5xx) are retried
+    with decorrelated jitter, honouring `Retry-After`.  With `resume=True` a
+    deterministic (temperature=0) stream that fails midway is re-requested and
+    the data items already yielded are skipped.  Sampled streams can't be
+    resumed, the new attempt would not repeat the same output, so a failure
+    after the first data item ends the stream.
+    Once retries are exhausted a single `event="error"` is yielded.
+
+    When `model` cannot fit the prompt plus `max_tokens` output tokens, or
+    exceeds `max_cost` dollars or `max_latency` seconds, the request is routed
+    to the cheapest model that does; `RoutingError` is raised if none does.
+    """
     assert config and config.openai_api_key is not None, "OpenAI API Key not found"
 
-    url = "https://api.openai.com/v1/chat/completions"
+    url = f"{config.openai_base_url.rstrip('/')}/chat/completions"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {config.openai_api_key}",
     }
+    json_data = _request_body(messages, functions, model, temperature, max_tokens)
+    json_data["stream"] = stream
+
+    # Cheap character-based estimate, enough to pick the model
+    token_count_approx = estimate_tokens(json_data, model=model, approximate=True)
+    _route(json_data, int(token_count_approx), router, max_cost, max_latency)
+
+    cache = cache if cache is not None else get_response_cache(config)
+    key = None
+    if cache is not None and is_cacheable(temperature):
+        key, cached = await _cached_response(cache, json_data, usage)
+        if cached is not None:
+            for data in cached:
+                yield ServerSentEvent(data=data)
+            return
+
+    # Charge the prompt estimate plus max_tokens against the model's TPM budget
+    limiter = get_rate_limiter(json_data["model"], config)
+    state = _StreamState(
+        limiter=limiter,
+        budget=int(token_count_approx) + json_data["max_tokens"],
+        usage=usage,
+    )
+    if limiter is not None:
+        state.charged = await limiter.acquire(state.budget)
 
+    # Non-streaming bodies report their own usage
+    connected = (
+        _usage_event(estimate_tokens(json_data, model=json_data["model"]))
+        if stream
+        else None
+    )
+    start, error = time.perf_counter(), False
+    client = get_http_client(config)
+    try:
+        async for event in _resumable_events(
+            lambda: _post_lines(client, url, headers, json_data, timeout),
+            state,
+            RetryPolicy(max_attempts=max_retries + 1).retrier(),
+            # Only the same request at temperature=0 repeats the output yielded
+            resume=resume and is_cacheable(temperature),
+            connected=connected,
+        ):
+            yield event
+
+        if key is not None and (not stream or "[DONE]" in state.recorded):
+            await asyncio.to_thread(cache.set, key, json.dumps(state.recorded))
+    except GeneratorExit:
+        pass  # Handle the generator being closed, if necessary
+    except ReadTimeout:
+        error = True
+        yield ServerSentEvent(
+            data="timeout: Timeout reading the response", event="error"
+        )
+    except Exception as e:
+        error = True
+        yield ServerSentEvent(data=str(e), event="error")
+    finally:
+        total_tokens = _actual_tokens(state.recorded, stream, token_count_approx)
+        if limiter is not None:
+            limiter.reconcile(state.charged, total_tokens)
+        prompt_tokens = int(token_count_approx) if state.recorded else 0
+        default_tracker.record(
+            json_data["model"],
+            prompt_tokens=prompt_tokens,
+            completion_tokens=max(total_tokens - prompt_tokens, 0),
+            latency=time.perf_counter() - start,
+            retries=state.retries,
+            error=error,
+            call_site=_call_site(),
+        )
+
+
+def _request_body(
+    messages: list[ChatMessage] | None,
+    functions: list[ChatFunction] | None,
+    model,
+    temperature,
+    max_tokens,
+) -> dict:
     json_data = {
         "model": model,
         "messages": [m.model_dump(exclude_none=True) for m in messages or []],
         "temperature": temperature,
         "max_tokens": max_tokens,
-        "stream": stream,
     }
     if functions is not None and len(functions) > 0:
         json_data["functions"] = [
             f if isinstance(f, dict) else f.model_dump(exclude_none=True)
             for f in functions
         ]
+    return json_data
+
 
-    token_count_approx = estimate_tokens(json_data, model=model)
+def _route(
+    json_data: dict,
+    prompt_tokens: int,
+    router: ModelRouter | None,
+    max_cost: float | None,
+    max_latency: float | None,
+):
+    """Switches the model of the request to the one chosen by the router"""
+    model = json_data["model"]
+    decision = (router or get_router()).route(
+        prompt_tokens=prompt_tokens,
+        output_tokens=json_data["max_tokens"],
+        requested_model=model,
+        max_cost=max_cost,
+        max_latency=max_latency,
+    )
+    default_tracker.record_route(model, decision.model, decision.reason)
+    if decision.rerouted:
+        logger.info(
+            f"Routing from {decision.requested_model} to {decision.model} "
+            f"({decision.reason})"
+        )
+        json_data["model"] = decision.model
 
-    if token_count_approx >= 4_096:
-        model = GPT_MODEL_BIG_CONTEXT
-        json_data["max_tokens"] = 16_384
-        json_data["model"] = model
-        json_data["messages"][-1]["content"] = json_data["messages"][-1][
-            "content"
-        ].strip()[:40_000]
 
-    json_data["max_tokens"] = min(
-        max(json_data["max_tokens"] - int(token_count_approx), 200), 16_384
+async def _cached_response(
+    cache: ResponseCache, json_data: dict, usage: Usage | None
+) -> tuple[str, list[str] | None]:
+    """The cache key of the request and its cached data items, if any"""
+    key = cache_key(
+        json_data["model"],
+        json_data["messages"],
+        json_data.get("functions"),
+        **{k: v for k, v in json_data.items() if k not in _CACHE_KEY_EXCLUDE},
     )
+    cached = await asyncio.to_thread(cache.get, key)
+    if usage is not None:
+        usage.update(cache_hits=cached is not None, cache_misses=cached is None)
+    if cached is None:
+        return key, None
+    default_tracker.record(json_data["model"], cache_hit=True, call_site=_call_site())
+    return key, json.loads(cached)
+
 
-    async with AsyncClient(timeout=timeout) as client:
+def _usage_event(prompt_tokens: int) -> ServerSentEvent:
+    return ServerSentEvent(
+        data=json.dumps(
+            {"usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 0}}
+        )
+    )
+
+
+def _parse_line(line: str) -> ServerSentEvent | None:
+    """The event of one response line, None for the blank lines between events"""
+    if line.startswith("event:"):
+        return ServerSentEvent(event=line[6:].strip())
+    if line.startswith("id:"):
+        return ServerSentEvent(id=line[3:].strip())
+    if line.startswith("retry:"):
+        return ServerSentEvent(retry=line[6:].strip())
+    data = (line[5:] if line.startswith("data:") else line).strip()
+    return ServerSentEvent(data=data) if data else None
+
+
+@dataclass
+class _StreamState:
+    """Progress of a request across its attempts"""
+
+    limiter: Any = None
+    budget: int = 0  # tokens charged against the limiter per attempt
+    usage: Usage | None = None
+    charged: int = 0
+    retries: int = 0
+    # Data items yielded, stored in the cache once the response is complete
+    recorded: list[str] = field(default_factory=list)
+
+    async def retry(self, error: Exception, delay: float):
+        """Waits `delay` seconds before the next attempt"""
+        if self.limiter is not None and is_rate_limit(error):
+            self.limiter.pause(delay)
+        self.retries += 1
+        if self.usage is not None:
+            self.usage.update(retries=1)
+        await asyncio.sleep(delay)
+        if self.limiter is not None:
+            self.charged += await self.limiter.acquire(self.budget)
+
+
+async def _resumable_events(
+    post: Callable[[], AsyncGenerator[str | None, None]],
+    state: _StreamState,
+    retrier,
+    resume: bool = True,
+    connected: ServerSentEvent | None = None,
+) -> AsyncGenerator[ServerSentEvent, None]:
+    """Yields the events of the response to `post()`, retrying transient
+    failures.  A retry with `resume` skips the data items already yielded,
+    without it a failure after the first data item is raised.  `connected` is
+    yielded once the first attempt connects."""
+    while True:
+        skip, seen = len(state.recorded), 0
         try:
-            response = await client.post(url, headers=headers, json=json_data)
-            if response.status_code != 200:
-                raise ValueError(f"Failed to post to {url}. Response: {response.text}")
-            yield ServerSentEvent(
-                data=json.dumps(
-                    {
-                        "usage": {
-                            "prompt_tokens": token_count_approx,
-                            "completion_tokens": 0,
-                        }
-                    }
+            async with aclosing(post()) as lines:
+                async for line in lines:
+                    if line is None:
+                        if connected is not None:
+                            yield connected
+                            connected = None
+                        continue
+                    event = _parse_line(line)
+                    if event is None:
+                        continue
+                    if event.data is not None:
+                        seen += 1
+                        if seen <= skip:
+                            continue
+                        state.recorded.append(event.data)
+                    yield event
+            return
+        except (TransportError, RetryableHTTPError) as e:
+            if state.recorded and not resume:
+                raise
+            delay = retrier.next_delay(e)
+            if delay is None:
+                raise
+            await state.retry(e, delay)
+
+
+def _call_site() -> str:
+    """Streams started outside a tracked coroutine are labelled by this function"""
+    _, call_site = current_labels()
+    return call_site if call_site != UNKNOWN else "streaming_chat_completion_request"
+
+
+async def _post_lines(
+    client: AsyncClient, url: str, headers: dict, json_data: dict, timeout=None
+) -> AsyncGenerator[str | None, None]:
+    """Posts the request and yields None once connected, then each response line"""
+    async with client.stream(
+        "POST", url, headers=headers, json=json_data, timeout=timeout
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise RetryableHTTPError(
+                    response.status_code,
+                    response.text,
+                    parse_retry_after(response.headers),
                 )
-            )
-            async for chunk in response.aiter_lines():
-                if chunk.startswith("data:"):
-                    yield ServerSentEvent(data=chunk[5:].strip())
-                elif chunk.startswith("event:"):
-                    yield ServerSentEvent(event=chunk[6:].strip())
-                elif chunk.startswith("id:"):
-                    yield ServerSentEvent(id=chunk[3:].strip())
-                elif chunk.startswith("retry:"):
-                    yield ServerSentEvent(retry=chunk[6:].strip())
-                else:
-                    yield ServerSentEvent(data=chunk.strip())
-        except GeneratorExit:
-            pass  # Handle the generator being closed, if necessary
-        except ReadTimeout:
-            yield ServerSentEvent(
-                data="timeout: Timeout reading the response", event="error"
-            )
-        except Exception as e:
-            yield ServerSentEvent(data=str(e), event="error")
+            raise ValueError(f"Failed to post to {url}. Response: {response.text}")
+        yield None
+        async for line in response.aiter_lines():
+            yield line
+
+
+def _actual_tokens(recorded: list[str], stream: bool, prompt_tokens: float) -> int:
+    """Tokens used by a response, for reconciling the rate limiter.
+    Streams carry roughly one token per chunk and report no usage."""
+    if not recorded:
+        return 0
+    if stream:
+        return int(prompt_tokens) + sum(1 for d in recorded if d and d != "[DONE]")
+    try:
+        return json.loads("".join(recorded))["usage"]["total_tokens"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return int(prompt_tokens)
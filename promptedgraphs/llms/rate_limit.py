@@ -0,0 +1,127 @@
+"""Client-side rate limiting of LLM requests
+
+Each model gets a limiter tracking requests-per-minute (RPM) and
+tokens-per-minute (TPM) with a pair of token buckets.  Requests are charged
+their estimated prompt tokens plus `max_tokens` up front and reconciled with
+the usage reported by the API once the response arrives.
+"""
+import asyncio
+import json
+import threading
+import time
+from logging import getLogger
+
+from promptedgraphs.llms.usage import estimate_tokens
+
+logger = getLogger(__name__)
+
+# (requests per minute, tokens per minute); override with Config.rate_limit_rpm/tpm
+DEFAULT_RATE_LIMITS: dict[str, tuple[int, int]] = {
+    "gpt-3.5-turbo": (3_500, 160_000),
+    "gpt-4-0125-preview": (500, 300_000),
+    "default": (500, 60_000),
+}
+
+# Shared limiters keyed by (model, rpm, tpm)
+_limiter_registry: dict[tuple, "RateLimiter"] = {}
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at `capacity` tokens per `period` seconds.
+
+    Reservations are debited immediately and may push the level below zero;
+    the caller then waits until the bucket has refilled the deficit.
+    This keeps waiting callers in FIFO order without holding a lock while asleep.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Debits `amount` and returns the seconds to wait before using it"""
+        self._refill(now)
+        # A single request larger than the bucket would otherwise wait forever
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float, now: float):
+        """Credits (or debits, when negative) the bucket"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Async RPM/TPM limiter shared by every request to a model"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.wait_time = 0.0  # total seconds callers spent throttled
+        self._lock = threading.Lock()
+
+    async def acquire(self, tokens: int) -> int:
+        """Waits until a request of `tokens` tokens may be sent; returns the charge"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                self.blocked_until - now,
+            )
+            self.wait_time += wait
+        if wait > 0:
+            logger.debug(f"Rate limited: waiting {wait:.2f}s for {tokens} tokens")
+            await asyncio.sleep(wait)
+        return tokens
+
+    def reconcile(self, charged: int, actual: int | None):
+        """Returns unused tokens to the bucket (or charges the overrun)"""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.refund(charged - actual, time.monotonic())
+
+    def pause(self, seconds: float):
+        """Blocks new requests, e.g. after the server returned a 429"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def get_rate_limiter(model, config=None) -> RateLimiter | None:
+    """Returns the shared limiter for a model or None when rate limiting is disabled"""
+    if config is not None and not config.rate_limit_enabled:
+        return None
+    model = getattr(model, "value", model)
+    default_rpm, default_tpm = DEFAULT_RATE_LIMITS.get(
+        model, DEFAULT_RATE_LIMITS["default"]
+    )
+    rpm = getattr(config, "rate_limit_rpm", None) or default_rpm
+    tpm = getattr(config, "rate_limit_tpm", None) or default_tpm
+
+    key = (model, rpm, tpm)
+    limiter = _limiter_registry.get(key)
+    if limiter is None:
+        limiter = _limiter_registry[key] = RateLimiter(rpm, tpm)
+    return limiter
+
+
+def estimate_request_tokens(json_data: dict, model) -> int:
+    """Pre-flight token charge of a request: prompt estimate plus `max_tokens`.
+    The charge is reconciled with the reported usage, so it is approximated."""
+    model = getattr(model, "value", model)
+    try:
+        prompt_tokens = estimate_tokens(json_data, model=model, approximate=True)
+    except TypeError:
+        # Non-text content, fall back to ~4 characters per token
+        prompt_tokens = len(json.dumps(json_data.get("messages", []), default=str)) // 4
+    return int(prompt_tokens) + int(json_data.get("max_tokens") or 0)
@@ -0,0 +1,162 @@
+"""Retries with decorrelated jitter, Retry-After support and retry budgets
+
+A `RetryPolicy` bounds the retries of a single call (attempts and elapsed time),
+while a process-wide `RetryBudget` caps retries as a fraction of all requests so
+that an outage does not multiply the load on the API.
+"""
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass
+from logging import getLogger
+
+import httpx
+
+logger = getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RetryableHTTPError(Exception):
+    """A non-200 response that is worth retrying"""
+
+    def __init__(self, status_code: int, message: str, retry_after: float | None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers) -> float | None:
+    """Returns the delay in seconds requested by `Retry-After` style headers"""
+    if headers is None:
+        return None
+    if (retry_after_ms := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:  # HTTP-date
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_after_from_exception(e: Exception) -> float | None:
+    import openai
+
+    if isinstance(e, RetryableHTTPError):
+        return e.retry_after
+    if isinstance(e, openai.APIStatusError):
+        return parse_retry_after(e.response.headers)
+    return None
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (RetryableHTTPError, httpx.TransportError)):
+        return True
+    import openai
+
+    if isinstance(e, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_rate_limit(e: Exception) -> bool:
+    import openai
+
+    return isinstance(e, openai.RateLimitError) or (
+        isinstance(e, RetryableHTTPError) and e.status_code == 429
+    )
+
+
+class RetryBudget:
+    """Process-wide budget: each request deposits `ratio` retry tokens and each
+    retry withdraws one.  `min_tokens` allows a few retries at low traffic."""
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                self.exhausted += 1
+                return False
+            self.tokens -= 1
+            self.retries += 1
+            return True
+
+
+default_retry_budget = RetryBudget()
+
+
+@dataclass
+class RetryPolicy:
+    """Per-call retry limits using decorrelated jitter backoff"""
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    max_elapsed: float | None = 120.0
+
+    def retrier(self, budget: RetryBudget | None = None) -> "Retrier":
+        return Retrier(self, default_retry_budget if budget is None else budget)
+
+
+class Retrier:
+    """Tracks the retries of a single call"""
+
+    def __init__(self, policy: RetryPolicy, budget: RetryBudget):
+        self.policy = policy
+        self.budget = budget
+        self.attempts = 1
+        self.start_time = time.monotonic()
+        self._delay = policy.base_delay
+        budget.record_request()
+
+    def next_delay(self, e: Exception) -> float | None:
+        """Seconds to wait before retrying after `e`, or None to give up"""
+        if not is_retryable(e) or self.attempts >= self.policy.max_attempts:
+            return None
+
+        # Decorrelated jitter: sleep = min(cap, random(base, previous sleep * 3))
+        self._delay = min(
+            self.policy.max_delay,
+            random.uniform(self.policy.base_delay, self._delay * 3),
+        )
+        delay = self._delay
+        if (retry_after := retry_after_from_exception(e)) is not None:
+            delay = max(delay, retry_after)
+
+        elapsed = time.monotonic() - self.start_time
+        if (
+            self.policy.max_elapsed is not None
+            and elapsed + delay > self.policy.max_elapsed
+        ):
+            return None
+        if not self.budget.withdraw():
+            logger.warning("Retry budget exhausted, not retrying")
+            return None
+
+        self.attempts += 1
+        logger.info(f"Retrying in {delay:.2f}s (attempt {self.attempts}): {e}")
+        return delay
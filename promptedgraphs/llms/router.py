@@ -0,0 +1,242 @@
+"""Picks the cheapest model that can serve a request
+
+Every model is described by a `ModelSpec` (context window, output limit,
+pricing and typical latency).  Given a request's prompt tokens, its expected
+output tokens and the caller's cost and latency limits, `ModelRouter.route`
+returns the cheapest model that fits, or raises `RoutingError`; requests are
+never truncated to fit a model.
+
+    decision = get_router().route(prompt_tokens=20_000, output_tokens=1_000)
+    decision.model  # "gpt-4-0125-preview", gpt-3.5-turbo's window is too small
+"""
+import threading
+from dataclasses import dataclass, field
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    context_window: int  # prompt plus completion tokens
+    max_output_tokens: int
+    prompt_price: float  # dollars per 1000 tokens
+    completion_price: float  # dollars per 1000 tokens
+    time_to_first_token: float = 0.5  # seconds
+    output_tokens_per_second: float = 50.0
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (
+            prompt_tokens * self.prompt_price
+            + completion_tokens * self.completion_price
+        ) / 1000
+
+    def expected_latency(self, output_tokens: int) -> float:
+        return self.time_to_first_token + output_tokens / self.output_tokens_per_second
+
+
+# Prices and latencies are list prices and typical figures, adjust them with
+# `register_model` for your account and deployment
+DEFAULT_MODELS = [
+    ModelSpec(
+        name="gpt-3.5-turbo",
+        context_window=16_385,
+        max_output_tokens=4_096,
+        prompt_price=0.0010,
+        completion_price=0.0020,
+        time_to_first_token=0.4,
+        output_tokens_per_second=80.0,
+    ),
+    ModelSpec(
+        name="gpt-4-0125-preview",
+        context_window=128_000,
+        max_output_tokens=4_096,
+        prompt_price=0.03,
+        completion_price=0.06,
+        time_to_first_token=0.8,
+        output_tokens_per_second=30.0,
+    ),
+]
+
+
+class RoutingError(ValueError):
+    """No model satisfies the request and the caller's constraints"""
+
+
+@dataclass
+class RouteDecision:
+    model: str
+    requested_model: str | None
+    prompt_tokens: int
+    output_tokens: int
+    estimated_cost: float
+    expected_latency: float
+    # "requested" when the requested model fits, "cheapest" when none was
+    # requested, else the constraint the requested model violates
+    reason: str
+    rejected: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def rerouted(self) -> bool:
+        return self.requested_model is not None and self.model != self.requested_model
+
+    def dict(self):
+        return {
+            "model": self.model,
+            "requested_model": self.requested_model,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "estimated_cost": self.estimated_cost,
+            "expected_latency": self.expected_latency,
+            "reason": self.reason,
+            "rejected": self.rejected,
+        }
+
+
+class ModelRouter:
+    def __init__(self, models: list[ModelSpec] | None = None):
+        self.models: dict[str, ModelSpec] = {
+            m.name: m for m in (DEFAULT_MODELS if models is None else models)
+        }
+        self._lock = threading.Lock()
+
+    def register_model(self, spec: ModelSpec):
+        """Adds a model or replaces the spec of a known one"""
+        with self._lock:
+            self.models[spec.name] = spec
+
+    def get(self, model) -> ModelSpec | None:
+        return self.models.get(getattr(model, "value", model))
+
+    def _reject_reason(
+        self,
+        spec: ModelSpec,
+        prompt_tokens: int,
+        output_tokens: int,
+        max_cost: float | None,
+        max_latency: float | None,
+    ) -> tuple[str, str] | None:
+        """The constraint `spec` violates and a description, if any"""
+        if output_tokens > spec.max_output_tokens:
+            return "max_output_tokens", (
+                f"{output_tokens} output tokens exceed {spec.max_output_tokens}"
+            )
+        if prompt_tokens + output_tokens > spec.context_window:
+            return "context_window", (
+                f"{prompt_tokens} prompt + {output_tokens} output tokens exceed "
+                f"the {spec.context_window} token context window"
+            )
+        if max_cost is not None and spec.cost(prompt_tokens, output_tokens) > max_cost:
+            return "max_cost", f"estimated cost exceeds ${max_cost}"
+        if (
+            max_latency is not None
+            and spec.expected_latency(output_tokens) > max_latency
+        ):
+            return "max_latency", f"expected latency exceeds {max_latency}s"
+        return None
+
+    def route(
+        self,
+        prompt_tokens: int,
+        output_tokens: int = 0,
+        requested_model=None,
+        models: list[str] | None = None,
+        max_cost: float | None = None,
+        max_latency: float | None = None,
+    ) -> RouteDecision:
+        """Returns the requested model when it satisfies the constraints, else
+        the cheapest of `models` (default: all registered models) that does.
+
+        Raises `RoutingError` when no model fits, rather than truncating.
+        """
+        requested = getattr(requested_model, "value", requested_model)
+        with self._lock:
+            specs = dict(self.models)
+        names = (
+            list(specs) if models is None else [getattr(m, "value", m) for m in models]
+        )
+        if requested is not None and requested not in specs:
+            # Unknown models (e.g. served by a custom base_url) are used as is
+            logger.debug(f"No spec for model {requested}, skipping routing")
+            return RouteDecision(
+                model=requested,
+                requested_model=requested,
+                prompt_tokens=prompt_tokens,
+                output_tokens=output_tokens,
+                estimated_cost=0.0,
+                expected_latency=0.0,
+                reason="unknown_model",
+            )
+
+        rejected = {}
+        reason = "cheapest"
+        candidates = []
+        order = ([requested] if requested else []) + [
+            n for n in names if n != requested
+        ]
+        for name in order:
+            spec = specs.get(name)
+            if spec is None:
+                rejected[name] = "unknown model"
+                continue
+            violation = self._reject_reason(
+                spec, prompt_tokens, output_tokens, max_cost, max_latency
+            )
+            if violation is not None:
+                rejected[name] = violation[1]
+                if name == requested:
+                    reason = violation[0]
+            elif name == requested:
+                return self._decision(spec, prompt_tokens, output_tokens, requested)
+            else:
+                candidates.append(spec)
+
+        if not candidates:
+            details = "; ".join(f"{n}: {r}" for n, r in rejected.items())
+            raise RoutingError(
+                f"No model can serve {prompt_tokens} prompt and {output_tokens} "
+                f"output tokens ({details}). Split the input, e.g. with "
+                "`promptedgraphs.extraction.chunking.chunk_text`"
+            )
+        best = min(
+            candidates,
+            key=lambda s: (
+                s.cost(prompt_tokens, output_tokens),
+                s.expected_latency(output_tokens),
+            ),
+        )
+        return self._decision(
+            best, prompt_tokens, output_tokens, requested, reason, rejected
+        )
+
+    @staticmethod
+    def _decision(
+        spec: ModelSpec,
+        prompt_tokens: int,
+        output_tokens: int,
+        requested: str | None,
+        reason: str = "requested",
+        rejected: dict[str, str] | None = None,
+    ) -> RouteDecision:
+        return RouteDecision(
+            model=spec.name,
+            requested_model=requested,
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            estimated_cost=round(spec.cost(prompt_tokens, output_tokens), 6),
+            expected_latency=round(spec.expected_latency(output_tokens), 3),
+            reason=reason,
+            rejected=rejected or {},
+        )
+
+
+default_router = ModelRouter()
+
+
+def get_router() -> ModelRouter:
+    return default_router
+
+
+def get_model_spec(model) -> ModelSpec | None:
+    return default_router.get(model)
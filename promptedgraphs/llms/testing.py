@@ -0,0 +1,47 @@
+"""Test fixtures running the pipelines against a `MockChatServer`
+
+    class TestExtraction(MockChatTestCase):
+        def responder(self, request):
+            return json.dumps({"items": []})
+
+        def test_extract(self):
+            ...  # self.server, self.config and self.chat point at the mock
+"""
+import unittest
+
+from promptedgraphs.config import Config
+from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.mock_server import MockChatServer, default_responder
+
+
+def mock_config(server: MockChatServer, **kwargs) -> Config:
+    """A config calling `server`, without the response cache and rate limits
+    so every call reaches the server"""
+    return Config(
+        **{
+            "openai_api_key": "mock",
+            "openai_base_url": server.base_url,
+            "llm_cache_path": None,
+            "rate_limit_enabled": False,
+        }
+        | kwargs
+    )
+
+
+class MockChatTestCase(unittest.TestCase):
+    """Starts a `MockChatServer` answering with `responder` for every test"""
+
+    # Options of the MockChatServer, e.g. {"latency": 0.01}
+    server_options: dict = {}
+
+    def responder(self, request: dict) -> dict | str:
+        return default_responder(request)
+
+    def setUp(self):
+        super().setUp()
+        self.server = MockChatServer(
+            responder=self.responder, **self.server_options
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.config = mock_config(self.server)
+        self.chat = Chat(config=self.config)
@@ -0,0 +1,91 @@
+"""Token counting with cached encodings and memoized counts
+
+`tiktoken.encoding_for_model` is resolved once per model, and the counts of
+static strings (system prompts, function specs) are memoized by hash so they
+are only encoded once.  `approximate=True` skips the tokenizer entirely and
+estimates ~4 characters per token, which is enough for routing decisions.
+"""
+import math
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
+import tiktoken
+
+logger = getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING = "cl100k_base"
+MAX_MEMOIZED_COUNTS = 10_000
+
+_encodings: dict[str, tiktoken.Encoding | None] = {}
+_counts: OrderedDict[tuple, int] = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_encoding(model=None) -> tiktoken.Encoding:
+    """Returns the (cached) encoding of a model, `cl100k_base` for unknown models.
+    Raises `OSError` when the vocabulary cannot be downloaded."""
+    model = getattr(model, "value", model) or DEFAULT_ENCODING
+    if (encoding := _encodings.get(model)) is not None:
+        return encoding
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    _encodings[model] = encoding
+    return encoding
+
+
+def _get_encoding_or_none(model=None) -> tiktoken.Encoding | None:
+    model = getattr(model, "value", model) or DEFAULT_ENCODING
+    if model in _encodings:
+        return _encodings[model]
+    try:
+        return get_encoding(model)
+    except OSError as e:
+        logger.warning(f"Tokenizer unavailable, approximating token counts: {e}")
+        _encodings[model] = None
+        return None
+
+
+def approximate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_tokens(
+    text: str, model=None, approximate: bool = False, memoize: bool = False
+) -> int:
+    """Number of tokens in `text`.
+
+    Set `memoize` for strings repeated across requests such as system prompts
+    and function specs; their counts are kept in an LRU keyed by hash.
+    Falls back to the approximation when the tokenizer cannot be loaded.
+    """
+    if not text:
+        return 0
+    if approximate:
+        return approximate_tokens(text)
+
+    encoding = _get_encoding_or_none(model)
+    if encoding is None:
+        return approximate_tokens(text)
+    if not memoize:
+        return len(encoding.encode(text, allowed_special="all"))
+
+    key = (encoding.name, len(text), hash(text))
+    with _lock:
+        if (count := _counts.get(key)) is not None:
+            _counts.move_to_end(key)
+            return count
+    count = len(encoding.encode(text, allowed_special="all"))
+    with _lock:
+        _counts[key] = count
+        if len(_counts) > MAX_MEMOIZED_COUNTS:
+            _counts.popitem(last=False)
+    return count
+
+
+def clear_token_cache():
+    with _lock:
+        _counts.clear()
@@ -1,10 +1,11 @@
 import json
+import threading
 import time
 from logging import getLogger
 
-import tiktoken
-
 from promptedgraphs.llms.openai_chat import LanguageModel
+from promptedgraphs.llms.router import get_model_spec
+from promptedgraphs.llms.tokens import count_tokens
 
 logger = getLogger(__name__)
 
@@ -12,6 +13,10 @@ logger = getLogger(__name__)
 class Usage:
     prompt_tokens: int = 0
     completion_tokens: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    coalesced_calls: int = 0
+    retries: int = 0
 
     def __init__(self, model: str, computer: str = "unknown") -> None:
         self.model = model
@@ -19,13 +24,56 @@ class Usage:
         self.duration = 0
         self.prompt_tokens = 0
         self.completion_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced_calls = 0
+        self.retries = 0
         self.start_time = time.time()
+        # Guards the counters, a Usage may be shared by tasks running in threads
+        self._lock = threading.Lock()
 
     def start(self):
         self.prompt_tokens = 0
         self.completion_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced_calls = 0
+        self.retries = 0
         self.start_time = time.time()
 
+    def update(
+        self,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cache_hits: int = 0,
+        cache_misses: int = 0,
+        coalesced_calls: int = 0,
+        retries: int = 0,
+    ) -> "Usage":
+        """Atomically increments the counters"""
+        with self._lock:
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+            self.cache_hits += cache_hits
+            self.cache_misses += cache_misses
+            self.coalesced_calls += coalesced_calls
+            self.retries += retries
+        return self
+
+    def add(self, other: "Usage") -> "Usage":
+        """Accumulates the token and call counters of `other`, e.g. of a sub-task"""
+        return self.update(
+            prompt_tokens=other.prompt_tokens,
+            completion_tokens=other.completion_tokens,
+            cache_hits=other.cache_hits,
+            cache_misses=other.cache_misses,
+            coalesced_calls=other.coalesced_calls,
+            retries=other.retries,
+        )
+
+    def __iadd__(self, other: "Usage") -> "Usage":
+        return self.add(other)
+
     def end(self):
         self.end_time = time.time()
         self.duration = self.end_time - self.start_time
@@ -47,6 +95,10 @@ class Usage:
             "model": self.model,
             "prompt_tokens": self.prompt_tokens,
             "completion_tokens": self.completion_tokens,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "coalesced_calls": self.coalesced_calls,
+            "retries": self.retries,
             "duration": self.duration,
             "cost": self.cost,
             "llm_cost": self.llm_cost,
@@ -57,57 +109,65 @@ class Usage:
         return f"Usage(model={self.model}, prompt_tokens={self.prompt_tokens}, completion_tokens={self.completion_tokens}, duration={self.duration:.4f}, cost={self.cost:.6f}), compute_cost={self.compute_cost:.6f}), llm_cost={self.llm_cost:.6f})"
 
 
-def num_tokens_from_messages(messages, model="gpt-3.5-turbo-1106"):
+def _join_tokens(counts: list[int]) -> int:
+    """Tokens of the parts joined by `<|endoftext|>`, a single special token
+    that BPE merges never cross"""
+    return sum(counts) + max(0, len(counts) - 1)
+
+
+def num_tokens_from_messages(
+    messages, model="gpt-3.5-turbo-1106", approximate: bool = False
+):
     """Returns the number of tokens used by a list of messages.
     See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens.
+    System prompts are memoized as they repeat across requests.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+    model = getattr(model, "value", model)
     if model == "gpt-3.5-turbo-1106":
         num_tokens = 0
         for message in messages:
             num_tokens += (
                 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
             )
+            static = message.get("role") == "system"
             for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
+                num_tokens += count_tokens(
+                    value, model, approximate, memoize=static or key != "content"
+                )
                 if key == "name":  # if there's a name, the role is omitted
                     num_tokens += -1  # role is always required and always 1 token
         num_tokens += 2  # every reply is primed with <im_start>assistant
         return num_tokens
-    else:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(
-            encoding.encode(
-                "<|endoftext|>".join(
-                    [l for m in messages for l in m.values() if l is not None]
-                ),
-                allowed_special=set(encoding._special_tokens.keys()),
+    return _join_tokens(
+        [
+            count_tokens(
+                value,
+                model,
+                approximate,
+                memoize=m.get("role") == "system" or key != "content",
             )
-        )
+            for m in messages
+            for key, value in m.items()
+            if value is not None
+        ]
+    )
 
 
-def estimate_tokens(json_data, model="gpt-3.5-turbo-1106"):
+def estimate_tokens(json_data, model="gpt-3.5-turbo-1106", approximate: bool = False):
+    """Prompt tokens of a chat completion request, messages plus functions.
+    `approximate` skips the tokenizer (~4 characters per token)."""
     # Adjust max_tokens based on message length and function length
     message_tokens = num_tokens_from_messages(
-        json_data.get("messages", []), model=model
+        json_data.get("messages", []), model=model, approximate=approximate
     )
-
-    encoding = tiktoken.encoding_for_model(model)
-    function_tokens = len(
-        encoding.encode(
-            "<|endoftext|>".join(
-                [
-                    json.dumps(l)
-                    for m in json_data.get("functions", [])
-                    for l in m.values()
-                    if l is not None
-                ]
-            ),
-            allowed_special=set(encoding._special_tokens.keys()),
-        )
+    # Function specs are identical across calls, their counts are memoized
+    function_tokens = _join_tokens(
+        [
+            count_tokens(json.dumps(l), model, approximate, memoize=True)
+            for m in json_data.get("functions", [])
+            for l in m.values()
+            if l is not None
+        ]
     )
     return function_tokens + message_tokens
 
@@ -129,37 +189,17 @@ def calculate_compute_costs(usage: Usage, computer: str):
     return round(usage.duration * compute_pricing, 6)
 
 
-def calculate_langage_model_costs(usage: Usage, model: LanguageModel):
-    # Pricing in dollars per 1000 tokenspricing = {
-    pricing = {
-        LanguageModel.GPT4: {
-            "prompt": 0.03,
-            "completion": 0.06,
-        },
-        LanguageModel.GPT35_turbo: {
-            "prompt": 0.0010,
-            "completion": 0.0020,
-        },
-        "default": {
-            "prompt": 0.0,
-            "completion": 0.0,
-        },
-    }
-
-    try:
-        model_pricing = pricing[model]
-    except KeyError as e:
+def calculate_langage_model_costs(usage: Usage, model: LanguageModel | str):
+    # Pricing in dollars per 1000 tokens, from the specs of the model router
+    spec = get_model_spec(model)
+    if spec is None:
         if isinstance(model, LanguageModel):
-            raise ValueError(f"Model {model} not found in pricing table") from e
-        else:
-            logger.warning(
-                f"Model {model} not found in pricing table, using default pricing of 0"
-            )
-            model_pricing = pricing["default"]
-
-    prompt_cost = usage.prompt_tokens * model_pricing["prompt"] / 1000
-    completion_cost = usage.completion_tokens * model_pricing["completion"] / 1000
+            raise ValueError(f"Model {model} not found in pricing table")
+        logger.warning(
+            f"Model {model} not found in pricing table, using default pricing of 0"
+        )
+        return 0.0
 
-    total_cost = prompt_cost + completion_cost
+    total_cost = spec.cost(usage.prompt_tokens, usage.completion_tokens)
     # round to 6 decimals
     return round(total_cost, 6)
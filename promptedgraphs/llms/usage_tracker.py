@@ -0,0 +1,224 @@
+"""Process-wide, thread-safe accounting of LLM calls
+
+Every call made through `Chat` or `streaming_chat_completion_request` is
+recorded in `default_tracker` under its model, pipeline stage and call site.
+The stage and call site come from the innermost `@track_usage(...)` coroutine
+being awaited, and contextvars carry them into tasks spawned from it.
+
+    print(default_tracker.to_prometheus())
+    default_tracker.write_jsonl("usage.jsonl")
+"""
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+UNKNOWN = "unknown"
+
+# (stage, call_site) of the LLM calls made in the current context
+_labels: ContextVar[tuple[str, str]] = ContextVar(
+    "promptedgraphs_usage_labels", default=(UNKNOWN, UNKNOWN)
+)
+
+
+def current_labels() -> tuple[str, str]:
+    return _labels.get()
+
+
+def track_usage(stage: str, call_site: str | None = None):
+    """Decorates a coroutine function so the LLM calls it makes are recorded
+    under `stage` and `call_site` (by default the function's name)"""
+
+    def decorator(fn):
+        site = call_site or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            token = _labels.set((stage, site))
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _labels.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_sum: float = 0.0
+    latency_buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+
+class UsageTracker:
+    """Counters and latency histograms per (model, stage, call site)"""
+
+    def __init__(self):
+        self._stats: dict[tuple[str, str, str], CallStats] = {}
+        # Routing decisions per (requested model, chosen model, reason)
+        self._routes: dict[tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float | None = None,
+        retries: int = 0,
+        error: bool = False,
+        cache_hit: bool = False,
+        stage: str | None = None,
+        call_site: str | None = None,
+    ):
+        """Records one call; cache hits only count as hits, not as calls"""
+        current_stage, current_site = _labels.get()
+        key = (
+            str(getattr(model, "value", model)),
+            stage or current_stage,
+            call_site or current_site,
+        )
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CallStats()
+            if cache_hit:
+                stats.cache_hits += 1
+                return
+            stats.calls += 1
+            stats.errors += error
+            stats.retries += retries
+            stats.prompt_tokens += prompt_tokens or 0
+            stats.completion_tokens += completion_tokens or 0
+            if latency is not None:
+                stats.latency_sum += latency
+                stats.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def record_route(self, requested_model, model, reason: str):
+        """Counts a decision of the model router"""
+        key = (
+            str(getattr(requested_model, "value", requested_model)),
+            str(getattr(model, "value", model)),
+            reason,
+        )
+        with self._lock:
+            self._routes[key] = self._routes.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._routes.clear()
+
+    def route_snapshot(self) -> list[dict]:
+        with self._lock:
+            routes = sorted(self._routes.items())
+        return [
+            {"requested_model": requested, "model": model, "reason": reason, "count": n}
+            for (requested, model, reason), n in routes
+        ]
+
+    def snapshot(self) -> list[dict]:
+        """One dict of counters per (model, stage, call site)"""
+        with self._lock:
+            items = [
+                (key, CallStats(**{**vars(s), "latency_buckets": [*s.latency_buckets]}))
+                for key, s in self._stats.items()
+            ]
+        return [
+            {
+                "model": model,
+                "stage": stage,
+                "call_site": call_site,
+                "calls": s.calls,
+                "errors": s.errors,
+                "cache_hits": s.cache_hits,
+                "retries": s.retries,
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "latency_sum": round(s.latency_sum, 6),
+                "latency_buckets": dict(
+                    zip([*map(str, LATENCY_BUCKETS), "+Inf"], s.latency_buckets)
+                ),
+            }
+            for (model, stage, call_site), s in sorted(items)
+        ]
+
+    def to_jsonl(self) -> str:
+        timestamp = time.time()
+        rows = [
+            *self.snapshot(),
+            *({"kind": "route", **row} for row in self.route_snapshot()),
+        ]
+        return "".join(
+            json.dumps({"timestamp": timestamp, **row}) + "\n" for row in rows
+        )
+
+    def write_jsonl(self, path):
+        """Appends the current snapshot to a JSON lines file"""
+        with open(path, "a") as f:
+            f.write(self.to_jsonl())
+
+    def to_prometheus(self, prefix: str = "promptedgraphs_llm") -> str:
+        """The counters in the Prometheus text exposition format"""
+        rows = self.snapshot()
+        lines = []
+        counters = [
+            ("calls", "LLM calls made"),
+            ("errors", "LLM calls that failed after retries"),
+            ("cache_hits", "LLM calls answered by the response cache"),
+            ("retries", "Retried LLM requests"),
+            ("prompt_tokens", "Prompt tokens used"),
+            ("completion_tokens", "Completion tokens used"),
+        ]
+        for name, help_text in counters:
+            lines.append(f"# HELP {prefix}_{name}_total {help_text}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for row in rows:
+                lines.append(
+                    f"{prefix}_{name}_total{{{_labels_text(row)}}} {row[name]}"
+                )
+
+        name = f"{prefix}_request_duration_seconds"
+        lines.append(f"# HELP {name} Latency of LLM calls including retries")
+        lines.append(f"# TYPE {name} histogram")
+        for row in rows:
+            labels = _labels_text(row)
+            cumulative = 0
+            for le, count in row["latency_buckets"].items():
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {row['latency_sum']}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+        name = f"{prefix}_route_decisions_total"
+        lines.append(f"# HELP {name} Model router decisions")
+        lines.append(f"# TYPE {name} counter")
+        for row in self.route_snapshot():
+            labels = _labels_text(row, ("requested_model", "model", "reason"))
+            lines.append(f"{name}{{{labels}}} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels_text(row: dict, labels=("model", "stage", "call_site")) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{label}="{escape(row[label])}"' for label in labels)
+
+
+default_tracker = UsageTracker()
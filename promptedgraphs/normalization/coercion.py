@@ -0,0 +1,309 @@
+"""Deterministic corrections of common validation errors
+
+Many validation errors have an unambiguous fix that needs no language model:
+`"1,000"` for an integer, `" Yes "` for a boolean, `"12/31/2024"` for a date,
+`"In Progress"` for the enum value `"in_progress"` or a `"First_Name"` key for
+the `first_name` field.  `coerce_errors` fixes such errors with rules keyed on
+the pydantic error `type` and the target subschema, and returns the errors it
+could not resolve so `object_to_data` only escalates those to the LLM.
+
+Rules never guess: a value is only changed when exactly one reading of it is
+valid, e.g. `"1,5"` is left for the LLM since it may mean 1.5 or 15, and
+`"01/02/2024"` since it may mean January 2 or February 1.
+"""
+import copy
+import datetime
+import re
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any
+
+from promptedgraphs.generation.schema_inference import is_integral
+
+logger = getLogger(__name__)
+
+TRUE_STRINGS = {"true", "yes", "y", "t", "1", "on", "enabled"}
+FALSE_STRINGS = {"false", "no", "n", "f", "0", "off", "disabled"}
+
+# Dates with slashes or dashes are read month first, as in US data, and with
+# dots day first, unless their day and month could be swapped
+DATE_FORMATS = [
+    "%m/%d/%Y",
+    "%m-%d-%Y",
+    "%Y/%m/%d",
+    "%d.%m.%Y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+    "%Y%m%d",
+]
+TIME_FORMATS = ["%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M:%S %p"]
+# Numeric day and month fields, either of which may come first
+DAY_MONTH_FORMATS = {"%m/%d/%Y", "%m-%d-%Y", "%d.%m.%Y"}
+
+# Digits with thousands separators, e.g. 1,234,567.89
+THOUSANDS_PATTERN = re.compile(r"^[+-]?\d{1,3}(?:,\d{3})+(?:\.\d+)?$")
+CURRENCY_SYMBOLS = "$€£¥"
+
+
+@dataclass
+class CoercionStats:
+    """Validation errors resolved by each tier of `object_to_data`"""
+
+    rules: int = 0  # resolved by the local rules
+    llm: int = 0  # resolved by the language model
+    escalated: int = 0  # the rules could not resolve, sent to the LLM
+    unresolved: int = 0  # still failing when the retries ran out
+    rules_by_type: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def resolve(self, tiers: dict[tuple, str]):
+        """Counts resolved errors, `tiers` maps error keys to the tier that
+        corrected them, see `error_key`"""
+        with self._lock:
+            for (_, error_type), tier in tiers.items():
+                if tier == "rules":
+                    self.rules += 1
+                    self.rules_by_type[error_type] = (
+                        self.rules_by_type.get(error_type, 0) + 1
+                    )
+                else:
+                    self.llm += 1
+
+    def update(self, escalated: int = 0, unresolved: int = 0):
+        with self._lock:
+            self.escalated += escalated
+            self.unresolved += unresolved
+
+    def dict(self):
+        with self._lock:
+            return {
+                "rules": self.rules,
+                "llm": self.llm,
+                "escalated": self.escalated,
+                "unresolved": self.unresolved,
+                "rules_by_type": dict(self.rules_by_type),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.rules = self.llm = self.escalated = self.unresolved = 0
+            self.rules_by_type.clear()
+
+
+default_coercion_stats = CoercionStats()
+
+
+def error_key(error: dict) -> tuple:
+    """Identifies an error across validations of a data object"""
+    return tuple(error["loc"]), error["type"]
+
+
+def _number_text(value: Any) -> str:
+    """The text of a number without whitespace, currency or thousands separators"""
+    if not isinstance(value, str):
+        raise ValueError(f"Not a string: {value!r}")
+    text = value.strip().lstrip(CURRENCY_SYMBOLS).strip()
+    if "," in text:
+        if not THOUSANDS_PATTERN.match(text):
+            raise ValueError(f"Ambiguous separators in {value!r}")
+        text = text.replace(",", "")
+    return text
+
+
+def to_float(value: Any, subschema: dict, error: dict) -> float:
+    return float(_number_text(value))
+
+
+def to_int(value: Any, subschema: dict, error: dict) -> int:
+    number = float(_number_text(value))
+    if not is_integral(number):
+        raise ValueError(f"{value!r} is not an integer")
+    return int(round(number))
+
+
+def to_bool(value: Any, subschema: dict, error: dict) -> bool:
+    text = str(value).strip().lower()
+    if text in TRUE_STRINGS:
+        return True
+    if text in FALSE_STRINGS:
+        return False
+    raise ValueError(f"{value!r} is not a boolean")
+
+
+def _parse(value: Any, formats: list[str]) -> datetime.datetime:
+    if not isinstance(value, str):
+        raise ValueError(f"Not a string: {value!r}")
+    text = " ".join(value.split())
+    for fmt in formats:
+        try:
+            parsed = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if (
+            fmt.split(" ")[0] in DAY_MONTH_FORMATS
+            and parsed.day <= 12
+            and parsed.day != parsed.month
+        ):
+            raise ValueError(f"Ambiguous day and month in {value!r}")
+        return parsed
+    raise ValueError(f"Unknown date format {value!r}")
+
+
+def to_date(value: Any, subschema: dict, error: dict) -> str:
+    return _parse(value, DATE_FORMATS).date().isoformat()
+
+
+def to_datetime(value: Any, subschema: dict, error: dict) -> str:
+    formats = [f"{d} {t}" for d in DATE_FORMATS for t in TIME_FORMATS]
+    return _parse(value, formats + DATE_FORMATS).isoformat()
+
+
+def to_string(value: Any, subschema: dict, error: dict) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"No canonical string for {value!r}")
+    return str(value)
+
+
+def strip(value: Any, subschema: dict, error: dict) -> str:
+    if not isinstance(value, str) or value.strip() == value:
+        raise ValueError("Nothing to strip")
+    return value.strip()
+
+
+def _normalize_name(value: Any) -> str:
+    """Compares names ignoring case, whitespace, hyphens and underscores"""
+    return re.sub(r"[\s_\-]+", "", str(value)).casefold()
+
+
+def _allowed_values(subschema: dict, error: dict) -> list:
+    if "enum" in subschema:
+        return subschema["enum"]
+    if "const" in subschema:
+        return [subschema["const"]]
+    # Unresolved $refs, parse pydantic's "'a', 'b' or 'c'"
+    expected = (error.get("ctx") or {}).get("expected", "")
+    return re.findall(r"'((?:[^'\\]|\\.)*)'", expected)
+
+
+def to_enum(value: Any, subschema: dict, error: dict) -> Any:
+    target = _normalize_name(value)
+    matches = [
+        v for v in _allowed_values(subschema, error) if _normalize_name(v) == target
+    ]
+    if len(matches) != 1:
+        raise ValueError(f"No unique member matching {value!r}")
+    return matches[0]
+
+
+Rule = Callable[[Any, dict, dict], Any]
+
+# Keyed on pydantic's error types, a rule returns the corrected value or
+# raises ValueError to escalate the error
+RULES: dict[str, Rule] = {
+    "int_parsing": to_int,
+    "int_type": to_int,
+    "float_parsing": to_float,
+    "float_type": to_float,
+    "bool_parsing": to_bool,
+    "bool_type": to_bool,
+    "date_parsing": to_date,
+    "date_from_datetime_parsing": to_date,
+    "date_type": to_date,
+    "datetime_parsing": to_datetime,
+    "datetime_from_date_parsing": to_datetime,
+    "datetime_type": to_datetime,
+    "enum": to_enum,
+    "literal_error": to_enum,
+    "string_type": to_string,
+    "string_pattern_mismatch": strip,
+    "string_too_long": strip,
+}
+
+
+def subschema_at(schema: dict, loc: tuple) -> dict:
+    """The subschema of a location, {} when it can't be followed"""
+    for key in loc:
+        if not isinstance(schema, dict):
+            return {}
+        options = schema.get("anyOf", [])
+        # Optional fields, e.g. anyOf [{type: string}, {type: null}]
+        non_null = [s for s in options if s.get("type") != "null"]
+        if len(non_null) == 1:
+            schema = non_null[0]
+        if isinstance(key, int):
+            schema = schema.get("items", {})
+        else:
+            schema = schema.get("properties", {}).get(key, {})
+    return schema if isinstance(schema, dict) else {}
+
+
+def _rename_key(data_object: Any, schema: dict, loc: tuple) -> str:
+    """Renames the key of the parent object that matches the missing field
+    `loc[-1]` up to case, whitespace, hyphens and underscores"""
+    parent = data_object
+    for key in loc[:-1]:
+        parent = parent[key]
+    if not isinstance(parent, dict):
+        raise ValueError("Parent is not an object")
+    field_name = loc[-1]
+    known = subschema_at(schema, loc[:-1]).get("properties", {})
+    candidates = [
+        key
+        for key in parent
+        if key not in known and _normalize_name(key) == _normalize_name(field_name)
+    ]
+    if len(candidates) != 1:
+        raise ValueError(f"No unique key to rename to {field_name!r}")
+    parent[field_name] = parent.pop(candidates[0])
+    return candidates[0]
+
+
+def coerce_errors(
+    data_object: Any, schema: dict, errors: list[dict]
+) -> tuple[Any, list[dict], list[dict], list[tuple]]:
+    """Applies the rules to a copy of `data_object`.
+
+    Returns the corrected object, the resolved and the unresolved errors, and
+    the corrections as (loc, error type, rule, old value, new value) tuples.
+    """
+    data_object = copy.deepcopy(data_object)
+    resolved, unresolved, corrections = [], [], []
+    renamed = set()
+    for error in errors:
+        loc = tuple(error["loc"])
+        try:
+            if error["type"] == "missing" and loc:
+                old_key = _rename_key(data_object, schema, loc)
+                renamed.add(loc[:-1] + (old_key,))
+                corrections.append((loc, "missing", "rename", old_key, loc[-1]))
+            elif (rule := RULES.get(error["type"])) and loc:
+                parent = data_object
+                for key in loc[:-1]:
+                    parent = parent[key]
+                old_value = parent[loc[-1]]
+                new_value = rule(old_value, subschema_at(schema, loc), error)
+                parent[loc[-1]] = new_value
+                corrections.append(
+                    (loc, error["type"], rule.__name__, old_value, new_value)
+                )
+            else:
+                unresolved.append(error)
+                continue
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logger.debug(f"No rule resolves {error['type']} at {loc}: {e}")
+            unresolved.append(error)
+            continue
+        resolved.append(error)
+
+    # Keys renamed to missing fields are no longer extra
+    for error in list(unresolved):
+        if error["type"] == "extra_forbidden" and tuple(error["loc"]) in renamed:
+            unresolved.remove(error)
+            resolved.append(error)
+    return data_object, resolved, unresolved, corrections
@@ -1,12 +1,14 @@
 import asyncio
+import copy
+import functools
 import json
+import operator
 import tempfile
 from logging import getLogger
 from pathlib import Path
 from string import Template
 from typing import Any
 
-import datamodel_code_generator as dcg
 from pydantic import BaseModel, EmailStr, Field, RootModel
 
 from promptedgraphs import __version__ as version
@@ -16,6 +18,15 @@ from promptedgraphs.generation.schema_from_model import (
     schema_from_model,
 )
 from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.tokens import count_tokens
+from promptedgraphs.llms.usage_tracker import track_usage
+from promptedgraphs.normalization.coercion import (
+    CoercionStats,
+    coerce_errors,
+    default_coercion_stats,
+    error_key,
+)
+from promptedgraphs.tracing import traced
 
 logger = getLogger(__name__)
 
@@ -44,8 +55,9 @@ $obj
 )
 
 
+@track_usage("normalization")
 async def correct_value_error(
-    obj: dict, schema: dict, error_type: str, error_msg: str
+    obj: dict, schema: dict, error_type: str, error_msg: str, chat: Chat | None = None
 ) -> Any:
     """Corrects a value error in a data object."""
     obj_str = json.dumps(obj, indent=4)
@@ -55,7 +67,7 @@ async def correct_value_error(
         error_type=error_type,
         error_msg=error_msg,
     ).strip()
-    chat = Chat()
+    chat = chat or Chat()
 
     # TODO replace with a tiktoken model and pad the message by 2x
     max_tokens = len(obj_str)
@@ -74,6 +86,109 @@ async def correct_value_error(
     return json.loads(response.choices[0].message.content)
 
 
+BATCH_SYSTEM_MESSAGE = """
+We are a data entry system tasked with properly formatting data based on a provided schema.  You will be given data that does not conform to the required schema and a list of its validation errors, and you are tasked with lightly editing the object to conform with the provided schema.
+
+Return one patch per error location as a JSON object in the form
+{
+    "patches": [
+        {"loc": ["the", "location", "of", "the", "error"], "value": "the corrected value at that location"}
+    ]
+}
+An empty location refers to the whole object.  Only patch the listed locations, without explanations.
+"""
+
+BATCH_MESSAGE_TEMPLATE = Template(
+    """
+# Validation Errors
+```
+$errors
+```
+
+## Required schema
+```
+$schema
+```
+
+## Object
+```
+$obj
+```
+"""
+)
+
+
+class PatchError(ValueError):
+    """A correction patch does not apply to the data object"""
+
+
+@track_usage("normalization")
+async def correct_errors(
+    obj: dict, schema: dict, errors: list[dict], chat: Chat | None = None
+) -> list[dict]:
+    """Corrects all errors of a data object with one LLM call.
+
+    `errors` are dicts with the `loc` to patch, the error `type` and `msg`.
+    Returns the patches, dicts with a requested `loc` and its corrected `value`.
+    """
+    obj_str = json.dumps(obj, indent=4)
+    msg = BATCH_MESSAGE_TEMPLATE.substitute(
+        obj=obj_str,
+        schema=json.dumps(schema, indent=4),
+        errors=json.dumps(errors, indent=4),
+    ).strip()
+    chat = chat or Chat()
+
+    # The patches repeat at most the object, pad for the patch structure
+    max_tokens = 2 * count_tokens(obj_str, approximate=True) + 32 * len(errors)
+
+    response = await chat.chat_completion(
+        messages=[
+            {"role": "system", "content": BATCH_SYSTEM_MESSAGE.strip()},
+            {"role": "system", "content": msg},
+        ],
+        **{
+            "max_tokens": min(4_096, max_tokens),
+            "temperature": 0.0,
+            "response_format": {"type": "json_object"},
+        },
+    )
+    content = json.loads(response.choices[0].message.content)
+    patches = content.get("patches") if isinstance(content, dict) else None
+    if not isinstance(patches, list):
+        raise PatchError(f"Expected a list of patches, got {content}")
+
+    requested = {tuple(e["loc"]) for e in errors}
+    valid = []
+    for patch in patches:
+        if not isinstance(patch, dict) or "value" not in patch:
+            raise PatchError(f"Invalid patch {patch}")
+        if tuple(patch.get("loc") or ()) not in requested:
+            logger.warning(f"Ignoring patch of unrequested location {patch}")
+            continue
+        valid.append({"loc": tuple(patch.get("loc") or ()), "value": patch["value"]})
+    return valid
+
+
+def apply_patches(data_object: Any, patches: list[dict]) -> Any:
+    """Returns a copy of `data_object` with every patch applied, outer
+    locations first, or raises `PatchError` leaving `data_object` unchanged"""
+    data_object = copy.deepcopy(data_object)
+    for patch in sorted(patches, key=lambda p: len(p["loc"])):
+        loc, value = patch["loc"], copy.deepcopy(patch["value"])
+        if not loc:
+            data_object = value
+            continue
+        try:
+            target = data_object
+            for key in loc[:-1]:
+                target = target[key]
+            target[loc[-1]] = value
+        except (KeyError, IndexError, TypeError) as e:
+            raise PatchError(f"Cannot apply the patch of {loc}: {e!r}") from e
+    return data_object
+
+
 def get_sub_object(data_object: dict, loc: list[str]) -> dict:
     """Gets a sub-object from a data object."""
     if not loc:
@@ -123,6 +238,7 @@ def data_model_to_schema(data_model: list[BaseModel] | BaseModel) -> dict:
     return data_model.model_json_schema()
 
 
+@traced()
 def schema_to_data_model(schema_spec: dict) -> tuple[BaseModel, str]:
     """Converts a JSON schema to a Pydantic model.
     WARNING: This function uses the output of the datamodel-codegen and schema_spec
@@ -130,6 +246,9 @@ def schema_to_data_model(schema_spec: dict) -> tuple[BaseModel, str]:
 
     Returns the compiled datamodel and the generated code as a string.
     """
+    # datamodel-codegen is slow to import and only needed for schema specs
+    import datamodel_code_generator as dcg
+
     input_text = json.dumps(schema_spec, indent=4)
 
     output_file = Path(tempfile.mkstemp(prefix="promptedgraphs_")[1])
@@ -152,20 +271,19 @@ def schema_to_data_model(schema_spec: dict) -> tuple[BaseModel, str]:
     return exec_variable_scope, model_code, class_name
 
 
+@traced()
 async def update_data_object(
-    data_object: dict, schema_spec: dict, errors: list[str] = None
+    data_object: dict,
+    schema_spec: dict,
+    errors: list[str] = None,
+    chat: Chat | None = None,
 ):
     """Updates the data object with error information."""
     logger.debug(f"Updating data object with error: {errors}")
+    chat = chat or Chat()
     corrections = []
     for error in errors:
-        if error["type"] == "missing":
-            loc: tuple = error["loc"][:-1] if len(error["loc"]) else ()
-            error_msg = f"{error['msg']}: '{error['loc']}' is missing.  If possible rename a key to match the schema or add the missing key to the object."
-        else:
-            loc = error["loc"]
-            error_msg = error["msg"]
-
+        loc, error_msg = _error_location(error)
         old_value = get_sub_object(data_object, loc=loc)
         subschema = get_subschema(schema_spec, loc=loc)
         new_value = await correct_value_error(
@@ -173,6 +291,7 @@ async def update_data_object(
             subschema,
             error_type=error["type"],
             error_msg=error_msg,
+            chat=chat,
         )
         if len(loc):
             set_data_object_value(
@@ -183,18 +302,80 @@ async def update_data_object(
             )
         else:
             data_object = new_value
+        corrections.append((loc, error["type"], error_msg, old_value, new_value))
+    return data_object, corrections
+
+
+def _error_location(error: dict) -> tuple[tuple, str]:
+    """The location to correct for a pydantic error and a message describing it.
+    Missing keys are corrected in their parent object."""
+    if error["type"] == "missing":
+        loc: tuple = error["loc"][:-1] if len(error["loc"]) else ()
+        error_msg = f"{error['msg']}: '{error['loc']}' is missing.  If possible rename a key to match the schema or add the missing key to the object."
+    else:
+        loc = error["loc"]
+        error_msg = error["msg"]
+    return tuple(loc), error_msg
+
+
+@traced()
+async def update_data_object_batched(
+    data_object: dict,
+    schema_spec: dict,
+    errors: list[dict],
+    chat: Chat | None = None,
+):
+    """Corrects all errors of the data object with one LLM call, applying the
+    returned patches atomically.  Falls back to `update_data_object` (one call
+    per error) when the patches can't be used."""
+    requests = {}
+    for error in errors:
+        loc, error_msg = _error_location(error)
+        request = requests.setdefault(loc, {"loc": list(loc), "errors": []})
+        request["errors"].append({"type": error["type"], "msg": error_msg})
+    try:
+        patches = await correct_errors(
+            data_object, schema_spec, list(requests.values()), chat=chat
+        )
+        patched = apply_patches(data_object, patches)
+    except (PatchError, json.JSONDecodeError) as e:
+        logger.warning(f"Falling back to one correction per error: {e}")
+        return await update_data_object(
+            data_object, schema_spec, errors=errors, chat=chat
+        )
+
+    corrections = []
+    for patch in patches:
+        loc = patch["loc"]
+        request = requests[loc]
+        try:
+            old_value = functools.reduce(operator.getitem, loc, data_object)
+        except (KeyError, IndexError, TypeError):  # created by an outer patch
+            old_value = None
         corrections.append(
-            (loc, error["type"], error_msg, old_value, new_value)
+            (
+                loc,
+                ", ".join(e["type"] for e in request["errors"]),
+                "; ".join(e["msg"] for e in request["errors"]),
+                old_value,
+                patch["value"],
+            )
         )
-    return data_object, corrections
+    return patched, corrections
 
 
+@traced()
 async def object_to_data(
     data_object: dict | list,
     schema_spec: dict | None = None,
     data_model: BaseModel | None = None,
     coerce: bool = True,
     retry_count: int = 10,
+    chat: Chat | None = None,
+    batch: bool = True,
+    max_workers: int = 10,
+    rules: bool = True,
+    stats: CoercionStats | None = None,
 ) -> BaseModel | list[BaseModel]:
     """Converts data to fit a given schema, applying light reformatting like type casting and field renaming.
 
@@ -203,24 +384,50 @@ async def object_to_data(
         schema_spec (Optional[Dict], optional): The schema specification for reformatting. Defaults to None.
         data_model (Optional[BaseModel], optional): The Pydantic model for reformatting. Defaults to None.
         coerce (bool, optional): Whether to coerce data types. Defaults to True.
+        chat (Optional[Chat], optional): The chat used for corrections. Defaults to a shared Chat().
+        batch (bool, optional): Correct all errors of an object with one LLM call per attempt rather than one call per error. Defaults to True.
+        max_workers (int, optional): Objects of a list corrected concurrently. Defaults to 10.
+        rules (bool, optional): Fix errors with the deterministic rules of `coercion` first and only send the remaining errors to the LLM. Defaults to True.
+        stats (Optional[CoercionStats], optional): Counts the errors resolved by the rules and by the LLM. Defaults to `coercion.default_coercion_stats`.
 
     Returns:
         Union[dict, list]: The reformatted data.
     """
-    if isinstance(data_object, list):
-        return [
-            await object_to_data(obj, schema_spec, data_model, coerce)
-            for obj in data_object
-        ]
     if schema_spec and not data_model:
         data_models, model_code, class_name = schema_to_data_model(schema_spec)
         # TODO load all of the data_models into local scope
         data_model = data_models[class_name]
+    if isinstance(data_object, list):
+        # Objects are independent, correct them concurrently
+        semaphore = asyncio.Semaphore(max_workers)
+        chat = chat or Chat()
+
+        async def convert(obj):
+            async with semaphore:
+                return await object_to_data(
+                    obj,
+                    schema_spec,
+                    data_model,
+                    coerce,
+                    retry_count=retry_count,
+                    chat=chat,
+                    batch=batch,
+                    rules=rules,
+                    stats=stats,
+                )
+
+        return list(await asyncio.gather(*(convert(obj) for obj in data_object)))
     if not coerce:
         return data_model(**data_object)
 
+    stats = stats if stats is not None else default_coercion_stats
     corrections = []
-    while retry_count > 0:
+    # Errors corrected in the last round and the tier that corrected them,
+    # counted as resolved when the next validation no longer reports them
+    pending: dict[tuple, str] = {}
+    tried_rules: set[tuple] = set()
+    escalated: set[tuple] = set()
+    while True:
         try:
             if len(corrections):
                 logger.info(f"Coercing data with {len(corrections)}corrections")
@@ -228,27 +435,52 @@ async def object_to_data(
                     logger.info(
                         f"Correcting {c[0]} with {c[1]}: {c[2]} - {c[3]} -> {c[4]}"
                     )
-            return data_model(**data_object)
+            result = data_model(**data_object)
+            stats.resolve(pending)
+            return result
         except Exception as e:
             errors = e.errors
             if not isinstance(errors, list):
                 errors = errors()
+            current = {error_key(error) for error in errors}
+            stats.resolve({k: t for k, t in pending.items() if k not in current})
+            pending = {}
+            if retry_count <= 0:
+                stats.update(unresolved=len(current))
+                raise ValueError("Failed to coerce data to schema.") from e
 
             # Ensure schema_spec is defined. This is needed for the update_data_object function.
             schema_spec = schema_spec or schema_from_model(
                 data_model, resolve_refs=True
             )
 
-            # Update the data object with error information
-            data_object, new_corrections = await update_data_object(
-                data_object, schema_spec, errors=errors
-            )
-            if new_corrections:
-                corrections.extend(new_corrections)
+            remaining = errors
+            if rules:
+                # Errors a rule already failed to fix go straight to the LLM
+                candidates = [e for e in errors if error_key(e) not in tried_rules]
+                data_object, resolved, _, rule_corrections = coerce_errors(
+                    data_object, schema_spec, candidates
+                )
+                tried_rules.update(error_key(e) for e in candidates)
+                pending.update({error_key(e): "rules" for e in resolved})
+                corrections.extend(rule_corrections)
+                remaining = [e for e in errors if error_key(e) not in pending]
+                # Errors the LLM failed to fix are sent again, but counted once
+                new_keys = {error_key(e) for e in remaining} - escalated
+                escalated.update(new_keys)
+                stats.update(escalated=len(new_keys))
+
+            if remaining:
+                # Update the data object with error information
+                update = update_data_object_batched if batch else update_data_object
+                data_object, new_corrections = await update(
+                    data_object, schema_spec, errors=remaining, chat=chat
+                )
+                pending.update({error_key(e): "llm" for e in remaining})
+                if new_corrections:
+                    corrections.extend(new_corrections)
         retry_count -= 1
 
-    raise ValueError("Failed to coerce data to schema.")
-
 
 async def example():
     data = {
@@ -1,9 +1,8 @@
 from pprint import pformat
 
-import matplotlib.pyplot as plt
 import networkx as nx
-import numpy as np
-from matplotlib.patches import FancyBboxPatch
+
+from promptedgraphs.tracing import traced
 
 
 def graph_to_mermaid(g: nx.DiGraph | nx.MultiDiGraph, kind="graph"):
@@ -29,6 +28,11 @@ def graph_to_mermaid(g: nx.DiGraph | nx.MultiDiGraph, kind="graph"):
 
 
 def visualize_data_graph(g):
+    # matplotlib is slow to import and only needed for plotting
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from matplotlib.patches import FancyBboxPatch
+
     # Prepare a color map only for nodes where 'kind' == 'object'
     color_map = []
     unique_types = {g.nodes[n]["kind"] for n in g.nodes if g.nodes[n].get("kind")}
@@ -119,6 +123,7 @@ def _tree_as_markdown(g, node, level=0):
     return "\n".join(md)
 
 
+@traced()
 def data_graph_as_markdown(g):
     root_candidates = [node for node, indegree in g.in_degree() if indegree == 0]
     md = ["## Data Graph"]
@@ -1,27 +1,165 @@
 import json
+from typing import Any
 
+WHITESPACE = " \t\n\r"
 
-def extract_partial_list(s, key="entities"):
-    if not isinstance(s, str) or s == "":
-        return []
 
-    # remove everything before the first occurrence of the key
-    field = f'"{key}":'
-    s = field.join(s.split(field)[1:]).strip()
-    if len(s) == 0:
-        return []
+class StreamingListParser:
+    """Incremental JSON parser that emits the elements of the list stored under
+    `key` as soon as each element is complete.
 
-    if not s.startswith("["):
-        return []
+    Feed it the deltas of a streamed JSON payload such as
+    `{"entities": [{"text_span": "..."}, ...]}`.  Every character is scanned once,
+    so parsing a response is linear in its length, and string escapes and nested
+    objects or arrays are handled correctly.
+    """
 
-    if s.endswith("},"):
-        s = s[:-1]
+    def __init__(self, key: str = "entities"):
+        self.key = key
+        self.items: list[Any] = []
+        self.done = False  # the target list has been closed
 
-    if not s.rstrip().endswith("}"):
-        return []
+        # Deltas from the oldest open element or string on, `_start` is the
+        # payload position of their first character and `_end` of their last
+        self._parts: list[str] = []
+        self._start = 0
+        self._end = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: int | None = None
+        self._last_string: str | None = None  # candidate key of the top object
+        self._expect_list = False  # saw `"key":`, waiting for `[`
+        self._list_depth: int | None = None  # depth of the elements of the list
+        self._element_start: int | None = None
+
+    def feed(self, delta: str) -> list[Any]:
+        """Consumes the next chunk of the payload and returns any new elements"""
+        if self.done or not delta:
+            return []
+        base = self._end
+        self._parts.append(delta)
+        self._end += len(delta)
+        new_items = []
+        for i, c in enumerate(delta, base):
+            if self._in_string:
+                self._string_char(i, c, new_items)
+            elif not self._list_char(i, c, new_items):
+                self._structure_char(i, c, new_items)
+            if self.done:
+                break
+
+        self._compact(base, delta)
+        return new_items
+
+    def _string_char(self, i: int, c: str, new_items: list):
+        """Inside a string only escapes and the closing quote matter"""
+        if self._escape:
+            self._escape = False
+        elif c == "\\":
+            self._escape = True
+        elif c == '"':
+            self._in_string = False
+            if self._string_start is not None:
+                self._close_string(i, new_items)
+
+    def _list_char(self, i: int, c: str, new_items: list) -> bool:
+        """Tracks the elements of the target list, returns whether `c` was a
+        separator or the end of the list"""
+        if self._list_depth is None or self._depth != self._list_depth:
+            return False
+        if self._element_start is None:
+            if c == "]":
+                self.done = True
+                return True
+            if c not in WHITESPACE and c != ",":
+                self._element_start = i
+            return False
+        if c in ",]":
+            self._flush_scalar(i, new_items)
+            self.done = c == "]"
+            return True
+        return False
 
-    s += "]"
-    try:
-        return json.loads(s)
-    except json.decoder.JSONDecodeError:
+    def _structure_char(self, i: int, c: str, new_items: list):
+        """Tracks strings, nesting depth and the `"key":` before the list"""
+        if c == '"':
+            self._in_string = True
+            self._string_start = i
+        elif c in "{[":
+            if self._expect_list and c == "[":
+                self._list_depth = self._depth + 1
+            self._expect_list = False
+            self._last_string = None
+            self._depth += 1
+        elif c in "}]":
+            self._depth -= 1
+            if self._depth == self._list_depth and self._element_start is not None:
+                self._emit(self._text(self._element_start, i + 1), new_items)
+        elif c == ":":
+            self._expect_list = (
+                self._list_depth is None
+                and self._depth == 1
+                and self._last_string == self.key
+            )
+            self._last_string = None
+        elif c not in WHITESPACE:
+            self._expect_list = False
+            self._last_string = None
+
+    def _text(self, start: int, end: int) -> str:
+        """The payload between positions `start` and `end` of the kept deltas"""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0][start - self._start : end - self._start]
+
+    def _close_string(self, i: int, new_items: list):
+        start, self._string_start = self._string_start, None
+        in_list = self._list_depth is not None and self._depth == self._list_depth
+        if in_list and self._element_start == start:
+            self._emit(self._text(start, i + 1), new_items)
+        elif self._list_depth is None and self._depth == 1:
+            try:
+                self._last_string = json.loads(self._text(start, i + 1))
+            except json.JSONDecodeError:
+                self._last_string = None
+
+    def _flush_scalar(self, i: int, new_items: list):
+        """Emits a pending number/true/false/null element ending before index i"""
+        if self._element_start is not None:
+            self._emit(self._text(self._element_start, i), new_items)
+
+    def _emit(self, raw: str, new_items: list):
+        self._element_start = None
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        self.items.append(item)
+        new_items.append(item)
+
+    def _compact(self, base: int, delta: str):
+        """Drops the deltas before the oldest open element or string.  A
+        pending element keeps its deltas unjoined until it is complete, so
+        large elements are copied once rather than on every feed."""
+        open_starts = [
+            s for s in (self._element_start, self._string_start) if s is not None
+        ]
+        if not open_starts:
+            self._parts, self._start = [], self._end
+        elif min(open_starts) >= base:
+            self._parts = [delta[min(open_starts) - base :]]
+            self._start = min(open_starts)
+
+
+def extract_partial_list(s, key="entities"):
+    """Returns the complete elements of the (possibly truncated) list under `key`.
+    Use `StreamingListParser` when parsing a stream of deltas."""
+    if not isinstance(s, str) or s == "":
         return []
+    parser = StreamingListParser(key=key)
+    parser.feed(s)
+    return parser.items
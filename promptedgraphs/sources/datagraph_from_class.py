@@ -8,19 +8,12 @@ import os
 import re
 from pathlib import Path
 
-import googlemaps
 import tqdm
 from bs4 import BeautifulSoup
-from dotenv import load_dotenv
 
 from promptedgraphs.config import load_config
 from promptedgraphs.llms.helpers import _sync_wrapper, extract_code_blocks
-from promptedgraphs.llms.openai_streaming import streaming_chat_completion_request
 from promptedgraphs.models import ChatMessage
-from promptedgraphs.sources.rtfm import fetch_from_ogtags
-
-load_dotenv()
-load_config()
 
 logger = logging.getLogger(__name__)
 
@@ -105,25 +98,16 @@ async def html_to_markdown(html, url=None):
         url = url.split("#")[0]
 
     SYSTEM_MESSAGE = """Format webpage as markdown"""
-    payload = ""
-    async for event in streaming_chat_completion_request(
-        messages=[
+    data = await _sync_wrapper(
+        [
             ChatMessage(
                 role="system",
                 content=SYSTEM_MESSAGE,
             ),
             ChatMessage(role="user", content=html),
         ],
-        functions=None,
         config=load_config(),
-        stream=False,
-    ):
-        if event.data:
-            payload += event.data
-        elif event.retry:
-            print(f"Retry: {event.retry}")
-
-    data = json.loads(payload)
+    )
     return data["choices"][0]["message"]["content"], url
 
 
@@ -201,6 +185,9 @@ async def register_function_as_datasource(
         "as_of": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
     }
 
+    # The OGTags scraper is an optional module that is not part of the package
+    from promptedgraphs.sources.rtfm import fetch_from_ogtags
+
     fns = get_functions_from_object(obj)
     ittr = tqdm.tqdm(fns, desc=f"Building schemas for {name}")
     for fn in ittr:
@@ -234,6 +221,9 @@ async def register_function_as_datasource(
 
 
 if __name__ == "__main__":
+    import googlemaps
+    from dotenv import load_dotenv
+
     load_dotenv()
     gmaps = googlemaps.Client(key=os.environ["GOOGLEMAPS_API_KEY"])
     asyncio.run(register_function_as_datasource(gmaps))
@@ -4,17 +4,18 @@ the data types and distributions of various data sets."""
 import concurrent.futures
 import os
 import time
+from typing import TYPE_CHECKING
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import scipy.stats
-import seaborn as sns
 import tqdm
-from scipy.stats import kstest
 
 from promptedgraphs.vis import get_colors
 
+# scipy, pandas and the plotting libraries take seconds to import,
+# they are loaded by the functions that use them
+if TYPE_CHECKING:
+    import pandas as pd
+
 # from scipy.stats
 DISCRETE_DISTRIBUTIONS = [
     "bernoulli",  # -- Bernoulli
@@ -172,6 +173,9 @@ def can_cast_to_ints_without_losing_precision_np_updated(
 
 # Function to fit distribution and perform KS test
 def _fit_and_test(data, dist):
+    import scipy.stats
+    from scipy.stats import kstest
+
     try:
         t = time.time()
         dist_params = getattr(scipy.stats, dist).fit(data)
@@ -250,7 +254,11 @@ def fit_distribution(
     return fit_results
 
 
-def plot_fitted(data, results: pd.DataFrame, top_n=5):
+def plot_fitted(data, results: "pd.DataFrame", top_n=5):
+    import matplotlib.pyplot as plt
+    import scipy.stats
+    import seaborn as sns
+
     # Re-import necessary libraries and re-define variables after reset
     # Re-fit parameters for selected distributions
     results = results.sort_values("KS-Test", ascending=True).head(top_n)
@@ -287,8 +295,10 @@ def plot_fitted(data, results: pd.DataFrame, top_n=5):
 
 
 def get_posterior_weights(
-    data: np.ndarray, results: pd.DataFrame, priors: dict[str, float] = None
+    data: np.ndarray, results: "pd.DataFrame", priors: dict[str, float] = None
 ):
+    import scipy.stats
+
     uniform_prior = 1 / len(results)
     default_priors = {dist: uniform_prior for dist in results.index}
     priors = priors or default_priors
@@ -311,10 +321,12 @@ if __name__ == "__main__":
     # Load the data
     import json
 
+    import pandas
+
     with open(
         "/usr/local/repos/thecrowdsline/thecrowdsline-data/nfl_roster.jsonl"
     ) as f:
-        data = pd.DataFrame(json.loads(line) for line in f.readlines())
+        data = pandas.DataFrame(json.loads(line) for line in f.readlines())
 
     # Fit the data to various distributions
     c = "age"
@@ -323,11 +335,11 @@ if __name__ == "__main__":
     x = data[c].dropna().values
     dists = fit_distribution(x, discrete_or_continuous="continuous", max_workers=4)
 
-    df = pd.DataFrame(dists).T
+    df = pandas.DataFrame(dists).T
     top_dists = df.loc[df["KS-Test"] < 0.05]
     if len(top_dists) > 0:
         print(top_dists)
     plot_fitted(x, top_dists, top_n=len(top_dists))
     weights = get_posterior_weights(x, top_dists)
-    print(top_dists.join(pd.Series(weights, name="Posterior Weight")))
+    print(top_dists.join(pandas.Series(weights, name="Posterior Weight")))
     print(dists)
@@ -0,0 +1,267 @@
+"""Lightweight tracing spans for the LLM pipelines
+
+Spans record their duration, attributes and parent span, and are collected in
+memory for export as JSON or in the Chrome trace format (open the file in
+`chrome://tracing` or https://ui.perfetto.dev):
+
+    from promptedgraphs import tracing
+
+    tracing.enable_tracing()
+    await data_graph_to_domain_model(g)
+    tracing.default_collector.export("trace.json", format="chrome")
+
+Tracing is off unless enabled here or with `PROMPTEDGRAPHS_TRACING=true`; while
+disabled `span()` returns a shared no-op span and `@traced` functions only pay
+for one flag check.
+"""
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from contextvars import ContextVar
+
+MAX_SPANS = 100_000
+
+_ids = itertools.count(1)
+_current_span: ContextVar["Span | None"] = ContextVar(
+    "promptedgraphs_current_span", default=None
+)
+
+
+class TraceCollector:
+    """Keeps the most recent `max_spans` finished spans"""
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span"):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def to_list(self) -> list[dict]:
+        with self._lock:
+            spans = list(self.spans)
+        return [s.dict() for s in sorted(spans, key=lambda s: s.start_ns)]
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_list(), default=str)
+
+    def to_chrome_trace(self) -> dict:
+        """Complete ("X") events of the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s["name"],
+                "cat": "promptedgraphs",
+                "ph": "X",
+                "ts": s["start_ns"] / 1_000,
+                "dur": s["duration_ns"] / 1_000,
+                "pid": pid,
+                "tid": s["thread_id"],
+                "args": {
+                    "span_id": s["span_id"],
+                    "parent_id": s["parent_id"],
+                    **s["attributes"],
+                    **({"error": s["error"]} if s["error"] else {}),
+                },
+            }
+            for s in self.to_list()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path, format: str = "json"):
+        """Writes the spans to `path` as a JSON list or a Chrome trace"""
+        if format == "json":
+            data = self.to_list()
+        elif format == "chrome":
+            data = self.to_chrome_trace()
+        else:
+            raise ValueError(f"Unknown trace format {format}, use 'json' or 'chrome'")
+        with open(path, "w") as f:
+            json.dump(data, f, default=str)
+
+
+default_collector = TraceCollector()
+
+
+class _TracingState:
+    def __init__(self):
+        flag = os.getenv("PROMPTEDGRAPHS_TRACING", "false").strip().lower()
+        self.enabled = flag in {"1", "true", "yes", "on"}
+        self.collector = default_collector
+
+
+_state = _TracingState()
+
+
+def enable_tracing(collector: TraceCollector | None = None) -> TraceCollector:
+    """Starts recording spans, into `collector` if given"""
+    if collector is not None:
+        _state.collector = collector
+    _state.enabled = True
+    return _state.collector
+
+
+def disable_tracing():
+    _state.enabled = False
+
+
+def tracing_enabled() -> bool:
+    return _state.enabled
+
+
+class Span:
+    """A timed operation, the current span while used as a context manager"""
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "duration_ns",
+        "thread_id",
+        "error",
+        "_start",
+        "_token",
+    )
+
+    def __init__(self, name: str, attributes: dict | None = None, parent=None):
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.duration_ns = None
+        self.thread_id = threading.get_ident()
+        self.error = None
+        self._start = time.perf_counter_ns()
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self, error: BaseException | None = None):
+        self.duration_ns = time.perf_counter_ns() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _state.collector.add(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:  # exited in another context, e.g. by the GC
+            pass
+        self.finish(exc)
+        return False
+
+    def dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ns": self.duration_ns,
+            "thread_id": self.thread_id,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes) -> Span | _NoopSpan:
+    """Context manager timing the enclosed block as a child of the current span"""
+    if not _state.enabled:
+        return NOOP_SPAN
+    return Span(name, attributes, parent=_current_span.get())
+
+
+def current_span() -> Span | _NoopSpan:
+    """The innermost active span, for adding attributes"""
+    return (_state.enabled and _current_span.get()) or NOOP_SPAN
+
+
+def traced(name: str | None = None, **attributes):
+    """Decorates a function, coroutine function or async generator function
+    so each call is recorded as a span named `name` (default: its qualname).
+
+    Async generator spans run from the first to the last item; they are not
+    made the current span since the caller runs between the items.
+    """
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.isasyncgenfunction(fn):
+
+            async def traced_items(items, s: Span):
+                error = None
+                try:
+                    async with aclosing(items):
+                        async for item in items:
+                            yield item
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    s.finish(None if isinstance(error, GeneratorExit) else error)
+
+            @functools.wraps(fn)
+            def agen_wrapper(*args, **kwargs):
+                if not _state.enabled:
+                    return fn(*args, **kwargs)
+                s = Span(span_name, dict(attributes), parent=_current_span.get())
+                return traced_items(fn(*args, **kwargs), s)
+
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _state.enabled:
+                    return await fn(*args, **kwargs)
+                with Span(span_name, dict(attributes), parent=_current_span.get()):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, dict(attributes), parent=_current_span.get()):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
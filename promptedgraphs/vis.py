@@ -1,7 +1,6 @@
-import seaborn as sns
 from pydantic import BaseModel
-from spacy import displacy
 
+from promptedgraphs.alignment import align_spans
 from promptedgraphs.models import EntityReference
 
 
@@ -24,7 +23,12 @@ def get_fields(ents: list[EntityReference] | dict | BaseModel):
 
 
 def get_colors(fields: list[str], color_palette: list[float] = None):
-    palette = color_palette or sns.color_palette("Set2", len(fields))
+    palette = color_palette
+    if not palette:
+        # seaborn (like spacy) is slow to import, it is only loaded when rendering
+        import seaborn as sns
+
+        palette = sns.color_palette("Set2", len(fields))
     return {f: rgb_to_hex(color)[:7] for f, color in zip(list(fields), palette)}
 
 
@@ -33,23 +37,15 @@ def ensure_entities(
 ) -> list[EntityReference]:
     if ents is None:
         return None
-    elif hasattr(ents, "model_dump"):
-        data = ents.model_dump()
-        return [
-            EntityReference(
-                start=text.find(v), end=text.find(v) + len(v), label=k, text=v
-            )
-            for k, v in data.items()
-            if v in text
-        ]
-    elif isinstance(ents, dict):
-        data = ents
+    elif hasattr(ents, "model_dump") or isinstance(ents, dict):
+        data = ents.model_dump() if hasattr(ents, "model_dump") else ents
+        values = {k: v for k, v in data.items() if isinstance(v, str) and v}
+        matches = align_spans(text, values.values(), normalize=False)
+        # The first occurrence of each field's value
         return [
-            EntityReference(
-                start=text.find(v), end=text.find(v) + len(v), label=k, text=v
-            )
-            for k, v in data.items()
-            if v in text
+            EntityReference(start=start, end=end, label=k, text=v)
+            for k, v in values.items()
+            for start, end in matches[v][:1]
         ]
     return [e for e in ents if isinstance(e, EntityReference)]
 
@@ -63,6 +59,7 @@ def render_entities(
     **options
 ):
     """Renders entities using the displacy.render function"""
+    from spacy import displacy
 
     if ents is None:
         return displacy.render(
@@ -75,6 +72,8 @@ def render_entities(
 
     # Build colors
     if color_dict is None:
+        import seaborn as sns
+
         palette = color_palette or sns.color_palette("Set2", 8)
         color_dict = {f: rgb_to_hex(color) for f, color in zip(list(fields), palette)}
 
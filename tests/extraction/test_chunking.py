@@ -0,0 +1,62 @@
+import unittest
+
+import tiktoken
+
+from promptedgraphs.extraction.chunking import chunk_text
+from promptedgraphs.extraction.entities_from_text import _format_entities
+
+# A byte-level encoding that needs no downloaded vocabulary: one token per byte
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+
+class TestChunkText(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        chunks = chunk_text("short text", max_tokens=100, overlap=10)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual((chunks[0].start, chunks[0].end), (0, 10))
+
+    def test_chunks_overlap_and_cover_text(self):
+        text = "".join(f"sentence {i}. " for i in range(100))
+        chunks = chunk_text(text, max_tokens=100, overlap=20, encoding=BYTES)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(text))
+        for chunk, following in zip(chunks, chunks[1:]):
+            self.assertEqual(text[chunk.start : chunk.end], chunk.text)
+            self.assertLessEqual(len(chunk.text.encode()), 100)
+            self.assertEqual(chunk.end - following.start, 20)
+
+    def test_multibyte_characters(self):
+        text = "é" * 300
+        chunks = chunk_text(text, max_tokens=64, overlap=8, encoding=BYTES)
+        self.assertEqual(chunks[-1].end, len(text))
+        for chunk in chunks:
+            self.assertEqual(text[chunk.start : chunk.end], chunk.text)
+
+    def test_invalid_overlap(self):
+        with self.assertRaises(ValueError):
+            chunk_text("text", max_tokens=10, overlap=10)
+
+
+class TestFormatEntities(unittest.TestCase):
+    def test_offsets_are_remapped(self):
+        class Mention:
+            text_span = "Acme"
+            is_entity = True
+            label = "ORG"
+
+        text = "We met Acme Corp. Acme agreed."
+        chunk_start = text.index("Corp")
+        ents = _format_entities([Mention], text[chunk_start:], offset=chunk_start)
+        self.assertEqual(len(ents), 1)
+        self.assertEqual(text[ents[0].start : ents[0].end], "Acme")
+        self.assertEqual(ents[0].start, text.rindex("Acme"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import unittest
+
+from pydantic import BaseModel, ValidationError
+
+from promptedgraphs.extraction.data_from_text import (
+    _build_packs,
+    _document_tokens,
+    _pack_tokens,
+    data_from_texts,
+    get_extractor,
+)
+from promptedgraphs.extraction.entities_from_text import entity_mention_model
+from promptedgraphs.llms.testing import MockChatTestCase
+from promptedgraphs.llms.usage import Usage
+
+
+class Word(BaseModel):
+    word: str
+
+
+class TestCompiledExtractor(unittest.TestCase):
+    def test_extractor_is_shared(self):
+        extractor = get_extractor(Word)
+        self.assertIs(extractor, get_extractor(Word))
+        self.assertIn('"word"', extractor.system_message)
+        self.assertEqual(extractor.validate([{"word": "a"}, {}]), [Word(word="a")])
+
+    def test_validates_item_by_item(self):
+        items = [{"word": "a"}, {"word": None}, {"word": "b"}]
+        extractor = get_extractor(Word)
+        self.assertEqual(
+            extractor.validate(items, skip_errors=True),
+            [Word(word="a"), Word(word="b")],
+        )
+        with self.assertRaises(ValidationError):
+            extractor.validate(items)
+
+    def test_entity_mention_model_is_shared(self):
+        labels = (("ORG", "An organization"),)
+        model = entity_mention_model(labels, "entities", "", False)
+        self.assertIs(model, entity_mention_model(labels, "entities", "", False))
+        self.assertNotIn("reason", model.model_fields)
+        self.assertIn("ORG: An organization", model.__doc__)
+
+
+class TestBuildPacks(unittest.TestCase):
+    def packs(self, texts, pack_tokens, pack_size=20):
+        async def documents():
+            for document in enumerate(texts):
+                yield document
+
+        async def run():
+            return [
+                [i for i, _ in pack]
+                async for pack in _build_packs(
+                    documents(), "gpt-3.5-turbo", pack_tokens, pack_size
+                )
+            ]
+
+        return asyncio.run(run())
+
+    def test_packs_within_the_budgets(self):
+        self.assertEqual(
+            self.packs(["a"] * 5, 1_000, pack_size=2), [[0, 1], [2, 3], [4]]
+        )
+        cost = _document_tokens(0, "word " * 40, "gpt-3.5-turbo")
+        texts = ["word " * 40, "a", "word " * 40, "word " * 400, "b"]
+        self.assertEqual(self.packs(texts, 2 * cost), [[0, 1], [2], [3], [4]])
+        # Expected outputs of 2 * 700 tokens, two documents fit 4096
+        self.assertEqual(self.packs(["word " * 700] * 3, 100_000), [[0, 1], [2]])
+        self.assertEqual(self.packs([], 1_000), [])
+
+    def test_pack_tokens_fit_the_context_window(self):
+        extractor = get_extractor(Word)
+        system_tokens = extractor.system_tokens("gpt-3.5-turbo", packed=True)
+        self.assertGreater(system_tokens, extractor.system_tokens("gpt-3.5-turbo"))
+        self.assertIn(("gpt-3.5-turbo", True), extractor._system_tokens)
+
+        self.assertEqual(_pack_tokens(Word, "gpt-3.5-turbo", 1_000), 1_000)
+        self.assertLess(
+            _pack_tokens(Word, "gpt-3.5-turbo", 100_000), 16_385 - system_tokens
+        )
+
+
+class TestDataFromTexts(MockChatTestCase):
+    def setUp(self):
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        super().setUp()
+
+    def responder(self, request):
+        """Echoes the words of the text, answering later texts sooner"""
+        text = request["messages"][-1]["content"].split("\n\n")[1]
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05 / (1 + int(text.split()[-1])))
+        with self.lock:
+            self.active -= 1
+        return json.dumps({"items": [{"word": w} for w in text.split()]})
+
+    def collect(self, texts, **kwargs):
+        async def run():
+            return [
+                (i, item.word)
+                async for i, item in data_from_texts(
+                    texts, Word, config=self.config, **kwargs
+                )
+            ]
+
+        return asyncio.run(run())
+
+    def test_preserves_order(self):
+        texts = [f"text {i}" for i in range(8)]
+        results = self.collect(texts, max_workers=4, preserve_order=True)
+        expected = [(i, w) for i in range(8) for w in ("text", str(i))]
+        self.assertEqual(results, expected)
+
+    def test_bounded_concurrency_and_usage(self):
+        async def texts():
+            for i in range(12):
+                yield f"text {i}"
+
+        usage = Usage("gpt-3.5-turbo")
+        results = self.collect(texts(), max_workers=3, usage=usage)
+        self.assertEqual(len(results), 24)
+        self.assertEqual({i for i, _ in results}, set(range(12)))
+        self.assertLessEqual(self.max_active, 3)
+        self.assertEqual(self.server.requests, 12)
+        self.assertEqual(usage.prompt_tokens, self.server.prompt_tokens)
+
+    def test_early_exit_cancels_pending_work(self):
+        async def run():
+            async for i, _ in data_from_texts(
+                (f"text {i}" for i in range(1000)), Word, config=self.config
+            ):
+                break
+            return i
+
+        asyncio.run(run())
+        self.assertLess(self.server.requests, 1000)
+
+
+class TestPackedDataFromTexts(MockChatTestCase):
+    @staticmethod
+    def responder(request):
+        """Answers packed requests by document id, skipping texts marked `skip`
+        and returning an invalid item for texts marked `invalid`"""
+        content = request["messages"][-1]["content"]
+        documents = re.findall(r'<document id="(D\d+)">\n(.*?)\n</document>', content)
+        if not documents:
+            text = content.split("\n\n")[1]
+            return json.dumps({"items": [{"word": w} for w in text.split()]})
+        return json.dumps(
+            {
+                doc_id: [
+                    {"word": None if "invalid" in text else w} for w in text.split()
+                ]
+                for doc_id, text in documents
+                if "skip" not in text
+            }
+        )
+
+    def collect(self, texts, **kwargs):
+        async def run():
+            return [
+                (i, item.word)
+                async for i, item in data_from_texts(
+                    texts, Word, config=self.config, **kwargs
+                )
+            ]
+
+        return asyncio.run(run())
+
+    def test_packs_documents(self):
+        texts = [f"hello {i}" for i in range(10)]
+        results = self.collect(texts, pack_tokens=1_000, pack_size=4)
+        expected = [(i, w) for i in range(10) for w in ("hello", str(i))]
+        self.assertEqual(sorted(results), sorted(expected))
+        self.assertEqual(self.server.requests, 3)
+
+    def test_retries_skipped_documents(self):
+        texts = ["a 0", "skip 1", "b 2"]
+        results = self.collect(texts, pack_tokens=1_000, preserve_order=True)
+        self.assertEqual(
+            results, [(0, "a"), (0, "0"), (1, "skip"), (1, "1"), (2, "b"), (2, "2")]
+        )
+        self.assertEqual(self.server.requests, 2)
+
+    def test_failed_pack_is_retried_per_document(self):
+        texts = ["a 0", "invalid 1", "b 2"]
+        results = self.collect(texts, pack_tokens=1_000, preserve_order=True)
+        self.assertEqual(
+            results,
+            [(0, "a"), (0, "0"), (1, "invalid"), (1, "1"), (2, "b"), (2, "2")],
+        )
+        self.assertEqual(self.server.requests, 1 + 3)
+
+    def test_skips_only_the_invalid_items(self):
+        texts = ["a 0", "invalid 1", "b 2"]
+        results = self.collect(
+            texts, pack_tokens=1_000, preserve_order=True, skip_errors=True
+        )
+        self.assertEqual(results, [(0, "a"), (0, "0"), (2, "b"), (2, "2")])
+        self.assertEqual(self.server.requests, 1)
+
+    def test_token_budget(self):
+        texts = ["word " * 40 for _ in range(4)]
+        self.collect(texts, pack_tokens=120)
+        self.assertEqual(self.server.requests, 2)
+
+        # The expected output of a pack is limited too
+        self.server.requests = 0
+        texts = ["word " * 700 for _ in range(4)]
+        self.collect(texts, pack_tokens=100_000)
+        self.assertEqual(self.server.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
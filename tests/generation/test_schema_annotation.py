@@ -0,0 +1,103 @@
+import asyncio
+import copy
+import json
+import re
+import threading
+import time
+import unittest
+
+from promptedgraphs.generation.schema_from_data import (
+    add_schema_titles_and_descriptions,
+)
+from promptedgraphs.llms.testing import MockChatTestCase
+from promptedgraphs.llms.usage_tracker import default_tracker
+
+
+def leaf_object(name: str) -> dict:
+    return {
+        "type": "object",
+        "properties": {"name": {"type": "string", "example": name}},
+        "example": {"name": name},
+    }
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "customer": {
+            "type": "object",
+            "properties": {"address": leaf_object("Paris")},
+        },
+        "seller": leaf_object("Bob"),
+        "items": {"type": "array", "items": leaf_object("widget")},
+        "total": {"type": "number", "example": 3.5},
+    },
+}
+
+
+class TestSchemaAnnotation(MockChatTestCase):
+    def setUp(self):
+        self.paths = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        super().setUp()
+
+    def responder(self, request):
+        content = request["messages"][-1]["content"]
+        path = re.search(r"following path: `(.*?)`", content).group(1)
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+            self.paths.append((path, content))
+        title = path.replace(".", " ").title()
+        return json.dumps({"title": title, "description": f"The {path}"})
+
+    def annotate(self, schema, **kwargs):
+        return asyncio.run(
+            add_schema_titles_and_descriptions(
+                schema, chat=self.chat, ittr=FakeProgress(), **kwargs
+            )
+        )
+
+    def test_children_before_parents_and_concurrency(self):
+        schema = copy.deepcopy(SCHEMA)
+        self.assertEqual(self.annotate(schema, max_workers=4), 6)
+        order = [path for path, _ in self.paths]
+        self.assertEqual(order[-1], "base object")
+        self.assertLess(order.index("customer.address"), order.index("customer"))
+        self.assertGreater(self.max_active, 1)
+        # The parent's prompt includes its children's annotations
+        _, customer_prompt = self.paths[order.index("customer")]
+        self.assertIn("CustomerAddress", customer_prompt)
+        self.assertEqual(schema["properties"]["seller"]["title"], "Seller")
+        self.assertEqual(schema["properties"]["items"]["items"]["title"], "Items")
+        labels = {(r["stage"], r["call_site"]) for r in default_tracker.snapshot()}
+        self.assertIn(("generation", "add_schema_titles_and_descriptions"), labels)
+
+    def test_cache_only_reannotates_changed_nodes(self):
+        cache = {}
+        self.annotate(copy.deepcopy(SCHEMA), cache=cache)
+        self.assertEqual(self.annotate(copy.deepcopy(SCHEMA), cache=cache), 0)
+
+        changed = copy.deepcopy(SCHEMA)
+        changed["properties"]["seller"]["properties"]["rating"] = {"type": "number"}
+        changed["properties"]["total"]["example"] = 4.0  # examples are ignored
+        self.paths.clear()
+        self.assertEqual(self.annotate(changed, cache=cache), 2)
+        self.assertEqual([p for p, _ in self.paths], ["seller", "base object"])
+        self.assertEqual(changed["properties"]["customer"]["title"], "Customer")
+
+        with self.assertRaises(ValueError):
+            self.annotate(changed, max_workers=0)
+
+
+class FakeProgress:
+    def update(self, n):
+        pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 from typing import Any, Dict, List
 
-from promptedgraphs.generation.schema_from_data import schema_from_data
+from promptedgraphs.generation.schema_from_data import infer_type, schema_from_data
 
 
 class TestSchemaFromData(unittest.TestCase):
@@ -98,6 +98,13 @@ class TestSchemaFromData(unittest.TestCase):
         }
         self.assertEqual(schema_from_data(data_samples), expected_schema)
 
+    def test_integral_floats(self):
+        self.assertEqual(infer_type(3.0)["type"], "integer")
+        self.assertEqual(infer_type(3.0000000001)["type"], "integer")
+        self.assertEqual(infer_type(3.5)["type"], "number")
+        self.assertEqual(infer_type(float("nan"))["type"], "number")
+        self.assertEqual(infer_type(float("inf"))["type"], "number")
+
 
 if __name__ == "__main__":
     # unittest.main()
@@ -0,0 +1,99 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from promptedgraphs.generation.schema_from_data import schema_from_data
+from promptedgraphs.generation.schema_from_table import (
+    NUMERIC_PATTERN,
+    schema_from_table,
+)
+
+
+def records_without_nulls(df: pd.DataFrame) -> list[dict]:
+    return [
+        {k: v for k, v in row.items() if not (v is None or v != v)}
+        for row in df.to_dict("records")
+    ]
+
+
+class TestSchemaFromTable(unittest.TestCase):
+    def test_matches_schema_from_data(self):
+        df = pd.DataFrame(
+            {
+                "id": [1, 2, 3],
+                "price": [1.0, 2.5, None],
+                "count": [1.0, 2.0, float("nan")],
+                "code": ["x", "2", "y"],
+                "active": [True, False, None],
+                "empty": [None, None, None],
+                "mixed": [10, "20", 30.5],
+                "tags": [[1], [2, 3], None],
+                "size": pd.Categorical(["s", "m", "s"]),
+            }
+        )
+        expected = schema_from_data(records_without_nulls(df))
+        self.assertEqual(schema_from_table(df), expected)
+        self.assertEqual(expected["required"], ["code", "id", "mixed", "size"])
+        self.assertNotIn("empty", expected["properties"])
+        self.assertEqual(
+            schema_from_table(pa.Table.from_pandas(df.drop(columns=["mixed"]))),
+            schema_from_data(records_without_nulls(df.drop(columns=["mixed"]))),
+        )
+        self.assertEqual(schema_from_table(df.iloc[:0]), {})
+
+    def test_mixed_object_columns(self):
+        df = pd.DataFrame(
+            {
+                "flag": [1.5, True, False],
+                "count": [1, True, None],
+                "number": [1, 2.5, None],
+            }
+        )
+        schema = schema_from_table(df)
+        self.assertEqual(schema, schema_from_data(records_without_nulls(df)))
+        self.assertEqual(
+            schema["properties"]["flag"]["anyOf"],
+            [{"type": "boolean"}, {"type": "number"}],
+        )
+
+    def test_csv_cells_are_strings(self):
+        rows = [
+            {"name": "Alice", "age": "30", "score": ""},
+            {"name": "Bob", "age": "1_000", "score": "4.5"},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "people.csv"
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            with open(path, newline="") as f:
+                expected = schema_from_data(list(csv.DictReader(f)))
+            self.assertEqual(schema_from_table(path, block_size=32), expected)
+
+    def test_numeric_pattern_matches_float(self):
+        strings = ["1", " 2.5 ", "1e5", ".5", "5.", "-inf", "+NaN", "Infinity"]
+        strings += ["1_000", "1__0", "_1", "1.2.3", "0x10", "", ".", "nanx"]
+
+        def parses(s):
+            try:
+                float(s)
+                return True
+            except ValueError:
+                return False
+
+        matches = pc.match_substring_regex(pa.array(strings), NUMERIC_PATTERN)
+        self.assertEqual(matches.to_pylist(), [parses(s) for s in strings])
+
+    def test_rejects_records(self):
+        with self.assertRaises(ValueError):
+            schema_from_table([{"a": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+from promptedgraphs.generation.schema_inference import (
+    SchemaInferrer,
+    infer_schema,
+    iter_jsonl_range,
+    iter_records,
+    jsonl_byte_ranges,
+    schema_from_data_parallel,
+)
+
+RECORDS = [
+    {"name": "Alice", "age": 30, "address": {"city": "Paris", "zip": "75001"}},
+    {"name": "Bob", "age": None, "address": {"city": "Lyon"}, "tags": ["a", 1]},
+    {"name": "Eve", "age": 41.5, "address": None},
+]
+
+
+class TestSchemaInference(unittest.TestCase):
+    def test_schema(self):
+        schema = infer_schema(RECORDS, seed=0)
+        self.assertEqual(schema["type"], "object")
+        self.assertEqual(schema["required"], ["address", "age", "name"])
+
+        properties = schema["properties"]
+        self.assertEqual(properties["name"]["type"], "string")
+        self.assertEqual(properties["name"]["example"], "Alice")
+        self.assertEqual(
+            properties["age"]["anyOf"], [{"type": "integer"}, {"type": "number"}]
+        )
+        self.assertEqual(properties["age"]["example"], 30)
+
+        address = properties["address"]
+        self.assertEqual(address["required"], ["city"])
+        self.assertEqual(address["example"], {"city": "Paris", "zip": "75001"})
+        self.assertEqual(address["properties"]["zip"]["type"], "number")
+
+        tags = properties["tags"]
+        self.assertEqual(tags["type"], "array")
+        self.assertEqual(len(tags["items"]["anyOf"]), 2)
+
+    def test_merge_matches_single_pass(self):
+        records = RECORDS * 10
+        expected = SchemaInferrer(seed=0).update(records).stats()
+        parts = [SchemaInferrer(seed=i).update(records[i::3]) for i in range(3)]
+        left = pickle.loads(pickle.dumps(parts[0])).merge(parts[1]).merge(parts[2])
+        self.assertEqual(left.stats(), expected)
+        self.assertEqual(left.schema()["required"], ["address", "age", "name"])
+
+    def test_examples_are_bounded(self):
+        records = ({"id": i, "value": str(i) + "x"} for i in range(10_000))
+        inferrer = SchemaInferrer(max_examples=3, seed=1).update(records)
+        schema = inferrer.schema()["properties"]
+        self.assertEqual(schema["id"]["example"], 0)
+        self.assertEqual(len(schema["id"]["examples"]), 3)
+        self.assertEqual(inferrer.stats()["$.value"]["count"], 10_000)
+
+    def test_jsonl_and_parquet_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "records.jsonl"
+            jsonl.write_text("\n".join(json.dumps(r) for r in RECORDS) + "\n\n")
+            self.assertEqual(list(iter_records(jsonl)), RECORDS)
+            self.assertEqual(
+                infer_schema(jsonl, limit=1)["required"], ["address", "age", "name"]
+            )
+
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                self.skipTest("pyarrow is not installed")
+            parquet = Path(tmp) / "records.parquet"
+            rows = [{"name": r["name"], "age": r["age"]} for r in RECORDS]
+            pq.write_table(pa.Table.from_pylist(rows), parquet)
+            schema = infer_schema(parquet, batch_size=2)
+            self.assertEqual(schema["properties"]["name"]["type"], "string")
+            self.assertEqual(schema["required"], ["age", "name"])
+
+            jsonl.write_text("{not json}\n")
+            with self.assertRaises(ValueError):
+                infer_schema(jsonl)
+
+
+def without_examples(schema):
+    """Sampled examples depend on the sharding, everything else must not"""
+    if isinstance(schema, dict):
+        return {k: without_examples(v) for k, v in schema.items() if k != "examples"}
+    if isinstance(schema, list):
+        return [without_examples(v) for v in schema]
+    return schema
+
+
+class TestParallelSchemaInference(unittest.TestCase):
+    def test_byte_ranges_cover_every_line_once(self):
+        records = [{"id": i, "text": "x" * (i % 7)} for i in range(50)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "records.jsonl"
+            path.write_text("".join(json.dumps(r) + "\n" for r in records))
+            for shards in (1, 2, 3, 16, 10_000):
+                found = [
+                    r
+                    for start, end in jsonl_byte_ranges(path, shards)
+                    for r in iter_jsonl_range(path, start, end)
+                ]
+                self.assertEqual(found, records)
+
+    def test_matches_sequential_inference(self):
+        records = RECORDS * 20
+        expected = without_examples(infer_schema(records))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "records.jsonl"
+            path.write_text("".join(json.dumps(r) + "\n" for r in records[:30]))
+            sources = [path, records[30:]]
+            for workers in (1, 2):
+                schema = schema_from_data_parallel(
+                    sources, workers=workers, batch_size=7
+                )
+                self.assertEqual(without_examples(schema), expected)
+        with self.assertRaises(ValueError):
+            schema_from_data_parallel(RECORDS, workers=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from openai.types.chat import ChatCompletion
+
+from promptedgraphs.config import Config
+from promptedgraphs.llms.cache import (
+    MemoryResponseCache,
+    ResponseCache,
+    SQLiteResponseCache,
+    cache_key,
+    is_cacheable,
+)
+from promptedgraphs.llms.chat import Chat, billed_usage
+from promptedgraphs.llms.usage import Usage
+
+
+def make_completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+        }
+    )
+
+
+class FakeOpenAIChat:
+    model = "gpt-3.5-turbo"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat_completion(self, messages=None, **kwargs):
+        self.calls += 1
+        return make_completion(f"response {self.calls}")
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_cache_key(self):
+        messages = [{"role": "user", "content": "hi"}]
+        self.assertEqual(
+            cache_key("gpt-3.5-turbo", messages, temperature=0.0),
+            cache_key("gpt-3.5-turbo", list(messages), temperature=0.0),
+        )
+        self.assertNotEqual(
+            cache_key("gpt-3.5-turbo", messages, temperature=0.0),
+            cache_key("gpt-4", messages, temperature=0.0),
+        )
+        self.assertTrue(is_cacheable(0.0))
+        self.assertFalse(is_cacheable(0.2))
+        self.assertFalse(is_cacheable(None))
+
+    def test_sqlite_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SQLiteResponseCache(Path(tmp) / "cache.db", max_entries=2)
+            cache.set("a", "1")
+            time.sleep(0.01)
+            cache.set("b", "2")
+            time.sleep(0.01)
+            self.assertEqual(cache.get("a"), "1")  # a is now most recently used
+            time.sleep(0.01)
+            cache.set("c", "3")
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.get("a"), "1")
+            self.assertEqual(cache.get("c"), "3")
+            self.assertEqual((cache.hits, cache.misses), (3, 1))
+            cache.close()
+
+    def test_subclasses_implement_the_storage(self):
+        class NoStorage(ResponseCache):
+            def _get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            NoStorage()
+
+    def test_ttl(self):
+        cache = MemoryResponseCache(ttl=0.0)
+        cache.set("a", "1")
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("a"))
+
+    def test_chat_completion_uses_cache(self):
+        chat = Chat(
+            config=Config(openai_api_key="sk-test", rate_limit_enabled=False),
+            cache=MemoryResponseCache(),
+        )
+        chat.chat = FakeOpenAIChat()
+        usage = Usage(model="gpt-3.5-turbo")
+        messages = [{"role": "user", "content": "hi"}]
+
+        async def run():
+            first = await chat.chat_completion(messages, usage=usage, temperature=0.0)
+            second = await chat.chat_completion(messages, usage=usage, temperature=0.0)
+            sampled = await chat.chat_completion(messages, usage=usage, temperature=0.7)
+            return first, second, sampled
+
+        first, second, sampled = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertEqual(sampled.choices[0].message.content, "response 2")
+        self.assertEqual(chat.chat.calls, 2)
+        self.assertEqual((usage.cache_hits, usage.cache_misses), (1, 1))
+        # Only the responses of requests made are billed
+        self.assertEqual(billed_usage(first).total_tokens, 5)
+        self.assertIsNone(billed_usage(second))
+        self.assertEqual(billed_usage(sampled).total_tokens, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
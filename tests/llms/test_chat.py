@@ -0,0 +1,28 @@
+import asyncio
+import unittest
+
+from promptedgraphs.config import Config
+from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.openai_chat import LanguageModel
+
+
+class TestChat(unittest.TestCase):
+    def test_chats_share_openai_client(self):
+        config = Config(openai_api_key="sk-test")
+        chat1 = Chat(config=config)
+        chat2 = Chat(config=config)
+        self.assertIs(chat1.chat, chat2.chat)
+        self.assertIsNot(chat1.chat, Chat(config=config, model=LanguageModel.GPT4).chat)
+        self.assertIsNot(chat1.chat, Chat(config=config, timeout=5).chat)
+
+        async def get_client():
+            return Chat(config=config).chat.client
+
+        async def same_loop():
+            return await get_client() is await get_client()
+
+        self.assertTrue(asyncio.run(same_loop()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+
+from openai.types.chat import ChatCompletion
+
+from promptedgraphs.config import Config
+from promptedgraphs.llms.chat import Chat, billed_usage
+from promptedgraphs.llms.coalesce import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        async def run():
+            return await asyncio.gather(*[flight.do("key", fetch) for _ in range(5)])
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r[0] == {"value": 42} for r in results))
+        self.assertEqual(sum(shared for _, shared in results), 4)
+        self.assertEqual(flight.stats(), {"calls": 1, "coalesced": 4, "in_flight": 0})
+
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(
+                flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.calls, 1)
+
+    def test_only_the_leader_is_billed(self):
+        class SlowChat:
+            model = "gpt-3.5-turbo"
+
+            async def chat_completion(self, messages=None, **kwargs):
+                await asyncio.sleep(0.01)
+                return ChatCompletion.model_validate(
+                    {
+                        "id": "chatcmpl-test",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": self.model,
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": 3,
+                            "completion_tokens": 2,
+                            "total_tokens": 5,
+                        },
+                    }
+                )
+
+        chat = Chat(
+            config=Config(
+                openai_api_key="sk-test", llm_cache_path=None, rate_limit_enabled=False
+            )
+        )
+        chat.chat = SlowChat()
+        messages = [{"role": "user", "content": "hi"}]
+
+        async def run():
+            return await asyncio.gather(
+                *[chat.chat_completion(messages, temperature=0.0) for _ in range(3)]
+            )
+
+        responses = asyncio.run(run())
+        billed = [billed_usage(r) for r in responses]
+        self.assertEqual(sum(u.total_tokens for u in billed if u is not None), 5)
+        self.assertEqual(billed.count(None), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from promptedgraphs.llms.mock_server import build_completion
+from promptedgraphs.llms.testing import MockChatTestCase
+
+
+class TestMockChatServer(MockChatTestCase):
+    server_options = {"latency": 0.01}
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [{"role": "user", "content": "How can I learn more?"}]
+        request = {"model": "gpt-3.5-turbo", "messages": self.messages}
+        self.server.add_recording(
+            request, build_completion(request, '{"items": [{"intent": "question"}]}')
+        )
+
+    def test_chat_replays_recording(self):
+        async def run():
+            return await self.chat.chat_completion(self.messages, temperature=0.0)
+
+        response = asyncio.run(run())
+        content = json.loads(response.choices[0].message.content)
+        self.assertEqual(content, {"items": [{"intent": "question"}]})
+        self.assertEqual(self.server.requests, 1)
+
+    def test_streaming_replays_recording(self):
+        body = {"model": "gpt-3.5-turbo", "messages": self.messages, "stream": True}
+        content = ""
+        with httpx.stream(
+            "POST", f"{self.server.base_url}/chat/completions", json=body
+        ) as response:
+            for line in response.iter_lines():
+                if not line.startswith("data:") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[5:])["choices"][0]["delta"]
+                content += delta.get("content", "")
+        self.assertEqual(json.loads(content), {"items": [{"intent": "question"}]})
+
+    def test_unrecorded_requests_use_responder(self):
+        body = {
+            "model": "gpt-3.5-turbo",
+            "messages": [{"role": "user", "content": "?"}],
+        }
+        response = httpx.post(f"{self.server.base_url}/chat/completions", json=body)
+        message = response.json()["choices"][0]["message"]
+        self.assertEqual(json.loads(message["content"]), {"items": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
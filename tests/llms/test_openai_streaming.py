@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+import httpx
+
+from promptedgraphs.llms.cache import MemoryResponseCache
+from promptedgraphs.llms.openai_streaming import (
+    _cached_response,
+    _parse_line,
+    _resumable_events,
+    _StreamState,
+)
+from promptedgraphs.llms.retry import RetryBudget, RetryPolicy
+from promptedgraphs.llms.usage import Usage
+
+
+def failing_post(attempts: list[list[str]]):
+    """Each call replays the lines of the next attempt, raising a transport
+    error after the lines of every attempt but the last"""
+    calls = iter(range(len(attempts)))
+
+    async def post():
+        attempt = next(calls)
+        yield None
+        for line in attempts[attempt]:
+            yield line
+        if attempt < len(attempts) - 1:
+            raise httpx.ReadError("connection lost")
+
+    return post
+
+
+class TestOpenAIStreaming(unittest.TestCase):
+    def collect(self, post, resume=True):
+        state = _StreamState()
+        retrier = RetryPolicy(base_delay=0.001, max_delay=0.001).retrier(
+            RetryBudget(min_tokens=10)
+        )
+
+        async def run():
+            return [
+                e
+                async for e in _resumable_events(
+                    post, state, retrier, resume=resume, connected="connected"
+                )
+            ]
+
+        return asyncio.run(run()), state
+
+    def test_parse_line(self):
+        self.assertEqual(_parse_line("data: {}").data, "{}")
+        self.assertEqual(_parse_line('{"id": 1}').data, '{"id": 1}')
+        self.assertEqual(_parse_line("event: error").event, "error")
+        self.assertEqual(_parse_line("retry: 10").retry, "10")
+        self.assertIsNone(_parse_line(""))
+
+    def test_resume_skips_the_data_already_yielded(self):
+        post = failing_post(
+            [
+                ["data: a", "", "data: b", ""],
+                ["data: a", "", "data: b", "", "data: c", "", "data: [DONE]"],
+            ]
+        )
+        events, state = self.collect(post)
+        self.assertEqual(events[0], "connected")
+        self.assertEqual([e.data for e in events[1:]], ["a", "b", "c", "[DONE]"])
+        self.assertEqual(
+            (state.recorded, state.retries), (["a", "b", "c", "[DONE]"], 1)
+        )
+
+    def test_failures_before_any_data_are_retried_without_resume(self):
+        post = failing_post([[], ["data: a", "data: [DONE]"]])
+        events, _ = self.collect(post, resume=False)
+        self.assertEqual([e.data for e in events[1:]], ["a", "[DONE]"])
+
+        post = failing_post([["data: a"], ["data: a", "data: [DONE]"]])
+        with self.assertRaises(httpx.ReadError):
+            self.collect(post, resume=False)
+
+    def test_cached_response(self):
+        cache = MemoryResponseCache()
+        usage = Usage(model="gpt-3.5-turbo")
+        body = {"model": "gpt-3.5-turbo", "messages": [], "temperature": 0}
+        key, cached = asyncio.run(_cached_response(cache, body, usage))
+        self.assertIsNone(cached)
+        cache.set(key, '["a", "[DONE]"]')
+        self.assertEqual(
+            asyncio.run(_cached_response(cache, body, usage)), (key, ["a", "[DONE]"])
+        )
+        self.assertEqual((usage.cache_hits, usage.cache_misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
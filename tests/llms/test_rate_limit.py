@@ -0,0 +1,44 @@
+import asyncio
+import time
+import unittest
+
+from promptedgraphs.llms.rate_limit import RateLimiter, TokenBucket
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket_wait(self):
+        bucket = TokenBucket(capacity=60, period=60.0)  # 1 token per second
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(60, now), 0.0)
+        self.assertAlmostEqual(bucket.reserve(2, now), 2.0)
+        bucket.refund(2, now)
+        self.assertAlmostEqual(bucket.reserve(1, now + 1.0), 0.0)
+
+    def test_tokens_per_minute(self):
+        limiter = RateLimiter(requests_per_minute=6_000, tokens_per_minute=600)
+
+        async def run():
+            start = time.monotonic()
+            await limiter.acquire(600)
+            charged = await limiter.acquire(1)  # waits ~0.1s for 1 token at 10/s
+            return charged, time.monotonic() - start
+
+        charged, elapsed = asyncio.run(run())
+        self.assertEqual(charged, 1)
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    def test_reconcile_refunds_unused_tokens(self):
+        limiter = RateLimiter(requests_per_minute=6_000, tokens_per_minute=600)
+
+        async def run():
+            charged = await limiter.acquire(600)
+            limiter.reconcile(charged, 100)
+            start = time.monotonic()
+            await limiter.acquire(400)
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(run()), 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from email.utils import formatdate
+from time import time
+
+import httpx
+
+from promptedgraphs.llms.retry import (
+    RetryableHTTPError,
+    RetryBudget,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+
+class TestRetry(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after(httpx.Headers({"retry-after": "3"})), 3.0)
+        self.assertEqual(
+            parse_retry_after(httpx.Headers({"retry-after-ms": "250"})), 0.25
+        )
+        delay = parse_retry_after(
+            httpx.Headers({"retry-after": formatdate(time() + 30, usegmt=True)})
+        )
+        self.assertTrue(25 <= delay <= 30)
+        self.assertIsNone(parse_retry_after(httpx.Headers({})))
+
+    def test_decorrelated_jitter(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=0.1, max_delay=1.0)
+        retrier = policy.retrier(RetryBudget(min_tokens=10))
+        error = httpx.ConnectError("connection refused")
+        delays = [retrier.next_delay(error) for _ in range(5)]
+        self.assertIsNone(delays[-1])  # max_attempts reached
+        self.assertTrue(all(0.1 <= d <= 1.0 for d in delays[:-1]))
+
+    def test_retry_after_and_non_retryable(self):
+        retrier = RetryPolicy(max_attempts=3, base_delay=0.1).retrier(RetryBudget())
+        self.assertGreaterEqual(
+            retrier.next_delay(RetryableHTTPError(429, "slow down", 5.0)), 5.0
+        )
+        self.assertIsNone(retrier.next_delay(ValueError("bad request")))
+
+    def test_retry_budget(self):
+        budget = RetryBudget(ratio=0.0, min_tokens=1)
+        error = httpx.ReadTimeout("timeout")
+        self.assertIsNotNone(RetryPolicy().retrier(budget).next_delay(error))
+        self.assertIsNone(RetryPolicy().retrier(budget).next_delay(error))
+        self.assertEqual((budget.retries, budget.exhausted), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+from promptedgraphs.llms.mock_server import MockChatServer
+from promptedgraphs.llms.openai_chat import LanguageModel
+from promptedgraphs.llms.openai_streaming import streaming_chat_completion_request
+from promptedgraphs.llms.router import ModelRouter, ModelSpec, RoutingError
+from promptedgraphs.llms.testing import mock_config
+from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import default_tracker
+from promptedgraphs.models import ChatMessage
+
+SMALL = ModelSpec("small", 8_000, 2_000, 0.001, 0.002, 0.2, 100.0)
+LARGE = ModelSpec("large", 100_000, 4_000, 0.01, 0.03, 1.0, 20.0)
+MEDIUM = ModelSpec("medium", 32_000, 4_000, 0.005, 0.01, 0.5, 50.0)
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter([LARGE, SMALL, MEDIUM])
+
+    def test_requested_model_is_kept_when_it_fits(self):
+        decision = self.router.route(1_000, 500, requested_model="large")
+        self.assertEqual((decision.model, decision.reason), ("large", "requested"))
+        self.assertFalse(decision.rerouted)
+
+    def test_cheapest_model_that_fits(self):
+        self.assertEqual(self.router.route(1_000, 500).model, "small")
+        decision = self.router.route(20_000, 1_000, requested_model="small")
+        self.assertEqual(decision.model, "medium")
+        self.assertEqual(decision.reason, "context_window")
+        self.assertTrue(decision.rerouted)
+        self.assertIn("small", decision.rejected)
+        self.assertEqual(self.router.route(1_000, 3_000).model, "medium")
+
+    def test_constraints(self):
+        decision = self.router.route(
+            1_000, 1_000, requested_model="large", max_latency=15
+        )
+        self.assertEqual((decision.model, decision.reason), ("small", "max_latency"))
+        with self.assertRaises(RoutingError):
+            self.router.route(20_000, 1_000, max_cost=0.05)
+        with self.assertRaises(RoutingError):
+            self.router.route(200_000, 1_000)
+
+    def test_unknown_models_are_not_routed(self):
+        decision = self.router.route(200_000, 1_000, requested_model="local-llama")
+        self.assertEqual(decision.model, "local-llama")
+
+    def test_costs_use_model_specs(self):
+        usage = Usage(model=LanguageModel.GPT4)
+        usage.prompt_tokens = usage.completion_tokens = 1_000
+        self.assertAlmostEqual(usage.llm_cost, 0.09)
+        self.assertEqual(Usage(model="local-llama").llm_cost, 0.0)
+
+
+class TestStreamingRouting(unittest.TestCase):
+    def stream(self, content: str) -> list:
+        async def run():
+            with MockChatServer() as server:
+                config = mock_config(server)
+                return [
+                    event
+                    async for event in streaming_chat_completion_request(
+                        [ChatMessage(role="user", content=content)], config=config
+                    )
+                ]
+
+        return asyncio.run(run())
+
+    def test_long_prompts_are_rerouted_not_truncated(self):
+        key = ("gpt-3.5-turbo", "gpt-4-0125-preview", "context_window")
+
+        def count():
+            return {
+                (r["requested_model"], r["model"], r["reason"]): r["count"]
+                for r in default_tracker.route_snapshot()
+            }.get(key, 0)
+
+        before = count()
+        events = self.stream("word " * 20_000)
+        self.assertFalse([e for e in events if e.event == "error"])
+        self.assertEqual(count(), before + 1)
+
+        with self.assertRaises(RoutingError):
+            self.stream("word " * 150_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import tiktoken
+
+from promptedgraphs.llms import tokens
+from promptedgraphs.llms.tokens import clear_token_cache, count_tokens
+from promptedgraphs.llms.usage import estimate_tokens
+
+MODEL = "test-bytes"
+
+# A byte-level encoding that needs no downloaded vocabulary
+BYTES = tiktoken.Encoding(
+    name="test-bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={"<|endoftext|>": 256},
+)
+
+
+class TestTokens(unittest.TestCase):
+    def setUp(self):
+        tokens._encodings[MODEL] = BYTES
+        clear_token_cache()
+
+    def tearDown(self):
+        tokens._encodings.pop(MODEL, None)
+        clear_token_cache()
+
+    def test_count_tokens(self):
+        self.assertEqual(count_tokens("héllo", MODEL), 6)
+        self.assertEqual(count_tokens("", MODEL), 0)
+        self.assertEqual(count_tokens("a" * 10, MODEL, approximate=True), 3)
+
+    def test_memoized_counts(self):
+        self.assertEqual(count_tokens("system prompt", MODEL, memoize=True), 13)
+        self.assertEqual(len(tokens._counts), 1)
+        self.assertEqual(count_tokens("system prompt", MODEL, memoize=True), 13)
+        self.assertEqual(len(tokens._counts), 1)
+        count_tokens("user text", MODEL)
+        self.assertEqual(len(tokens._counts), 1)
+
+    def test_estimate_tokens_matches_joined_encoding(self):
+        request = {
+            "messages": [
+                {"role": "system", "content": "Extract entities"},
+                {"role": "user", "content": "Acme hired Jane"},
+            ],
+            "functions": [{"name": "extract", "parameters": {"type": "object"}}],
+        }
+        messages = "<|endoftext|>".join(
+            v for m in request["messages"] for v in m.values()
+        )
+        functions = '"extract"<|endoftext|>{"type": "object"}'
+        expected = len(BYTES.encode(messages, allowed_special="all")) + len(
+            BYTES.encode(functions, allowed_special="all")
+        )
+        self.assertEqual(estimate_tokens(request, model=MODEL), expected)
+        self.assertGreater(estimate_tokens(request, MODEL, approximate=True), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
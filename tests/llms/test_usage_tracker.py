@@ -0,0 +1,85 @@
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from promptedgraphs.llms.chat import Chat
+from promptedgraphs.llms.mock_server import MockChatServer
+from promptedgraphs.llms.testing import mock_config
+from promptedgraphs.llms.usage import Usage
+from promptedgraphs.llms.usage_tracker import UsageTracker, track_usage
+
+
+class TestUsage(unittest.TestCase):
+    def test_concurrent_updates_are_not_lost(self):
+        usage = Usage(model="gpt-3.5-turbo")
+
+        def work():
+            for _ in range(1_000):
+                usage.update(prompt_tokens=2, completion_tokens=1)
+
+        with ThreadPoolExecutor(8) as pool:
+            for _ in range(8):
+                pool.submit(work)
+        self.assertEqual(usage.prompt_tokens, 16_000)
+        self.assertEqual(usage.completion_tokens, 8_000)
+
+
+class TestUsageTracker(unittest.TestCase):
+    def test_labels_and_exports(self):
+        tracker = UsageTracker()
+
+        @track_usage("extraction", "extract")
+        async def extract():
+            await asyncio.sleep(0)
+            tracker.record("gpt-4", prompt_tokens=10, completion_tokens=5, latency=0.3)
+
+        async def run():
+            await asyncio.gather(*(extract() for _ in range(3)))
+            tracker.record("gpt-4", latency=200, retries=2, error=True)
+
+        asyncio.run(run())
+        rows = {(r["stage"], r["call_site"]): r for r in tracker.snapshot()}
+        extract_row = rows[("extraction", "extract")]
+        self.assertEqual(extract_row["calls"], 3)
+        self.assertEqual(extract_row["prompt_tokens"], 30)
+        self.assertEqual(extract_row["latency_buckets"]["0.5"], 3)
+        unknown_row = rows[("unknown", "unknown")]
+        self.assertEqual((unknown_row["errors"], unknown_row["retries"]), (1, 2))
+        self.assertEqual(unknown_row["latency_buckets"]["+Inf"], 1)
+
+        text = tracker.to_prometheus()
+        self.assertIn(
+            'promptedgraphs_llm_prompt_tokens_total{model="gpt-4",'
+            'stage="extraction",call_site="extract"} 30',
+            text,
+        )
+        self.assertIn(
+            'promptedgraphs_llm_request_duration_seconds_bucket{model="gpt-4",'
+            'stage="extraction",call_site="extract",le="+Inf"} 3',
+            text,
+        )
+        lines = [json.loads(line) for line in tracker.to_jsonl().splitlines()]
+        self.assertEqual(len(lines), 2)
+
+    def test_chat_records_calls(self):
+        tracker = UsageTracker()
+        with MockChatServer() as server:
+            config = mock_config(server)
+
+            @track_usage("generation")
+            async def run():
+                chat = Chat(config=config, tracker=tracker)
+                messages = [{"role": "user", "content": "Hello"}]
+                await chat.chat_completion(messages, temperature=0.7)
+
+            asyncio.run(run())
+            (row,) = tracker.snapshot()
+        self.assertEqual((row["stage"], row["call_site"]), ("generation", "run"))
+        self.assertEqual(row["calls"], 1)
+        self.assertEqual(row["prompt_tokens"], server.prompt_tokens)
+        self.assertEqual(row["completion_tokens"], server.completion_tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import datetime
+import enum
+import unittest
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from promptedgraphs.generation.schema_from_model import schema_from_model
+from promptedgraphs.normalization.coercion import coerce_errors
+
+
+class Status(enum.Enum):
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+
+
+class Address(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    postal_code: str
+    city: str
+
+
+class Record(BaseModel):
+    count: int
+    price: float
+    active: bool
+    due: datetime.date
+    updated: datetime.datetime
+    status: Status
+    size: Literal["S", "M", "L"]
+    code: str
+    address: Address
+
+
+def validation_errors(data: dict) -> list[dict]:
+    try:
+        Record(**data)
+    except ValidationError as e:
+        return e.errors()
+    return []
+
+
+class TestCoercion(unittest.TestCase):
+    def test_rules_fix_trivial_errors(self):
+        data = {
+            "count": "1,000",
+            "price": "$ 2.50",
+            "active": " Yes ",
+            "due": "12/31/2024",
+            "updated": "Jan 2, 2024 10:30",
+            "status": "In Progress",
+            "size": "m",
+            "code": 42,
+            "address": {"Postal-Code": "75001", "city": "Paris"},
+        }
+        errors = validation_errors(data)
+        schema = schema_from_model(Record, resolve_refs=True)
+        fixed, resolved, unresolved, corrections = coerce_errors(data, schema, errors)
+        self.assertEqual(unresolved, [])
+        self.assertEqual(len(resolved), len(errors))
+        self.assertEqual(validation_errors(fixed), [])
+        record = Record(**fixed)
+        self.assertEqual(record.count, 1000)
+        self.assertEqual(record.due, datetime.date(2024, 12, 31))
+        self.assertEqual(record.status, Status.IN_PROGRESS)
+        self.assertEqual(record.address.postal_code, "75001")
+        self.assertEqual(data["count"], "1,000")  # the input is not modified
+        self.assertIn((("count",), "int_parsing", "to_int", "1,000", 1000), corrections)
+
+    def test_ambiguous_values_are_escalated(self):
+        data = {
+            "count": "1,5",
+            "price": "cheap",
+            "active": "maybe",
+            "due": "01/02/2024",
+            "updated": "02.01.2024 10:30",
+            "status": "finished",
+            "size": "XL",
+            "code": None,
+            "address": {"postal": "75001", "post_code": "75001", "city": "Paris"},
+        }
+        errors = validation_errors(data)
+        schema = schema_from_model(Record, resolve_refs=True)
+        _, resolved, unresolved, _ = coerce_errors(data, schema, errors)
+        self.assertEqual(resolved, [])
+        self.assertEqual(len(unresolved), len(errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
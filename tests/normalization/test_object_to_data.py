@@ -0,0 +1,136 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import unittest
+
+from pydantic import BaseModel
+
+from promptedgraphs.llms.testing import MockChatTestCase
+from promptedgraphs.normalization.coercion import CoercionStats
+from promptedgraphs.normalization.object_to_data import (
+    PatchError,
+    apply_patches,
+    object_to_data,
+)
+
+FIXES = {"age": 30, "height": 1.8, "active": True, "name": "Ada"}
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+    height: float
+    active: bool
+
+
+class TestObjectToData(MockChatTestCase):
+    def setUp(self):
+        self.requests = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        self.patch_values = True
+        self.bad_answers = 0  # patch requests answered with an invalid value
+        super().setUp()
+
+    def responder(self, request):
+        prompt = request["messages"][-1]["content"]
+        with self.lock:
+            self.requests.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if match := re.search(r"# Validation Errors\n```\n(.*?)\n```", prompt, re.S):
+            bad, self.bad_answers = self.bad_answers > 0, self.bad_answers - 1
+            patches = [
+                {"loc": e["loc"], "value": "unknown" if bad else FIXES[e["loc"][-1]]}
+                if self.patch_values
+                else {"loc": e["loc"]}
+                for e in json.loads(match.group(1))
+            ]
+            return json.dumps({"patches": patches})
+        obj = json.loads(prompt.split("## Object\n```\n")[1].split("\n```")[0])
+        return json.dumps({key: FIXES[key] for key in obj})
+
+    def convert(self, data, **kwargs):
+        return asyncio.run(
+            object_to_data(data, data_model=Person, chat=self.chat, **kwargs)
+        )
+
+    def test_one_call_corrects_every_error(self):
+        data = {"name": "Ada", "age": "thirty", "height": "tall", "active": "maybe"}
+        self.assertEqual(self.convert(data), Person(**FIXES))
+        self.assertEqual(len(self.requests), 1)
+        self.assertIn('"age"', self.requests[0])
+        self.assertIn('"height"', self.requests[0])
+
+    def test_per_error_mode_and_fallback(self):
+        data = {"name": "Ada", "age": "thirty", "height": "tall", "active": "maybe"}
+        self.assertEqual(self.convert(dict(data), batch=False), Person(**FIXES))
+        self.assertEqual(len(self.requests), 3)
+
+        # Invalid patches fall back to one call per error
+        self.requests.clear()
+        self.patch_values = False
+        self.assertEqual(self.convert(data, retry_count=2), Person(**FIXES))
+        self.assertEqual(len(self.requests), 1 + 3)
+
+    def test_rules_resolve_errors_before_the_llm(self):
+        stats = CoercionStats()
+        data = {"name": "Ada", "age": " 30 ", "height": "1.8", "active": " Yes "}
+        self.assertEqual(self.convert(data, stats=stats), Person(**FIXES))
+        self.assertEqual(self.requests, [])
+        self.assertEqual(stats.dict()["rules_by_type"], {"bool_parsing": 1})
+
+        data = {"name": "Ada", "age": "1,000.5", "height": "tall", "Active": "on"}
+        self.assertEqual(self.convert(data, stats=stats), Person(**FIXES))
+        self.assertEqual(len(self.requests), 1)
+        self.assertNotIn("missing", self.requests[0])  # the key was renamed
+        self.assertEqual(
+            (stats.rules, stats.llm, stats.escalated, stats.unresolved), (2, 2, 2, 0)
+        )
+
+    def test_stats_count_each_error_once(self):
+        stats = CoercionStats()
+        data = {"name": "Ada", "age": "thirty", "height": 1.8, "active": " Yes "}
+        # The first answer is invalid, the error is sent again in a second round
+        self.bad_answers = 1
+        self.assertEqual(self.convert(dict(data), stats=stats), Person(**FIXES))
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(
+            (stats.rules, stats.llm, stats.escalated, stats.unresolved), (1, 1, 1, 0)
+        )
+
+        stats.reset()
+        self.bad_answers = 2
+        with self.assertRaises(ValueError):
+            self.convert(data, stats=stats, retry_count=2)
+        self.assertEqual(
+            (stats.rules, stats.llm, stats.escalated, stats.unresolved), (1, 0, 1, 1)
+        )
+
+    def test_objects_are_corrected_concurrently(self):
+        data = [
+            {"name": "Ada", "age": f"{i} years", "height": 1.8, "active": True}
+            for i in range(6)
+        ]
+        self.assertEqual(self.convert(data, max_workers=3), [Person(**FIXES)] * 6)
+        self.assertEqual(self.max_active, 3)
+
+    def test_apply_patches_is_atomic(self):
+        data = {"a": {"b": 1}, "c": [1, 2]}
+        patched = apply_patches(data, [{"loc": ("a", "b"), "value": 2}])
+        self.assertEqual(patched, {"a": {"b": 2}, "c": [1, 2]})
+        with self.assertRaises(PatchError):
+            apply_patches(
+                data,
+                [{"loc": ("a", "b"), "value": 3}, {"loc": ("c", 5, "d"), "value": 0}],
+            )
+        self.assertEqual(data, {"a": {"b": 1}, "c": [1, 2]})
+
+
+if __name__ == "__main__":
+    unittest.main()
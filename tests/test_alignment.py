@@ -0,0 +1,71 @@
+import re
+import unittest
+
+from promptedgraphs.alignment import SpanAligner, align_entities, align_spans
+
+
+class TestSpanAligner(unittest.TestCase):
+    def test_matches_finditer(self):
+        text = "she sells sea shells by the sea shore, he said: shhh"
+        patterns = ["she", "he", "sea", "sh", "hh", "e s"]
+        matches = SpanAligner(patterns).find_all(text)
+        for pattern in patterns:
+            expected = [m.span() for m in re.finditer(re.escape(pattern), text)]
+            self.assertEqual(matches[pattern], expected, pattern)
+
+    def test_metacharacters_are_literal(self):
+        text = "Call f(x) + g(y)? Then C++ (maybe)."
+        matches = align_spans(text, ["f(x) + g(y)?", "C++", "(maybe)"])
+        for span, found in matches.items():
+            self.assertEqual([text[s:e] for s, e in found], [span])
+
+
+class TestAlignSpans(unittest.TestCase):
+    text = "Acme  Corp. hired\nJane Doe; ACME CORP. thanked Jane Doe."
+
+    def test_exact_occurrences(self):
+        self.assertEqual(
+            align_spans(self.text, ["Jane Doe"])["Jane Doe"], [(18, 26), (47, 55)]
+        )
+
+    def test_whitespace_and_case_normalized(self):
+        found = align_spans(self.text, ["acme corp.", "hired Jane Doe"])
+        self.assertEqual(
+            [self.text[s:e] for s, e in found["acme corp."]],
+            ["Acme  Corp.", "ACME CORP."],
+        )
+        self.assertEqual(
+            [self.text[s:e] for s, e in found["hired Jane Doe"]],
+            ["hired\nJane Doe"],
+        )
+        self.assertEqual(align_spans(self.text, ["acme"], normalize=False)["acme"], [])
+
+    def test_fuzzy(self):
+        self.assertEqual(
+            align_spans(self.text, ["thankd Jane Do"])["thankd Jane Do"], []
+        )
+        found = align_spans(self.text, ["thankd Jane Do"], fuzzy=True)
+        self.assertEqual(
+            [self.text[s:e] for s, e in found["thankd Jane Do"]], ["thanked Jane Do"]
+        )
+        self.assertEqual(
+            align_spans(self.text, ["Bob Smith"], fuzzy=True)["Bob Smith"], []
+        )
+
+    def test_align_entities(self):
+        ents = align_entities(
+            self.text, [("Jane Doe", "PERSON", None), ("acme corp.", "ORG", "x")], 100
+        )
+        self.assertEqual(
+            [(e.start, e.end, e.label, e.text) for e in ents],
+            [
+                (118, 126, "PERSON", "Jane Doe"),
+                (147, 155, "PERSON", "Jane Doe"),
+                (100, 111, "ORG", "Acme  Corp."),
+                (128, 138, "ORG", "ACME CORP."),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import asyncio
+import unittest
+
+from promptedgraphs.benchmark import measure_import_time, percentile, run_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertAlmostEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_run_benchmarks(self):
+        results = asyncio.run(
+            run_benchmarks(
+                workloads=["data_from_text", "generate"], requests=4, concurrency=2
+            )
+        )
+        self.assertEqual([r.workload for r in results], ["data_from_text", "generate"])
+        for result in results:
+            self.assertEqual(result.errors, 0)
+            self.assertGreater(result.items, 0)
+            self.assertGreater(result.tokens_per_second, 0)
+            self.assertLessEqual(result.latency_p50, result.latency_p99)
+
+    def test_unknown_workload(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(run_benchmarks(workloads=["nope"]))
+
+    def test_core_imports_stay_light(self):
+        result = measure_import_time("promptedgraphs.extraction.data_from_text", 1)
+        self.assertNotIn("error", result)
+        self.assertEqual(result["heavy_imports"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,6 +20,13 @@ class TestCLI(unittest.TestCase):
         result = self.runner.invoke(cli.app, ["main"])
         self.assertEqual(result.exit_code, 0)
 
+    def test_bench(self):
+        result = self.runner.invoke(
+            cli.app, ["bench", "--workload", "data_from_text", "--requests", "2"]
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('"items_per_second"', result.stdout)
+
     def test_help(self):
         result = self.runner.invoke(cli.app, ["--help"])
         self.assertEqual(result.exit_code, 0)
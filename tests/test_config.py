@@ -1,7 +1,8 @@
+import asyncio
 import unittest
 
 from promptedgraphs import __title__ as name
-from promptedgraphs.config import Config
+from promptedgraphs.config import Config, aclose_http_clients, get_http_client
 
 
 class TestConfig(unittest.TestCase):
@@ -10,6 +11,17 @@ class TestConfig(unittest.TestCase):
         self.assertIsInstance(config, Config, msg="config is not a Config")
         self.assertEqual(config.name, name)
 
+    def test_http_client_is_pooled(self):
+        async def run():
+            client = get_http_client(Config())
+            self.assertIs(client, Config().http_client())
+            await aclose_http_clients()
+            self.assertTrue(client.is_closed)
+            self.assertIsNot(client, get_http_client(Config()))
+            await aclose_http_clients()
+
+        asyncio.run(run())
+
 
 if __name__ == "__main__":
     unittest.main()
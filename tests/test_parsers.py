@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from promptedgraphs.parsers import StreamingListParser, extract_partial_list
+
+
+class TestStreamingListParser(unittest.TestCase):
+    def feed_in_chunks(self, payload: str, key: str, size: int = 3):
+        parser = StreamingListParser(key=key)
+        emitted = []
+        for i in range(0, len(payload), size):
+            emitted.extend(parser.feed(payload[i : i + size]))
+        return parser, emitted
+
+    def test_emits_elements_as_they_close(self):
+        parser = StreamingListParser(key="entities")
+        self.assertEqual(parser.feed('{"entities": [{"a": 1}, {"a"'), [{"a": 1}])
+        self.assertEqual(parser.feed(": 2}"), [{"a": 2}])
+        self.assertEqual(parser.feed("]}"), [])
+        self.assertTrue(parser.done)
+
+    def test_nested_objects_and_escaped_strings(self):
+        items = [
+            {"text_span": 'He said "hi" }]', "tags": ["a", "b]"], "n": {"x": [1]}},
+            {"text_span": "back\\slash {", "is_entity": True},
+        ]
+        payload = json.dumps({"other": {"entities": "no"}, "entities": items})
+        for size in (1, 2, 7, len(payload)):
+            parser, emitted = self.feed_in_chunks(payload, "entities", size)
+            self.assertEqual(emitted, items)
+            self.assertTrue(parser.done)
+
+    def test_only_matches_the_key_of_the_top_object(self):
+        payload = json.dumps(
+            {
+                "note": 'see "entities": [0]',
+                "meta": {"entities": [1, 2]},
+                "rows": [{"entities": [3]}],
+                "entities": [4, 5],
+            }
+        )
+        for size in (1, 5, len(payload)):
+            _, emitted = self.feed_in_chunks(payload, "entities", size)
+            self.assertEqual(emitted, [4, 5])
+
+    def test_large_element_in_many_chunks(self):
+        item = {"text_span": "x" * 10_000, "tags": ["a"] * 1_000}
+        payload = json.dumps({"entities": [item, 1]})
+        parser, emitted = self.feed_in_chunks(payload, "entities", 1)
+        self.assertEqual(emitted, [item, 1])
+        self.assertTrue(parser.done)
+
+    def test_scalar_elements(self):
+        payload = '{"items": [1, 2.5, "three", true, null, -4]}'
+        _, emitted = self.feed_in_chunks(payload, "items", 2)
+        self.assertEqual(emitted, [1, 2.5, "three", True, None, -4])
+
+    def test_extract_partial_list(self):
+        self.assertEqual(
+            extract_partial_list('{"entities": [{"a": "}"}, {"a": ', "entities"),
+            [{"a": "}"}],
+        )
+        self.assertEqual(extract_partial_list("", "entities"), [])
+        self.assertEqual(extract_partial_list('{"other": [1]}', "entities"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
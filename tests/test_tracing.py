@@ -0,0 +1,82 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from promptedgraphs import tracing
+from promptedgraphs.tracing import TraceCollector, span, traced
+
+
+@traced()
+async def outer():
+    await asyncio.gather(inner(), inner())
+    return [x async for x in items()]
+
+
+@traced("inner.step", kind="test")
+async def inner():
+    with span("block", size=3):
+        await asyncio.sleep(0)
+
+
+@traced()
+async def items():
+    for i in range(3):
+        yield i
+
+
+@traced()
+def fail():
+    raise ValueError("boom")
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.collector = tracing.enable_tracing(TraceCollector())
+
+    def tearDown(self):
+        tracing.enable_tracing(tracing.default_collector)
+        tracing.disable_tracing()
+
+    def test_parent_links(self):
+        self.assertEqual(asyncio.run(outer()), [0, 1, 2])
+        spans = {s["span_id"]: s for s in self.collector.to_list()}
+        by_name = {}
+        for s in spans.values():
+            by_name.setdefault(s["name"], []).append(s)
+
+        (root,) = by_name["outer"]
+        self.assertIsNone(root["parent_id"])
+        self.assertEqual(len(by_name["inner.step"]), 2)
+        for s in by_name["inner.step"]:
+            self.assertEqual(s["parent_id"], root["span_id"])
+            self.assertEqual(s["attributes"], {"kind": "test"})
+        for s in by_name["block"]:
+            self.assertEqual(spans[s["parent_id"]]["name"], "inner.step")
+        self.assertEqual(by_name["items"][0]["parent_id"], root["span_id"])
+        self.assertTrue(all(s["duration_ns"] >= 0 for s in spans.values()))
+
+    def test_errors_and_chrome_export(self):
+        with self.assertRaises(ValueError):
+            fail()
+        (s,) = self.collector.to_list()
+        self.assertEqual(s["error"], "ValueError: boom")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            self.collector.export(path, format="chrome")
+            (event,) = json.loads(path.read_text())["traceEvents"]
+        self.assertEqual((event["name"], event["ph"]), ("fail", "X"))
+        with self.assertRaises(ValueError):
+            self.collector.export(path, format="xml")
+
+    def test_disabled_records_nothing(self):
+        tracing.disable_tracing()
+        self.assertEqual(asyncio.run(outer()), [0, 1, 2])
+        self.assertIs(span("block"), tracing.NOOP_SPAN)
+        self.assertEqual(self.collector.to_list(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()